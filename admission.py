@@ -0,0 +1,130 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+
+from aiogram import BaseMiddleware
+from aiogram.fsm.middleware import FSMContextMiddleware
+from aiogram.types import InlineKeyboardMarkup, Update
+
+from config import SHED_MAX_IN_FLIGHT, SHED_MAX_LOOP_LAG_MS, SHED_REPLY_TTL
+from fsm_storage import SQLiteStorage
+from user_cache import user_cache
+
+logger = logging.getLogger("admission")
+
+BUSY_TEXT = "⏳ Бот сейчас перегружен. Попробуйте ещё раз через минуту."
+
+# Необязательные апдейты, которые при перегрузке отвечаются без БД: текст/команда -> имя
+# заранее отрендеренного ответа (None — просто «занято»)
+SHEDDABLE_MESSAGES = {
+    "Просмотр конференций": "catalog",
+    "/conferences": "catalog",
+    "Помощь": "help",
+    "/help": "help",
+    "Обновить систему": None,
+}
+# Листание каталога и поиска — при перегрузке только всплывающее уведомление
+SHEDDABLE_CALLBACKS = ("catalog_", "search_page_")
+
+@dataclass(frozen=True, slots=True)
+class CachedReply:
+    text: str
+    reply_markup: InlineKeyboardMarkup | None = None
+    photo: str | None = None  # только file_id — без чтения файла
+
+_replies: dict[str, tuple[float, CachedReply]] = {}
+
+# Запомнить отрендеренный ответ, которым можно ответить при перегрузке
+def remember_reply(name: str, text: str, reply_markup: InlineKeyboardMarkup | None = None,
+                   photo: str | None = None, ttl: float = SHED_REPLY_TTL):
+    _replies[name] = (time.monotonic() + ttl, CachedReply(text, reply_markup, photo))
+
+def cached_reply(name: str) -> CachedReply | None:
+    item = _replies.get(name)
+    if item is None or item[0] < time.monotonic():
+        return None
+    return item[1]
+
+# Нагрузка процесса: апдейты в обработке (включая ждущие в планировщике) и задержка event loop
+class LoadMonitor:
+    def __init__(self, max_in_flight: int, max_lag_ms: float):
+        self.max_in_flight = max_in_flight
+        self.max_lag = max_lag_ms / 1000
+        self.in_flight = 0
+        self.lag = 0.0
+        self.shed = 0
+
+    def overloaded(self) -> bool:
+        return self.in_flight > self.max_in_flight or self.lag > self.max_lag
+
+    # Задержка loop — насколько позже запланированного просыпается короткий sleep
+    async def watch_loop_lag(self, interval: float = 0.1):
+        was_overloaded = False
+        while True:
+            started = time.monotonic()
+            await asyncio.sleep(interval)
+            self.lag = max(0.0, time.monotonic() - started - interval)
+
+            overloaded = self.overloaded()
+            if overloaded != was_overloaded:
+                logger.warning(
+                    "Перегрузка %s: в обработке %s, задержка loop %.0f мс",
+                    "началась" if overloaded else "закончилась", self.in_flight, self.lag * 1000
+                )
+                was_overloaded = overloaded
+
+# Внешний middleware на update, стоит до FSM-middleware (и очереди планировщика).
+# При перегрузке отвечает на необязательные апдейты из кэша, не доходя до хендлеров и БД.
+# Шаги форм не трогаем: у пользователя в состоянии FSM текст может быть ответом формы.
+# Бан и форму смотрим только в кэшах; чего в кэше нет, то идёт обычным путём через ban_middleware
+class AdmissionMiddleware(BaseMiddleware):
+    def __init__(self, monitor: LoadMonitor, fsm: FSMContextMiddleware):
+        self.monitor = monitor
+        self.fsm = fsm
+
+    async def __call__(self, handler, event: Update, data):
+        self.monitor.in_flight += 1
+        try:
+            if self.monitor.overloaded() and await self._shed(event, data):
+                self.monitor.shed += 1
+                return None
+            return await handler(event, data)
+        finally:
+            self.monitor.in_flight -= 1
+
+    def _in_form(self, data) -> bool:
+        context = self.fsm.resolve_event_context(data["bot"], data)
+        if context is None:
+            return False
+        storage = self.fsm.storage
+        return not isinstance(storage, SQLiteStorage) or storage.may_have_state(context.key)
+
+    async def _shed(self, event: Update, data) -> bool:
+        from_user = data.get("event_from_user")
+        user = user_cache.get(from_user.id) if from_user else None
+        if user is None or user.is_banned:
+            return False
+
+        if event.callback_query and (event.callback_query.data or "").startswith(SHEDDABLE_CALLBACKS):
+            await event.callback_query.answer(BUSY_TEXT)
+            return True
+
+        message = event.message
+        if not message or not message.text:
+            return False
+        text = message.text.split()[0].split("@")[0] if message.text.startswith("/") else message.text
+        if text not in SHEDDABLE_MESSAGES or self._in_form(data):
+            return False
+
+        name = SHEDDABLE_MESSAGES[text]
+        reply = cached_reply(name) if name else None
+        if reply is None:
+            await message.answer(BUSY_TEXT)
+        elif reply.photo:
+            await message.answer_photo(reply.photo, caption=reply.text, reply_markup=reply.reply_markup)
+        else:
+            await message.answer(reply.text, reply_markup=reply.reply_markup)
+        return True
+
+load_monitor = LoadMonitor(SHED_MAX_IN_FLIGHT, SHED_MAX_LOOP_LAG_MS)
\ No newline at end of file
@@ -0,0 +1,155 @@
+# Замер выгрузки пользователей (самая большая таблица в экспортах): старый путь через pandas
+# против потоковой сборки export_jobs. Каждый замер — отдельный процесс, чтобы пиковый RSS не смешивался.
+#   python bench_exports.py                    # 100 000 и 1 000 000 строк
+#   python bench_exports.py --rows 50000       # свои размеры
+# Для старого пути нужен pandas (pip install pandas); без него замеряется только потоковый
+import argparse
+import asyncio
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+IMPLEMENTATIONS = ("pandas", "stream")
+
+def _prepare_env(workdir: str):
+    # config.py требует эти переменные, а база всегда mun_bot.db в текущем каталоге
+    os.environ.setdefault("BOT_TOKEN", "0:bench")
+    os.environ.setdefault("CHIEF_ADMIN_IDS", "1")
+    sys.path.insert(0, ROOT)
+    os.chdir(workdir)
+
+def populate(workdir: str, rows: int):
+    _prepare_env(workdir)
+    import sqlalchemy as sa
+    from database import User, Role
+
+    engine = sa.create_engine("sqlite:///mun_bot.db")
+    User.__table__.create(engine)
+    roles = [role.value for role in Role]
+    batch = []
+    with engine.begin() as conn:
+        for i in range(1, rows + 1):
+            batch.append({
+                "telegram_id": 10_000_000 + i,
+                "username": f"user{i}",
+                "full_name": f"Участник Номер {i}",
+                "role": roles[i % len(roles)],
+                "is_banned": i % 50 == 0,
+                "ban_reason": "Спам в чате комитета" if i % 50 == 0 else None,
+            })
+            if len(batch) == 10_000:
+                conn.execute(User.__table__.insert(), batch)
+                batch = []
+        if batch:
+            conn.execute(User.__table__.insert(), batch)
+    engine.dispose()
+
+# Старый путь: все объекты ORM -> список словарей -> DataFrame -> файл -> bytes в памяти
+async def export_pandas() -> int:
+    import pandas as pd
+    from aiogram.types import BufferedInputFile
+    from sqlalchemy import select
+    from database import AsyncSessionLocal, User
+
+    async with AsyncSessionLocal(readonly=True) as session:
+        users = (await session.execute(select(User))).scalars().all()
+        users_data = []
+        for user in users:
+            users_data.append({
+                "Telegram ID": user.telegram_id,
+                "Username": user.username or "—",
+                "ФИО": user.full_name or "—",
+                "Роль": user.role,
+                "Забанен": "Да" if user.is_banned else "Нет",
+                "Причина бана": user.ban_reason or "—"
+            })
+        df_users = pd.DataFrame(users_data)
+        filename = "bench_users.xlsx"
+        df_users.to_excel(filename, index=False)
+
+    with open(filename, "rb") as f:
+        file = BufferedInputFile(f.read(), filename=filename)
+    size = sum([len(chunk) async for chunk in file.read(None)])
+    os.remove(filename)
+    return size
+
+# Новый путь — код процесса-сборщика export_jobs: курсор yield_per в одном снимке ->
+# write_only-книга -> файл, который уходит в Telegram кусками
+async def export_stream() -> int:
+    from aiogram.types import FSInputFile
+    from exports import XlsxExport
+    import export_jobs
+
+    export_jobs._init_worker(None)
+    with export_jobs._engine.connect() as conn:
+        build = export_jobs._Build(0, conn, ".")
+        stmt = export_jobs._users_stmt()
+        build.plan(stmt)
+        export = XlsxExport()
+        export.add_sheet("Пользователи", export_jobs.USERS_HEADERS, export_jobs._user_rows(build.rows(stmt)))
+        build.save(export, "bench_users.xlsx", "")
+
+    file = FSInputFile("bench_users.xlsx")
+    size = sum([len(chunk) async for chunk in file.read(None)])
+    os.remove("bench_users.xlsx")
+    return size
+
+def measure(workdir: str, implementation: str):
+    _prepare_env(workdir)
+    # Импорт модулей (aiogram, openpyxl, pandas) не входит в замер
+    import database, exports, export_jobs  # noqa: F401
+    if implementation == "pandas":
+        import pandas  # noqa: F401
+
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    started = time.perf_counter()
+    size = asyncio.run(export_pandas() if implementation == "pandas" else export_stream())
+    elapsed = time.perf_counter() - started
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(json.dumps({"seconds": elapsed, "peak_kb": peak, "baseline_kb": baseline, "bytes": size}))
+
+def _has_pandas() -> bool:
+    try:
+        import pandas  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+def main():
+    parser = argparse.ArgumentParser(description="Замер выгрузки пользователей в xlsx")
+    parser.add_argument("--rows", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--measure", choices=IMPLEMENTATIONS, help=argparse.SUPPRESS)
+    parser.add_argument("--workdir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        measure(args.workdir, args.measure)
+        return
+
+    implementations = IMPLEMENTATIONS if _has_pandas() else ("stream",)
+    print(f"{'строк':>10} {'путь':>7} {'время, с':>9} {'пик RSS, МБ':>12} {'прирост, МБ':>12} {'файл, МБ':>9}")
+    for rows in args.rows:
+        with tempfile.TemporaryDirectory() as workdir:
+            subprocess.run(
+                [sys.executable, "-c", f"import bench_exports; bench_exports.populate({workdir!r}, {rows})"],
+                cwd=ROOT, check=True
+            )
+            for implementation in implementations:
+                output = subprocess.run(
+                    [sys.executable, __file__, "--measure", implementation, "--workdir", workdir],
+                    check=True, capture_output=True, text=True
+                ).stdout
+                result = json.loads(output.strip().splitlines()[-1])
+                print(
+                    f"{rows:>10} {implementation:>7} {result['seconds']:>9.1f} "
+                    f"{result['peak_kb'] / 1024:>12.0f} {(result['peak_kb'] - result['baseline_kb']) / 1024:>12.0f} "
+                    f"{result['bytes'] / 1024 / 1024:>9.1f}"
+                )
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
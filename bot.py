@@ -5,8 +5,21 @@ from aiogram.filters import Command
 from aiogram.fsm.context import FSMContext
 from aiogram.client.default import DefaultBotProperties
 
-from config import BOT_TOKEN, CHIEF_ADMIN_IDS, TECH_SPECIALIST_ID
-from database import init_db, get_or_create_user, enable_wal
+from config import (
+    BOT_TOKEN, CHIEF_ADMIN_IDS, TECH_SPECIALIST_ID, ARCHIVE_INTERVAL, SQL_STATS_ENABLED, MEDIA_GC_INTERVAL, BOT_MODE,
+    FSM_CACHE_SIZE, FSM_STATE_TTL, FSM_EXPIRY_INTERVAL
+)
+from database import init_db, enable_wal, run_archiver, engine, read_engine
+from instrumentation import setup_instrumentation
+from broadcast import resume_broadcasts
+from outbox import run_outbox_dispatcher
+from media_store import run_media_gc
+from webhook import run_webhook
+from export_jobs import close_exports
+from fsm_storage import SQLiteStorage, FsmFlushMiddleware
+from scheduler import scheduler
+from admission import AdmissionMiddleware, load_monitor
+from user_cache import get_cached_user
 from keyboards import get_main_menu_keyboard
 from handlers.common import router as common_router
 from handlers.organizer import router as organizer_router
@@ -15,10 +28,20 @@ from handlers.tech_support import router as tech_support_router
 from handlers.ban import router as ban_router
 
 logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
 
 default_properties = DefaultBotProperties(parse_mode="HTML")
 bot = Bot(token=BOT_TOKEN, default=default_properties)
-dp = Dispatcher()
+# Состояния форм хранятся в SQLite и переживают перезапуск.
+# Планировщик выстраивает апдейты одного чата в очередь и ограничивает общий параллелизм
+storage = SQLiteStorage(FSM_CACHE_SIZE, FSM_STATE_TTL)
+dp = Dispatcher(storage=storage, events_isolation=scheduler)
+# Контроль нагрузки ставим перед FSM-middleware: сброшенные апдейты не встают в очередь чата
+dp.update.outer_middleware.unregister(dp.fsm)
+dp.update.outer_middleware(AdmissionMiddleware(load_monitor, dp.fsm))
+dp.update.outer_middleware(dp.fsm)
+dp.update.outer_middleware(FsmFlushMiddleware(storage))
+dp.shutdown.register(close_exports)
 
 # Подключаем роутеры
 dp.include_router(common_router)
@@ -27,6 +50,31 @@ dp.include_router(admin_router)
 dp.include_router(tech_support_router)
 dp.include_router(ban_router)
 
+# Учёт SQL-запросов по апдейтам и хендлерам
+if SQL_STATS_ENABLED:
+    setup_instrumentation(dp, engine, read_engine)
+
+# Фоновые циклы держим по ссылке: event loop хранит на задачи только слабые ссылки
+background_tasks: set[asyncio.Task] = set()
+
+def start_background_task(coro) -> asyncio.Task:
+    task = asyncio.create_task(coro)
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+
+    def log_error(t: asyncio.Task):
+        if not t.cancelled() and t.exception():
+            logger.error("Фоновая задача %s упала", t.get_coro().__qualname__, exc_info=t.exception())
+    task.add_done_callback(log_error)
+    return task
+
+async def stop_background_tasks():
+    for task in background_tasks:
+        task.cancel()
+    await asyncio.gather(*background_tasks, return_exceptions=True)
+
+dp.shutdown.register(stop_background_tasks)
+
 # Универсальная функция главного меню с приветствием
 async def show_main_menu(message: types.Message | types.CallbackQuery):
     if isinstance(message, types.CallbackQuery):
@@ -36,7 +84,7 @@ async def show_main_menu(message: types.Message | types.CallbackQuery):
         user = message.from_user
         msg = message
 
-    db_user = await get_or_create_user(user.id, user.full_name)
+    db_user = await get_cached_user(user.id, user.full_name, user.username)
 
     if db_user.is_banned:
         await msg.answer(
@@ -180,6 +228,11 @@ async def text_export_bot_data(message: types.Message):
     from handlers.admin import export_bot_data
     await export_bot_data(message)
 
+@dp.message(F.text == "Экспорт изменений")
+async def text_export_bot_changes(message: types.Message):
+    from handlers.admin import export_bot_changes
+    await export_bot_changes(message)
+
 # Общие
 @dp.message(F.text == "Помощь")
 async def text_help(message: types.Message):
@@ -209,13 +262,19 @@ async def back_to_menu(callback: types.CallbackQuery):
 # Middleware для проверки бана
 @dp.update.middleware()
 async def ban_middleware(handler, event, data):
-    if hasattr(event, "from_user") and event.from_user:
-        user = await get_or_create_user(event.from_user.id, event.from_user.full_name)
+    # event здесь — Update, пользователя кладёт UserContextMiddleware
+    from_user = data.get("event_from_user")
+    if from_user:
+        user = await get_cached_user(from_user.id, from_user.full_name, from_user.username)
         if user.is_banned:
-            await event.answer(
+            ban_text = (
                 "🚫 Вы заблокированы в боте.\n"
                 "Обратитесь к техподдержке для разблокировки."
             )
+            if event.message:
+                await event.message.answer(ban_text)
+            elif event.callback_query:
+                await event.callback_query.answer(ban_text, show_alert=True)
             return
     return await handler(event, data)
 
@@ -224,7 +283,18 @@ async def main():
     await init_db()
     await enable_wal()
     print("База готова (WAL включён). Запуск бота...")
-    await dp.start_polling(bot)
+    start_background_task(run_archiver(ARCHIVE_INTERVAL))
+    await resume_broadcasts(bot)
+    start_background_task(run_outbox_dispatcher(bot))
+    start_background_task(run_media_gc(MEDIA_GC_INTERVAL))
+    start_background_task(storage.run_expiry(FSM_EXPIRY_INTERVAL))
+    start_background_task(load_monitor.watch_loop_lag())
+    if BOT_MODE == "webhook":
+        await run_webhook(bot, dp)
+    else:
+        # Поллинг не работает при установленном вебхуке
+        await bot.delete_webhook()
+        await dp.start_polling(bot)
 
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
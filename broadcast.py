@@ -0,0 +1,220 @@
+import asyncio
+import contextvars
+import logging
+import os
+import time
+
+from aiogram import Bot
+from aiogram.types import FSInputFile
+from aiogram.exceptions import (
+    TelegramAPIError, TelegramBadRequest, TelegramForbiddenError, TelegramNetworkError, TelegramRetryAfter
+)
+from sqlalchemy import select, update, insert, func
+
+from config import (
+    BROADCAST_RATE, BROADCAST_PER_CHAT_INTERVAL, BROADCAST_CONCURRENCY,
+    BROADCAST_MAX_ATTEMPTS, BROADCAST_PROGRESS_INTERVAL
+)
+from database import AsyncSessionLocal, BroadcastJob, BroadcastRecipient, run_write
+
+logger = logging.getLogger("broadcast")
+
+# Общий лимит бота: не больше rate сообщений в секунду, всплеск до capacity
+# На TelegramRetryAfter ведро «замораживается» для всех отправок сразу
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    def pause(self, seconds: float):
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        self._tokens = 0
+
+# Не чаще одного сообщения в interval секунд в один чат (пересекающиеся рассылки, повторы)
+class ChatLimiter:
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._next: dict[int, float] = {}
+
+    async def wait(self, chat_id: int):
+        now = time.monotonic()
+        ready = self._next.get(chat_id, 0.0)
+        self._next[chat_id] = max(now, ready) + self.interval
+        if len(self._next) > 10000:
+            self._next = {chat: at for chat, at in self._next.items() if at > now}
+        if ready > now:
+            await asyncio.sleep(ready - now)
+
+bucket = TokenBucket(BROADCAST_RATE, 1)
+chat_limiter = ChatLimiter(BROADCAST_PER_CHAT_INTERVAL)
+send_slots = asyncio.Semaphore(BROADCAST_CONCURRENCY)
+running_jobs: dict[int, asyncio.Task] = {}
+
+# Одна доставка с повторами; возвращает итоговый статус получателя.
+# photo — file_id или путь к файлу, text тогда идёт подписью
+async def deliver(bot: Bot, chat_id: int, text: str, reply_markup=None, photo: str | None = None) -> str:
+    for attempt in range(1, BROADCAST_MAX_ATTEMPTS + 1):
+        await chat_limiter.wait(chat_id)
+        await bucket.acquire()
+        try:
+            if photo:
+                media = FSInputFile(photo) if os.path.exists(photo) else photo
+                await bot.send_photo(chat_id, media, caption=text, reply_markup=reply_markup)
+            else:
+                await bot.send_message(chat_id, text, reply_markup=reply_markup)
+            return "delivered"
+        except TelegramRetryAfter as e:
+            logger.warning("Flood limit, пауза %s с", e.retry_after)
+            bucket.pause(e.retry_after)
+        except TelegramForbiddenError:
+            # Бот заблокирован пользователем или аккаунт удалён
+            return "blocked"
+        except TelegramBadRequest as e:
+            if "chat not found" in e.message.lower():
+                return "blocked"
+            logger.warning("Рассылка в %s: %s", chat_id, e.message)
+            return "failed"
+        except (TelegramNetworkError, TelegramAPIError) as e:
+            logger.warning("Рассылка в %s, попытка %s: %s", chat_id, attempt, e)
+            await asyncio.sleep(min(2 ** attempt, 30))
+    return "failed"
+
+async def _count_statuses(job_id: int) -> dict[str, int]:
+    async with AsyncSessionLocal(readonly=True) as session:
+        rows = await session.execute(
+            select(BroadcastRecipient.status, func.count())
+            .where(BroadcastRecipient.job_id == job_id)
+            .group_by(BroadcastRecipient.status)
+        )
+        return dict(rows.all())
+
+def _progress_text(job: BroadcastJob, counts: dict[str, int], done: bool) -> str:
+    processed = sum(n for status, n in counts.items() if status != "pending")
+    header = "✅ Рассылка завершена!" if done else f"📢 Рассылка: {processed} из {job.total}"
+    return (
+        f"{header}\n\n"
+        f"Доставлено: {counts.get('delivered', 0)}\n"
+        f"Бот заблокирован: {counts.get('blocked', 0)}\n"
+        f"Ошибки: {counts.get('failed', 0)}"
+    )
+
+async def _edit_progress(bot: Bot, job: BroadcastJob, counts: dict[str, int], done: bool = False):
+    if job.status_message_id is None:
+        return
+    try:
+        await bot.edit_message_text(
+            _progress_text(job, counts, done), chat_id=job.status_chat_id, message_id=job.status_message_id
+        )
+    except TelegramAPIError:
+        pass
+
+async def _run_job(bot: Bot, job: BroadcastJob):
+    async with AsyncSessionLocal(readonly=True) as session:
+        pending = (await session.execute(
+            select(BroadcastRecipient.chat_id).where(
+                BroadcastRecipient.job_id == job.id,
+                BroadcastRecipient.status == "pending"
+            )
+        )).scalars().all()
+
+    counts = await _count_statuses(job.id)
+    last_edit = 0.0
+
+    async def send_one(chat_id: int):
+        nonlocal last_edit
+        async with send_slots:
+            status = await deliver(bot, chat_id, job.text)
+
+        async def save(session):
+            await session.execute(
+                update(BroadcastRecipient)
+                .where(BroadcastRecipient.job_id == job.id, BroadcastRecipient.chat_id == chat_id)
+                .values(status=status)
+            )
+        await run_write(save)
+
+        counts["pending"] = counts.get("pending", 0) - 1
+        counts[status] = counts.get(status, 0) + 1
+        if time.monotonic() - last_edit >= BROADCAST_PROGRESS_INTERVAL:
+            last_edit = time.monotonic()
+            await _edit_progress(bot, job, counts)
+
+    results = await asyncio.gather(*(send_one(chat_id) for chat_id in pending), return_exceptions=True)
+    errors = [r for r in results if isinstance(r, Exception)]
+    if errors:
+        # Недосохранённые получатели остались pending — задание продолжится после перезапуска
+        logger.error("Рассылка %s: %s ошибок сохранения", job.id, len(errors), exc_info=errors[0])
+        return
+
+    async def finish(session):
+        await session.execute(update(BroadcastJob).where(BroadcastJob.id == job.id).values(status="done"))
+    await run_write(finish)
+
+    await _edit_progress(bot, job, await _count_statuses(job.id), done=True)
+
+def _launch(bot: Bot, job: BroadcastJob):
+    # Свой контекст: задание живёт дольше апдейта, который его запустил
+    task = asyncio.create_task(_run_job(bot, job), context=contextvars.Context())
+    running_jobs[job.id] = task
+    task.add_done_callback(lambda t: running_jobs.pop(job.id, None))
+
+    def log_error(t: asyncio.Task):
+        if not t.cancelled() and t.exception():
+            logger.error("Рассылка %s прервана", job.id, exc_info=t.exception())
+    task.add_done_callback(log_error)
+
+# Создать задание рассылки и запустить его в фоне
+async def start_broadcast(bot: Bot, conference_id: int, text: str, chat_ids: list[int], status_chat_id: int) -> int:
+    chat_ids = list(dict.fromkeys(chat_ids))
+    status_message = await bot.send_message(status_chat_id, f"📢 Рассылка запущена: 0 из {len(chat_ids)}")
+
+    async def create(session):
+        job = BroadcastJob(
+            conference_id=conference_id,
+            text=text,
+            status_chat_id=status_chat_id,
+            status_message_id=status_message.message_id,
+            total=len(chat_ids)
+        )
+        session.add(job)
+        await session.flush()
+        if chat_ids:
+            await session.execute(
+                insert(BroadcastRecipient),
+                [{"job_id": job.id, "chat_id": chat_id} for chat_id in chat_ids]
+            )
+        return job
+
+    job = await run_write(create)
+    _launch(bot, job)
+    return job.id
+
+# Продолжить незавершённые рассылки после перезапуска
+async def resume_broadcasts(bot: Bot):
+    async with AsyncSessionLocal(readonly=True) as session:
+        jobs = (await session.execute(
+            select(BroadcastJob).where(BroadcastJob.status == "running")
+        )).scalars().all()
+
+    for job in jobs:
+        if job.id not in running_jobs:
+            logger.info("Продолжаем рассылку %s", job.id)
+            _launch(bot, job)
\ No newline at end of file
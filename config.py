@@ -19,4 +19,81 @@ CHIEF_ADMIN_IDS = [int(id_str.strip()) for id_str in CHIEF_ADMIN_IDS_STR.split("
 DB_PATH = "mun_bot.db"
 
 # В config.py (в конец файла)
-TECH_SPECIALIST_ID = 7838905671# ← Твой ID для Главного Тех Специалиста7838905670
\ No newline at end of file
+TECH_SPECIALIST_ID = 7838905671# ← Твой ID для Главного Тех Специалиста7838905670
+
+# Кэш пользователей для middleware (размер и время жизни записи в секундах)
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "10000"))
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "60"))
+# Пул читающих соединений SQLite и таймаут ожидания писателя (секунды)
+DB_READ_POOL_SIZE = int(os.getenv("DB_READ_POOL_SIZE", "4"))
+DB_WRITE_TIMEOUT = float(os.getenv("DB_WRITE_TIMEOUT", "30"))
+# Групповой коммит записей: окно сбора пакета (секунды) и максимум операций в пакете
+WRITE_BATCH_WINDOW = float(os.getenv("WRITE_BATCH_WINDOW", "0.005"))
+WRITE_BATCH_MAX = int(os.getenv("WRITE_BATCH_MAX", "64"))
+# Размер страницы результатов поиска конференций (/search и inline-режим)
+SEARCH_PAGE_SIZE = int(os.getenv("SEARCH_PAGE_SIZE", "5"))
+# Размер страницы списка пользователей при неоднозначном /ban, /unban, /set_role
+USER_PICK_PAGE_SIZE = int(os.getenv("USER_PICK_PAGE_SIZE", "8"))
+# Размер страницы каталога конференций (/conferences)
+CATALOG_PAGE_SIZE = int(os.getenv("CATALOG_PAGE_SIZE", "5"))
+# Фоновый перенос завершённых заявок и закрытых обращений в архивные таблицы
+ARCHIVE_INTERVAL = float(os.getenv("ARCHIVE_INTERVAL", "3600"))
+ARCHIVE_BATCH_SIZE = int(os.getenv("ARCHIVE_BATCH_SIZE", "500"))
+# Учёт SQL по апдейтам: порог повторов одного запроса (N+1) и порог медленного апдейта, мс
+SQL_STATS_ENABLED = os.getenv("SQL_STATS_ENABLED", "1") == "1"
+SQL_N_PLUS_ONE_THRESHOLD = int(os.getenv("SQL_N_PLUS_ONE_THRESHOLD", "5"))
+SQL_SLOW_UPDATE_MS = float(os.getenv("SQL_SLOW_UPDATE_MS", "200"))
+# Рассылки: общий лимит Telegram (сообщений/с), интервал для одного чата (с),
+# число одновременных отправок, попыток на получателя и частота обновления прогресса (с)
+BROADCAST_RATE = float(os.getenv("BROADCAST_RATE", "30"))
+BROADCAST_PER_CHAT_INTERVAL = float(os.getenv("BROADCAST_PER_CHAT_INTERVAL", "1"))
+BROADCAST_CONCURRENCY = int(os.getenv("BROADCAST_CONCURRENCY", "10"))
+BROADCAST_MAX_ATTEMPTS = int(os.getenv("BROADCAST_MAX_ATTEMPTS", "5"))
+BROADCAST_PROGRESS_INTERVAL = float(os.getenv("BROADCAST_PROGRESS_INTERVAL", "3"))
+# Outbox уведомлений: размер пачки, параллельность, попытки, опрос (с) и срок хранения отправленных (дни)
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "50"))
+OUTBOX_CONCURRENCY = int(os.getenv("OUTBOX_CONCURRENCY", "10"))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "8"))
+OUTBOX_POLL_INTERVAL = float(os.getenv("OUTBOX_POLL_INTERVAL", "5"))
+OUTBOX_RETENTION_DAYS = int(os.getenv("OUTBOX_RETENTION_DAYS", "7"))
+
+# Хранилище фото: сборщик удаляет файлы без ссылок из БД старше grace-периода
+MEDIA_GC_INTERVAL = float(os.getenv("MEDIA_GC_INTERVAL", "21600"))
+MEDIA_GC_GRACE = float(os.getenv("MEDIA_GC_GRACE", "172800"))
+# Выгрузки: строк за одно чтение курсора и сколько байт готового файла держать в памяти до сброса на диск
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+EXPORT_SPOOL_SIZE = int(os.getenv("EXPORT_SPOOL_SIZE", str(8 * 1024 * 1024)))
+# Фоновые выгрузки xlsx: число процессов-сборщиков, сколько секунд одинаковые запросы получают
+# уже собранный файл и как часто обновлять сообщение с прогрессом
+EXPORT_WORKERS = int(os.getenv("EXPORT_WORKERS", "2"))
+EXPORT_DEDUP_WINDOW = float(os.getenv("EXPORT_DEDUP_WINDOW", "120"))
+EXPORT_PROGRESS_INTERVAL = float(os.getenv("EXPORT_PROGRESS_INTERVAL", "3"))
+# FSM в SQLite: размер процессного кэша, срок жизни брошенной формы и период очистки (секунды)
+FSM_CACHE_SIZE = int(os.getenv("FSM_CACHE_SIZE", "10000"))
+FSM_STATE_TTL = float(os.getenv("FSM_STATE_TTL", "172800"))
+FSM_EXPIRY_INTERVAL = float(os.getenv("FSM_EXPIRY_INTERVAL", "3600"))
+# Состояние экранов (пагинация): memory — в процессе, sqlite — общее для нескольких процессов;
+# число записей на хранилище и время жизни записи (секунды)
+STATE_STORE_BACKEND = os.getenv("STATE_STORE_BACKEND", "memory")
+STATE_STORE_SIZE = int(os.getenv("STATE_STORE_SIZE", "5000"))
+STATE_STORE_TTL = float(os.getenv("STATE_STORE_TTL", "86400"))
+# Планировщик апдейтов: сколько апдейтов (разных чатов) обрабатывается одновременно
+# и сколько из этих воркеров зарезервировано за персоналом (организаторы, админы, тех. специалист)
+SCHEDULER_WORKERS = int(os.getenv("SCHEDULER_WORKERS", "32"))
+SCHEDULER_STAFF_RESERVED = int(os.getenv("SCHEDULER_STAFF_RESERVED", "8"))
+# Сброс нагрузки: порог апдейтов в обработке, задержки event loop (мс) и срок жизни кэша ответов (с)
+SHED_MAX_IN_FLIGHT = int(os.getenv("SHED_MAX_IN_FLIGHT", "300"))
+SHED_MAX_LOOP_LAG_MS = float(os.getenv("SHED_MAX_LOOP_LAG_MS", "200"))
+SHED_REPLY_TTL = float(os.getenv("SHED_REPLY_TTL", "300"))
+# Режим получения апдейтов: polling или webhook. Для webhook: публичный адрес (пусто — не
+# регистрировать вебхук, для локальной отладки), секрет, адрес сервера, размер очереди и число воркеров
+BOT_MODE = os.getenv("BOT_MODE", "polling")
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "")
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/webhook")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")
+WEBHOOK_HOST = os.getenv("WEBHOOK_HOST", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8080"))
+WEBHOOK_QUEUE_SIZE = int(os.getenv("WEBHOOK_QUEUE_SIZE", "1000"))
+WEBHOOK_WORKERS = int(os.getenv("WEBHOOK_WORKERS", "16"))
+if BOT_MODE == "webhook" and not WEBHOOK_SECRET:
+    raise ValueError("WEBHOOK_SECRET не найден в .env! Он обязателен в режиме webhook")
\ No newline at end of file
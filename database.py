@@ -1,42 +1,217 @@
 import asyncio
-import sqlite3
+import contextvars
+import datetime as dt
+import logging
+import re
 import sqlalchemy as sa
 from enum import StrEnum
 from sqlalchemy import (
-    String, Integer, BigInteger, Float, Text, ForeignKey, JSON, select, func
+    String, Integer, BigInteger, Float, Text, ForeignKey, JSON, Index, select, func, event
 )
-from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship, sessionmaker
+from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship, sessionmaker, synonym
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
-from sqlalchemy.pool import StaticPool
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
-from config import DB_PATH, TECH_SPECIALIST_ID, CHIEF_ADMIN_IDS
+from config import (
+    DB_PATH, TECH_SPECIALIST_ID, CHIEF_ADMIN_IDS, DB_READ_POOL_SIZE, DB_WRITE_TIMEOUT,
+    WRITE_BATCH_WINDOW, WRITE_BATCH_MAX, ARCHIVE_BATCH_SIZE
+)
+
+DB_URL = f"sqlite+aiosqlite:///{DB_PATH}"
+
+# detect_types не включаем: конвертеры sqlite3 отдают date для колонок DATE,
+# а тип Date в SQLAlchemy сам разбирает ISO-строки
+CONNECT_ARGS = {
+    "timeout": 30.0,
+    "check_same_thread": False,
+}
 
-# Движок — стабильный на Windows
+# Писатель — ровно одно соединение. Сессии на запись ждут его в асинхронной
+# очереди пула, поэтому записи идут строго последовательно
 engine = create_async_engine(
-    f"sqlite+aiosqlite:///{DB_PATH}",
-    connect_args={
-        "timeout": 30.0,
-        "check_same_thread": False,
-        "detect_types": sqlite3.PARSE_DECLTYPES | sqlite3.PARSE_COLNAMES,
-    },
+    DB_URL,
+    connect_args=CONNECT_ARGS,
     echo=False,
     pool_pre_ping=True,
     future=True,
-    poolclass=StaticPool,
+    poolclass=AsyncAdaptedQueuePool,
+    pool_size=1,
+    max_overflow=0,
+    pool_timeout=DB_WRITE_TIMEOUT,
 )
 
-AsyncSessionLocal = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+# Читатели — N соединений только для SELECT, в WAL они не мешают писателю
+read_engine = create_async_engine(
+    DB_URL,
+    connect_args=CONNECT_ARGS,
+    echo=False,
+    pool_pre_ping=True,
+    future=True,
+    poolclass=AsyncAdaptedQueuePool,
+    pool_size=DB_READ_POOL_SIZE,
+    max_overflow=0,
+)
+
+@event.listens_for(engine.sync_engine, "connect")
+def _setup_write_connection(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL;")
+    cursor.execute("PRAGMA synchronous=NORMAL;")
+    cursor.execute("PRAGMA foreign_keys=ON;")
+    cursor.close()
+    # Транзакциями управляем сами (см. _begin_write), иначе pysqlite ломает SAVEPOINT
+    dbapi_connection.isolation_level = None
+
+# BEGIN IMMEDIATE сразу берёт блокировку записи — нужен для SAVEPOINT в пакетах WriteCoordinator
+@event.listens_for(engine.sync_engine, "begin")
+def _begin_write(conn):
+    conn.exec_driver_sql("BEGIN IMMEDIATE")
+
+@event.listens_for(read_engine.sync_engine, "connect")
+def _setup_read_connection(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA foreign_keys=ON;")
+    cursor.execute("PRAGMA query_only=ON;")
+    cursor.close()
+
+# Задача, которая держит открытую сессию на запись. Соединение у писателя одно: вложенная
+# сессия в той же задаче ждала бы сама себя до DB_WRITE_TIMEOUT — вместо этого сразу ошибка
+_write_session_owner: contextvars.ContextVar[asyncio.Task | None] = contextvars.ContextVar(
+    "write_session_owner", default=None
+)
 
+class _WriteSession(AsyncSession):
+    async def __aenter__(self):
+        task = asyncio.current_task()
+        if task is not None and _write_session_owner.get() is task:
+            raise RuntimeError(
+                "Вложенная сессия на запись: у писателя одно соединение, и его держит внешняя сессия "
+                "этой же задачи. Передайте внешнюю сессию или вынесите запись в run_write"
+            )
+        self._owner_token = _write_session_owner.set(task)
+        return await super().__aenter__()
+
+    async def __aexit__(self, type_, value, traceback):
+        try:
+            await super().__aexit__(type_, value, traceback)
+        finally:
+            _write_session_owner.reset(self._owner_token)
+
+_write_session = sessionmaker(engine, class_=_WriteSession, expire_on_commit=False)
+_read_session = sessionmaker(read_engine, class_=AsyncSession, expire_on_commit=False)
+
+# AsyncSessionLocal() — сессия на запись, AsyncSessionLocal(readonly=True) — только чтение
+def AsyncSessionLocal(readonly: bool = False) -> AsyncSession:
+    if readonly:
+        return _read_session()
+    return _write_session()
+
+# Прагмы выставляются в _setup_write_connection (внутри транзакции их менять нельзя),
+# здесь только проверяем, что база действительно в WAL
 async def enable_wal():
-    async with engine.begin() as conn:
-        await conn.execute(sa.text("PRAGMA journal_mode=WAL;"))
-        await conn.execute(sa.text("PRAGMA synchronous=NORMAL;"))
-        await conn.execute(sa.text("PRAGMA foreign_keys=ON;"))
-        await conn.commit()
+    async with engine.connect() as conn:
+        journal_mode = await conn.scalar(sa.text("PRAGMA journal_mode;"))
+    if journal_mode != "wal":
+        raise RuntimeError(f"Не удалось включить WAL, режим журнала: {journal_mode}")
+
+# Групповой коммит: записи из разных корутин, пришедшие в пределах окна
+# (WRITE_BATCH_WINDOW секунд или WRITE_BATCH_MAX штук), выполняются в одной
+# транзакции — один fsync WAL на пакет. Каждая единица работы изолирована
+# SAVEPOINT'ом: её ошибка откатывает только её и уходит её вызывающему.
+# Единица — async-функция от сессии; сетевых вызовов внутри быть не должно.
+# Единица выполняется в контексте (contextvars) вызвавшей корутины, чтобы её
+# запросы учитывались за тем апдейтом, который её отправил.
+class WriteCoordinator:
+    def __init__(self, window: float, max_batch: int):
+        self.window = window
+        self.max_batch = max_batch
+        self._queue: asyncio.Queue | None = None
+        self._worker: asyncio.Task | None = None
+
+    async def submit(self, unit):
+        if self._worker is None or self._worker.done():
+            self._queue = asyncio.Queue()
+            # Воркер общий для всех — не наследует контекст первого вызвавшего
+            self._worker = asyncio.create_task(self._run(), context=contextvars.Context())
+
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((unit, future, contextvars.copy_context()))
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        batch = []
+        try:
+            while True:
+                batch = [await self._queue.get()]
+                deadline = loop.time() + self.window
+                while len(batch) < self.max_batch:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                    except asyncio.TimeoutError:
+                        break
+                await self._commit_batch(batch)
+                batch = []
+        finally:
+            # Воркер остановлен (отмена, KeyboardInterrupt): незакоммиченный пакет и очередь
+            # получают ошибку, чтобы вызвавшие не ждали свои future вечно
+            self._abandon(batch)
+
+    def _abandon(self, batch):
+        while not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+        error = RuntimeError("Пакетная запись остановлена, изменения не сохранены")
+        for _, future, _ in batch:
+            if not future.done():
+                future.set_exception(error)
+
+    async def _commit_batch(self, batch):
+        outcomes = []
+        try:
+            async with AsyncSessionLocal() as session:
+                for unit, future, context in batch:
+                    if future.cancelled():
+                        continue
+                    try:
+                        async with session.begin_nested():
+                            result = await asyncio.create_task(unit(session), context=context)
+                        outcomes.append((future, result, None))
+                    except Exception as e:
+                        outcomes.append((future, None, e))
+                await session.commit()
+                # Результаты — сразу после коммита: отмена во время закрытия сессии их не потеряет
+                for future, result, error in outcomes:
+                    if future.done():
+                        continue
+                    if error is not None:
+                        future.set_exception(error)
+                    else:
+                        future.set_result(result)
+        except Exception as e:
+            # Не удался сам коммит — ошибка у всех единиц пакета
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+
+write_coordinator = WriteCoordinator(WRITE_BATCH_WINDOW, WRITE_BATCH_MAX)
+
+# Выполнить единицу записи в ближайшем пакете и получить её результат
+async def run_write(unit):
+    return await write_coordinator.submit(unit)
 
 class Base(DeclarativeBase):
     pass
 
+# Время создания и последнего изменения строки (unix-время, секунды). Заполняются
+# триггерами trg_<таблица>_created/_touch — и для ORM, и для сырых upsert'ов
+class Timestamped:
+    created_at: Mapped[float | None] = mapped_column(Float, nullable=True, index=True)
+    updated_at: Mapped[float | None] = mapped_column(Float, nullable=True, index=True)
+
 class Role(StrEnum):
     PARTICIPANT = "Участник"
     ORGANIZER = "Организатор"
@@ -44,7 +219,7 @@ class Role(StrEnum):
     ADMIN = "Админ"
     CHIEF_ADMIN = "Главный Админ"
 
-class User(Base):
+class User(Timestamped, Base):
     __tablename__ = "users"
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
@@ -54,6 +229,7 @@ class User(Base):
     ban_reason: Mapped[str | None] = mapped_column(Text, nullable=True)
 
     full_name: Mapped[str | None] = mapped_column(String(200), nullable=True)
+    username: Mapped[str | None] = mapped_column(String(64, collation="NOCASE"), nullable=True)
     age: Mapped[int | None] = mapped_column(Integer, nullable=True)
     email: Mapped[str | None] = mapped_column(String(100), nullable=True)
     institution: Mapped[str | None] = mapped_column(String(300), nullable=True)
@@ -63,19 +239,27 @@ class User(Base):
     conferences: Mapped[list["Conference"]] = relationship(back_populates="organizer")
     support_requests: Mapped[list["SupportRequest"]] = relationship(back_populates="user")
 
-class Conference(Base):
+    __table_args__ = (
+        Index("ix_users_role", "role"),
+        Index("ix_users_banned", "telegram_id", sqlite_where=sa.text("is_banned = 1")),
+        Index("ix_users_username", "username"),
+    )
+
+class Conference(Timestamped, Base):
     __tablename__ = "conferences"
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     name: Mapped[str] = mapped_column(String(200))
     description: Mapped[str | None] = mapped_column(Text, nullable=True)
     city: Mapped[str | None] = mapped_column(String(100), nullable=True)
-    date_start: Mapped[str | None] = mapped_column(String(50), nullable=True)
-    date_end: Mapped[str | None] = mapped_column(String(50), nullable=True)
+    date_start: Mapped[dt.date | None] = mapped_column(sa.Date, nullable=True)
+    date_end: Mapped[dt.date | None] = mapped_column(sa.Date, nullable=True)
+    date = synonym("date_start")  # Хендлеры работают с одной датой проведения
     is_active: Mapped[bool] = mapped_column(default=True)
 
     fee: Mapped[float] = mapped_column(Float, default=0.0)
     qr_code_path: Mapped[str | None] = mapped_column(String(500), nullable=True)
+    poster_path: Mapped[str | None] = mapped_column(String(500), nullable=True)
     committee_chats: Mapped[dict | None] = mapped_column(JSON, nullable=True)
 
     organizer_id: Mapped[int] = mapped_column(ForeignKey("users.id"))
@@ -85,7 +269,12 @@ class Conference(Base):
         cascade="all, delete, delete-orphan"  # Автоматически удаляет все заявки при удалении конференции
     )
 
-class Application(Base):
+    __table_args__ = (
+        Index("ix_conferences_organizer_id", "organizer_id"),
+        Index("ix_conferences_active_date_start", "is_active", "date_start"),
+    )
+
+class Application(Timestamped, Base):
     __tablename__ = "applications"
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
@@ -100,6 +289,11 @@ class Application(Base):
     user: Mapped["User"] = relationship(back_populates="applications")
     conference: Mapped["Conference"] = relationship(back_populates="applications")
 
+    __table_args__ = (
+        Index("ix_applications_conference_status", "conference_id", "status"),
+        Index("ix_applications_user_status", "user_id", "status"),
+    )
+
 class ConferenceCreationRequest(Base):
     __tablename__ = "conference_creation_requests"
 
@@ -109,6 +303,10 @@ class ConferenceCreationRequest(Base):
     status: Mapped[str] = mapped_column(String(50), default="pending")
     appeal: Mapped[bool] = mapped_column(default=False)  # Флаг апелляции
 
+    __table_args__ = (
+        Index("ix_conference_creation_requests_status_appeal", "status", "appeal"),
+    )
+
 class ConferenceEditRequest(Base):
     __tablename__ = "conference_edit_requests"
 
@@ -118,19 +316,67 @@ class ConferenceEditRequest(Base):
     data: Mapped[dict] = mapped_column(JSON)
     status: Mapped[str] = mapped_column(String(50), default="pending")
 
-class SupportRequest(Base):
+    __table_args__ = (
+        Index("ix_conference_edit_requests_pending", "id", sqlite_where=sa.text("status = 'pending'")),
+    )
+
+class SupportRequest(Timestamped, Base):
     __tablename__ = "support_requests"
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     user_id: Mapped[int] = mapped_column(ForeignKey("users.id"))
     message: Mapped[str] = mapped_column(Text)
+    screenshot_path: Mapped[str | None] = mapped_column(String(500), nullable=True)
     status: Mapped[str] = mapped_column(String(50), default="pending")
     response: Mapped[str | None] = mapped_column(Text, nullable=True)
 
     user: Mapped["User"] = relationship(back_populates="support_requests")
 
+    __table_args__ = (
+        Index("ix_support_requests_status", "status"),
+    )
+
+# Холодный архив: завершённые заявки прошедших конференций и закрытые обращения.
+# Строки переносятся фоновым архиватором с сохранением id
+class ArchivedApplication(Base):
+    __tablename__ = "applications_archive"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"))
+    conference_id: Mapped[int] = mapped_column(ForeignKey("conferences.id"))
+
+    committee: Mapped[str | None] = mapped_column(String(100), nullable=True)
+    status: Mapped[str] = mapped_column(String(50))
+    payment_screenshot: Mapped[str | None] = mapped_column(String(500), nullable=True)
+    reject_reason: Mapped[str | None] = mapped_column(Text, nullable=True)
+    created_at: Mapped[float | None] = mapped_column(Float, nullable=True)
+    updated_at: Mapped[float | None] = mapped_column(Float, nullable=True)
+    archived_at: Mapped[dt.date] = mapped_column(sa.Date, default=dt.date.today)
+
+    user: Mapped["User"] = relationship()
+    conference: Mapped["Conference"] = relationship()
+
+    __table_args__ = (
+        Index("ix_applications_archive_conference", "conference_id"),
+    )
+
+class ArchivedSupportRequest(Base):
+    __tablename__ = "support_requests_archive"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"))
+    message: Mapped[str] = mapped_column(Text)
+    screenshot_path: Mapped[str | None] = mapped_column(String(500), nullable=True)
+    status: Mapped[str] = mapped_column(String(50))
+    response: Mapped[str | None] = mapped_column(Text, nullable=True)
+    created_at: Mapped[float | None] = mapped_column(Float, nullable=True)
+    updated_at: Mapped[float | None] = mapped_column(Float, nullable=True)
+    archived_at: Mapped[dt.date] = mapped_column(sa.Date, default=dt.date.today)
+
+    user: Mapped["User"] = relationship()
+
 # Новая модель: удалённые конференции (для экспорта Глав Тех Спец)
-class DeletedConference(Base):
+class DeletedConference(Timestamped, Base):
     __tablename__ = "deleted_conferences"
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
@@ -140,38 +386,630 @@ class DeletedConference(Base):
     reason: Mapped[str] = mapped_column(Text)
     deleted_at: Mapped[str] = mapped_column(String(50))  # Дата удаления
 
+# Рассылки организаторов: задание и его получатели (для продолжения после перезапуска)
+class BroadcastJob(Base):
+    __tablename__ = "broadcast_jobs"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    conference_id: Mapped[int] = mapped_column(Integer)
+    text: Mapped[str] = mapped_column(Text)
+    status: Mapped[str] = mapped_column(String(20), default="running")  # running / done
+    status_chat_id: Mapped[int] = mapped_column(BigInteger)  # Чат организатора с сообщением о прогрессе
+    status_message_id: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    total: Mapped[int] = mapped_column(Integer, default=0)
+
+    __table_args__ = (
+        Index("ix_broadcast_jobs_running", "id", sqlite_where=sa.text("status = 'running'")),
+    )
+
+class BroadcastRecipient(Base):
+    __tablename__ = "broadcast_recipients"
+
+    job_id: Mapped[int] = mapped_column(ForeignKey("broadcast_jobs.id"), primary_key=True)
+    chat_id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    status: Mapped[str] = mapped_column(String(20), default="pending")  # pending / delivered / blocked / failed
+
+    __table_args__ = (
+        Index("ix_broadcast_recipients_job_status", "job_id", "status"),
+    )
+
+# Transactional outbox: уведомления пишутся в той же транзакции, что и изменение,
+# и отправляются фоновым диспетчером (outbox.py)
+class OutboxMessage(Base):
+    __tablename__ = "outbox"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    chat_id: Mapped[int] = mapped_column(BigInteger)
+    text: Mapped[str] = mapped_column(Text)
+    reply_markup: Mapped[dict | None] = mapped_column(JSON, nullable=True)
+    photo: Mapped[str | None] = mapped_column(String(500), nullable=True)  # file_id или путь к файлу
+    dedup_key: Mapped[str | None] = mapped_column(String(200), unique=True, nullable=True)
+    status: Mapped[str] = mapped_column(String(20), default="pending")  # pending / sent / blocked / failed
+    attempts: Mapped[int] = mapped_column(Integer, default=0)
+    next_attempt_at: Mapped[float] = mapped_column(Float)
+    created_at: Mapped[float] = mapped_column(Float)
+
+    __table_args__ = (
+        Index("ix_outbox_pending", "next_attempt_at", sqlite_where=sa.text("status = 'pending'")),
+        Index("ix_outbox_created", "created_at"),
+    )
+
+# Состояния FSM (fsm_storage.py): ключ bot:chat:user:thread:business:destiny -> состояние и данные формы
+class FsmState(Base):
+    __tablename__ = "fsm_states"
+
+    key: Mapped[str] = mapped_column(String(200), primary_key=True)
+    state: Mapped[str | None] = mapped_column(String(200), nullable=True)
+    data: Mapped[dict] = mapped_column(JSON, default=dict)
+    updated_at: Mapped[float] = mapped_column(Float, index=True)
+
+# Общий бэкенд state_store.py: пагинация и прочее короткоживущее состояние экранов
+class StoredState(Base):
+    __tablename__ = "state_store"
+
+    key: Mapped[str] = mapped_column(String(200), primary_key=True)
+    value: Mapped[str] = mapped_column(Text)
+    expires_at: Mapped[float] = mapped_column(Float, index=True)
+
+# Реестр отправленных картинок: локальный файл -> file_id Telegram (media_cache.py).
+# size/mtime_ns — быстрая проверка, что файл не менялся; sha256 — переиспользование между путями
+class MediaFile(Base):
+    __tablename__ = "media_files"
+
+    path: Mapped[str] = mapped_column(String(500), primary_key=True)
+    sha256: Mapped[str] = mapped_column(String(64), index=True)
+    size: Mapped[int] = mapped_column(Integer)
+    mtime_ns: Mapped[int] = mapped_column(BigInteger)
+    file_id: Mapped[str] = mapped_column(String(200))
+
+# Отметка выгрузки изменений: updated_at, до которого запросивший уже получил данные
+class ExportWatermark(Base):
+    __tablename__ = "export_watermarks"
+
+    telegram_id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    export: Mapped[str] = mapped_column(String(50), primary_key=True)
+    watermark: Mapped[float] = mapped_column(Float)
+
+# Состояние бота (одна строка id=1): приостановка из админки и её причина
+class BotStatus(Base):
+    __tablename__ = "bot_status"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    is_paused: Mapped[bool] = mapped_column(default=False)
+    reason: Mapped[str | None] = mapped_column(Text, nullable=True)
+    changed_by: Mapped[int | None] = mapped_column(BigInteger, nullable=True)
+
+# Материализованные счётчики для экрана статистики, ведутся триггерами
+class StatCounter(Base):
+    __tablename__ = "stat_counters"
+
+    name: Mapped[str] = mapped_column(String(100), primary_key=True)
+    value: Mapped[int] = mapped_column(Integer, default=0)
+
+def _bump(name_sql: str, delta_sql: str) -> str:
+    return (
+        f"INSERT INTO stat_counters (name, value) VALUES ({name_sql}, {delta_sql}) "
+        "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value;"
+    )
+
+def _moderation_pending(row: str) -> str:
+    return f"({row}.status = 'pending' OR ({row}.status = 'rejected' AND {row}.appeal = 1))"
+
+TRIGGERS = [
+    f"""CREATE TRIGGER IF NOT EXISTS trg_stats_users_insert AFTER INSERT ON users BEGIN
+        {_bump("'users'", "1")}
+        {_bump("'users_banned'", "IFNULL(NEW.is_banned, 0)")}
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS trg_stats_users_delete AFTER DELETE ON users BEGIN
+        {_bump("'users'", "-1")}
+        {_bump("'users_banned'", "-IFNULL(OLD.is_banned, 0)")}
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS trg_stats_users_ban AFTER UPDATE OF is_banned ON users
+    WHEN NEW.is_banned IS NOT OLD.is_banned BEGIN
+        {_bump("'users_banned'", "IFNULL(NEW.is_banned, 0) - IFNULL(OLD.is_banned, 0)")}
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS trg_stats_conferences_insert AFTER INSERT ON conferences BEGIN
+        {_bump("'conferences_active'", "IFNULL(NEW.is_active, 0)")}
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS trg_stats_conferences_delete AFTER DELETE ON conferences BEGIN
+        {_bump("'conferences_active'", "-IFNULL(OLD.is_active, 0)")}
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS trg_stats_conferences_active AFTER UPDATE OF is_active ON conferences
+    WHEN NEW.is_active IS NOT OLD.is_active BEGIN
+        {_bump("'conferences_active'", "IFNULL(NEW.is_active, 0) - IFNULL(OLD.is_active, 0)")}
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS trg_stats_applications_insert AFTER INSERT ON applications BEGIN
+        {_bump("'applications'", "1")}
+        {_bump("'applications:' || NEW.status", "1")}
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS trg_stats_applications_delete AFTER DELETE ON applications BEGIN
+        {_bump("'applications'", "-1")}
+        {_bump("'applications:' || OLD.status", "-1")}
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS trg_stats_applications_status AFTER UPDATE OF status ON applications
+    WHEN NEW.status IS NOT OLD.status BEGIN
+        {_bump("'applications:' || OLD.status", "-1")}
+        {_bump("'applications:' || NEW.status", "1")}
+    END""",
+    # Перенос в архив не должен менять статистику: архивные заявки считаются вместе с живыми
+    f"""CREATE TRIGGER IF NOT EXISTS trg_stats_applications_archive_insert AFTER INSERT ON applications_archive BEGIN
+        {_bump("'applications'", "1")}
+        {_bump("'applications:' || NEW.status", "1")}
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS trg_stats_applications_archive_delete AFTER DELETE ON applications_archive BEGIN
+        {_bump("'applications'", "-1")}
+        {_bump("'applications:' || OLD.status", "-1")}
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS trg_stats_creation_requests_insert AFTER INSERT ON conference_creation_requests BEGIN
+        {_bump("'moderation_pending'", _moderation_pending("NEW"))}
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS trg_stats_creation_requests_delete AFTER DELETE ON conference_creation_requests BEGIN
+        {_bump("'moderation_pending'", "-" + _moderation_pending("OLD"))}
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS trg_stats_creation_requests_update AFTER UPDATE OF status, appeal ON conference_creation_requests BEGIN
+        {_bump("'moderation_pending'", _moderation_pending("NEW") + " - " + _moderation_pending("OLD"))}
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS trg_stats_edit_requests_insert AFTER INSERT ON conference_edit_requests BEGIN
+        {_bump("'moderation_pending'", "(NEW.status = 'pending')")}
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS trg_stats_edit_requests_delete AFTER DELETE ON conference_edit_requests BEGIN
+        {_bump("'moderation_pending'", "-(OLD.status = 'pending')")}
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS trg_stats_edit_requests_update AFTER UPDATE OF status ON conference_edit_requests BEGIN
+        {_bump("'moderation_pending'", "(NEW.status = 'pending') - (OLD.status = 'pending')")}
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS trg_stats_support_insert AFTER INSERT ON support_requests BEGIN
+        {_bump("'support_pending'", "(NEW.status = 'pending')")}
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS trg_stats_support_delete AFTER DELETE ON support_requests BEGIN
+        {_bump("'support_pending'", "-(OLD.status = 'pending')")}
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS trg_stats_support_update AFTER UPDATE OF status ON support_requests BEGIN
+        {_bump("'support_pending'", "(NEW.status = 'pending') - (OLD.status = 'pending')")}
+    END""",
+]
+
+# Полнотекстовый индекс каталога (FTS5, external content поверх conferences)
+VIRTUAL_TABLES = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS conferences_fts USING fts5(
+        name, description, city,
+        content='conferences', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )""",
+    # Справочник пользователей для модераторов: триграммы дают поиск по подстроке ФИО/username
+    """CREATE VIRTUAL TABLE IF NOT EXISTS users_fts USING fts5(
+        full_name, username,
+        content='users', content_rowid='id',
+        tokenize='trigram'
+    )""",
+]
+
+TRIGGERS += [
+    """CREATE TRIGGER IF NOT EXISTS trg_conferences_fts_insert AFTER INSERT ON conferences BEGIN
+        INSERT INTO conferences_fts (rowid, name, description, city)
+        VALUES (NEW.id, NEW.name, NEW.description, NEW.city);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS trg_conferences_fts_delete AFTER DELETE ON conferences BEGIN
+        INSERT INTO conferences_fts (conferences_fts, rowid, name, description, city)
+        VALUES ('delete', OLD.id, OLD.name, OLD.description, OLD.city);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS trg_conferences_fts_update AFTER UPDATE OF name, description, city ON conferences BEGIN
+        INSERT INTO conferences_fts (conferences_fts, rowid, name, description, city)
+        VALUES ('delete', OLD.id, OLD.name, OLD.description, OLD.city);
+        INSERT INTO conferences_fts (rowid, name, description, city)
+        VALUES (NEW.id, NEW.name, NEW.description, NEW.city);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS trg_users_fts_insert AFTER INSERT ON users BEGIN
+        INSERT INTO users_fts (rowid, full_name, username)
+        VALUES (NEW.id, NEW.full_name, NEW.username);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS trg_users_fts_delete AFTER DELETE ON users BEGIN
+        INSERT INTO users_fts (users_fts, rowid, full_name, username)
+        VALUES ('delete', OLD.id, OLD.full_name, OLD.username);
+    END""",
+    # Upsert в get_or_create_user перезаписывает username на каждом промахе кэша —
+    # индекс трогаем только при реальном изменении
+    """CREATE TRIGGER IF NOT EXISTS trg_users_fts_update AFTER UPDATE OF full_name, username ON users
+    WHEN OLD.full_name IS NOT NEW.full_name OR OLD.username IS NOT NEW.username BEGIN
+        INSERT INTO users_fts (users_fts, rowid, full_name, username)
+        VALUES ('delete', OLD.id, OLD.full_name, OLD.username);
+        INSERT INTO users_fts (rowid, full_name, username)
+        VALUES (NEW.id, NEW.full_name, NEW.username);
+    END""",
+]
+
+# created_at/updated_at. unixepoch('subsec') нет до SQLite 3.42 — считаем через julianday.
+# Обновление трогает updated_at, только если изменилась хоть одна колонка: upsert в
+# get_or_create_user без изменений не должен попадать в выгрузку изменений
+_NOW = "((julianday('now') - 2440587.5) * 86400.0)"
+TIMESTAMPED_TABLES = ("users", "conferences", "applications", "support_requests", "deleted_conferences")
+
+def _timestamp_triggers(table: str) -> list[str]:
+    changed = " OR ".join(
+        f"NEW.{column.name} IS NOT OLD.{column.name}"
+        for column in Base.metadata.tables[table].columns
+        if column.name not in ("created_at", "updated_at")
+    )
+    return [
+        f"""CREATE TRIGGER IF NOT EXISTS trg_{table}_created AFTER INSERT ON {table}
+        WHEN NEW.created_at IS NULL OR NEW.updated_at IS NULL BEGIN
+            UPDATE {table} SET created_at = IFNULL(NEW.created_at, {_NOW}),
+                updated_at = IFNULL(NEW.updated_at, {_NOW})
+            WHERE rowid = NEW.rowid;
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS trg_{table}_touch AFTER UPDATE ON {table}
+        WHEN NEW.updated_at IS OLD.updated_at AND ({changed}) BEGIN
+            UPDATE {table} SET updated_at = {_NOW} WHERE rowid = NEW.rowid;
+        END""",
+    ]
+
+for _table in TIMESTAMPED_TABLES:
+    TRIGGERS += _timestamp_triggers(_table)
+
+def create_virtual_tables(sync_conn):
+    for ddl in VIRTUAL_TABLES:
+        sync_conn.exec_driver_sql(ddl)
+
+def rebuild_conferences_fts(sync_conn):
+    sync_conn.exec_driver_sql("INSERT INTO conferences_fts (conferences_fts) VALUES ('rebuild')")
+
+def rebuild_users_fts(sync_conn):
+    sync_conn.exec_driver_sql("INSERT INTO users_fts (users_fts) VALUES ('rebuild')")
+
+def create_triggers(sync_conn):
+    for ddl in TRIGGERS:
+        sync_conn.exec_driver_sql(ddl)
+
+# Полный пересчёт счётчиков (для баз, созданных до появления триггеров)
+def rebuild_stat_counters(sync_conn):
+    sync_conn.exec_driver_sql("DELETE FROM stat_counters")
+    sync_conn.exec_driver_sql(f"""
+        WITH all_applications AS (
+            SELECT status FROM applications UNION ALL SELECT status FROM applications_archive
+        )
+        INSERT INTO stat_counters (name, value)
+        SELECT 'users', COUNT(*) FROM users
+        UNION ALL SELECT 'users_banned', COUNT(*) FROM users WHERE is_banned = 1
+        UNION ALL SELECT 'conferences_active', COUNT(*) FROM conferences WHERE is_active = 1
+        UNION ALL SELECT 'applications', COUNT(*) FROM all_applications
+        UNION ALL SELECT 'applications:' || status, COUNT(*) FROM all_applications GROUP BY status
+        UNION ALL SELECT 'moderation_pending',
+            (SELECT COUNT(*) FROM conference_creation_requests r WHERE {_moderation_pending("r")})
+            + (SELECT COUNT(*) FROM conference_edit_requests WHERE status = 'pending')
+        UNION ALL SELECT 'support_pending', COUNT(*) FROM support_requests WHERE status = 'pending'
+    """)
+
 async def init_db():
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
-
-async def get_or_create_user(telegram_id: int, full_name: str | None = None) -> User:
+        await conn.run_sync(create_virtual_tables)
+        await conn.run_sync(run_migrations)
+        await conn.run_sync(create_missing_indexes)
+        await conn.run_sync(create_triggers)
+
+    await seed_privileged_roles()
+
+# Разбор даты конференции из ввода/старых строковых значений
+DATE_FORMATS = ("%Y-%m-%d", "%d.%m.%Y", "%d/%m/%Y", "%Y-%m-%d %H:%M:%S")
+
+def parse_date(value) -> dt.date | None:
+    if value is None or isinstance(value, dt.date):
+        return value
+    value = str(value).strip()
+    for fmt in DATE_FORMATS:
+        try:
+            return dt.datetime.strptime(value, fmt).date()
+        except ValueError:
+            continue
+    return None
+
+# Разовые миграции существующих баз; номер последней применённой хранится в PRAGMA user_version
+def _migrate_conference_dates(sync_conn):
+    # Строки вида 'ДД.ММ.ГГГГ' и прочий мусор -> ISO-дата или NULL
+    rows = sync_conn.exec_driver_sql(
+        "SELECT id, date_start, date_end FROM conferences "
+        "WHERE date_start NOT GLOB '[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9]' "
+        "OR date_end NOT GLOB '[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9]'"
+    ).all()
+    for conf_id, date_start, date_end in rows:
+        values = [parse_date(date_start), parse_date(date_end)]
+        sync_conn.exec_driver_sql(
+            "UPDATE conferences SET date_start = ?, date_end = ? WHERE id = ?",
+            tuple(v.isoformat() if v else None for v in values) + (conf_id,)
+        )
+    # Частичный индекс по is_active заменён составным (is_active, date_start)
+    sync_conn.exec_driver_sql("DROP INDEX IF EXISTS ix_conferences_active")
+
+# ALTER TABLE ADD COLUMN для старых баз; на новой базе колонку уже создал create_all
+def _add_column(sync_conn, table: str, column: str, ddl: str):
+    columns = {row[1] for row in sync_conn.exec_driver_sql(f"PRAGMA table_info({table})")}
+    if column not in columns:
+        sync_conn.exec_driver_sql(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}")
+
+def _migrate_users_username(sync_conn):
+    _add_column(sync_conn, "users", "username", "VARCHAR(64) COLLATE NOCASE")
+    rebuild_users_fts(sync_conn)
+
+def _migrate_media_columns(sync_conn):
+    _add_column(sync_conn, "conferences", "poster_path", "VARCHAR(500)")
+    _add_column(sync_conn, "support_requests", "screenshot_path", "VARCHAR(500)")
+    _add_column(sync_conn, "support_requests_archive", "screenshot_path", "VARCHAR(500)")
+
+def _migrate_timestamps(sync_conn):
+    for table in TIMESTAMPED_TABLES + ("applications_archive", "support_requests_archive"):
+        _add_column(sync_conn, table, "created_at", "FLOAT")
+        _add_column(sync_conn, table, "updated_at", "FLOAT")
+    # Время создания старых строк неизвестно — считаем их созданными сейчас
+    for table in TIMESTAMPED_TABLES:
+        sync_conn.exec_driver_sql(
+            f"UPDATE {table} SET created_at = {_NOW}, updated_at = {_NOW} WHERE created_at IS NULL"
+        )
+
+MIGRATIONS = [
+    _migrate_conference_dates,
+    rebuild_stat_counters,
+    rebuild_conferences_fts,
+    _migrate_users_username,
+    _migrate_media_columns,
+    _migrate_timestamps,
+]
+
+def run_migrations(sync_conn):
+    version = sync_conn.exec_driver_sql("PRAGMA user_version").scalar()
+    for number, migration in enumerate(MIGRATIONS, start=1):
+        if number > version:
+            migration(sync_conn)
+    sync_conn.exec_driver_sql(f"PRAGMA user_version = {len(MIGRATIONS)}")
+
+# create_all пропускает уже существующие таблицы вместе с их индексами,
+# поэтому для старых баз достраиваем недостающие индексы отдельно
+def create_missing_indexes(sync_conn):
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(sync_conn, checkfirst=True)
+
+# Один запрос INSERT ... ON CONFLICT DO UPDATE ... RETURNING вместо SELECT + INSERT + commit'ов.
+# Время создания ставим в самом INSERT: RETURNING не видит того, что допишет AFTER-триггер
+async def get_or_create_user(telegram_id: int, full_name: str | None = None, username: str | None = None) -> User:
+    stmt = sqlite_insert(User).values(
+        telegram_id=telegram_id,
+        full_name=full_name or "Не указано",
+        username=username,
+        role=Role.PARTICIPANT.value,
+        created_at=sa.literal_column(_NOW),
+        updated_at=sa.literal_column(_NOW)
+    )
+    stmt = (
+        stmt.on_conflict_do_update(
+            index_elements=[User.telegram_id],
+            set_={
+                "role": func.coalesce(User.role, Role.PARTICIPANT.value),
+                "username": func.coalesce(stmt.excluded.username, User.username),
+            }
+        )
+        .returning(User)
+    )
     async with AsyncSessionLocal() as session:
-        result = await session.execute(select(User).where(User.telegram_id == telegram_id))
-        user = result.scalar_one_or_none()
-
-        if not user:
-            user = User(
-                telegram_id=telegram_id,
-                full_name=full_name or "Не указано",
-                role=Role.PARTICIPANT.value
-            )
-            session.add(user)
-            await session.commit()
-            await session.refresh(user)
-        else:
-            if not user.role:
-                user.role = Role.PARTICIPANT.value
+        result = await session.scalars(stmt, execution_options={"populate_existing": True})
+        user = result.one()
+        await session.commit()
+        return user
 
-        # Автоматическое назначение ролей по ID
-        if telegram_id in CHIEF_ADMIN_IDS:
-            user.role = Role.CHIEF_ADMIN.value
-            await session.commit()
+# Роли по ID из конфига назначаются один раз при старте, а не на каждый апдейт
+async def seed_privileged_roles():
+    roles = {telegram_id: Role.CHIEF_ADMIN.value for telegram_id in CHIEF_ADMIN_IDS}
+    roles[TECH_SPECIALIST_ID] = Role.CHIEF_TECH.value
 
-        if telegram_id == TECH_SPECIALIST_ID:
-            user.role = Role.CHIEF_TECH.value
-            await session.commit()
+    async with engine.begin() as conn:
+        for telegram_id, role in roles.items():
+            stmt = sqlite_insert(User).values(telegram_id=telegram_id, full_name="Не указано", role=role)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[User.telegram_id],
+                set_={"role": stmt.excluded.role}
+            )
+            await conn.execute(stmt)
+
+conferences_fts = sa.table("conferences_fts", sa.column("rowid"))
+
+# Запрос FTS5 из произвольного текста: каждое слово — префиксный токен, все через AND
+def build_fts_query(text: str) -> str | None:
+    tokens = re.findall(r"\w+", text.lower())
+    if not tokens:
+        return None
+    return " ".join(f'"{token}"*' for token in tokens[:10])
+
+# Поиск предстоящих конференций с ранжированием bm25 (название важнее города и описания).
+# Возвращает страницу и признак следующей страницы
+async def search_conferences(text: str, limit: int, offset: int = 0) -> tuple[list[Conference], bool]:
+    match = build_fts_query(text)
+    if match is None:
+        return [], False
+
+    stmt = (
+        select(Conference)
+        .join(conferences_fts, conferences_fts.c.rowid == Conference.id)
+        .where(
+            sa.literal_column("conferences_fts").op("MATCH")(match),
+            Conference.is_active == True,
+            Conference.date_start >= dt.date.today()
+        )
+        .order_by(sa.text("bm25(conferences_fts, 10.0, 1.0, 5.0)"))
+        .limit(limit + 1)
+        .offset(offset)
+    )
+    async with AsyncSessionLocal(readonly=True) as session:
+        conferences = (await session.execute(stmt)).scalars().all()
+    return conferences[:limit], len(conferences) > limit
+
+# Страница каталога предстоящих конференций по ключу (date_start, id) без OFFSET —
+# оба запроса идут по индексу (is_active, date_start) и не зависят от номера страницы.
+# Возвращает страницу и ключи начала предыдущей и следующей страниц
+async def conference_catalog_page(
+    anchor: tuple[dt.date, int] | None, limit: int
+) -> tuple[list[Conference], tuple[dt.date, int] | None, tuple[dt.date, int] | None]:
+    upcoming = (Conference.is_active == True, Conference.date_start >= dt.date.today())
+    key = sa.tuple_(Conference.date_start, Conference.id)
+
+    stmt = select(Conference).where(*upcoming).order_by(Conference.date_start, Conference.id).limit(limit + 1)
+    if anchor:
+        stmt = stmt.where(key >= sa.tuple_(*anchor))
+
+    async with AsyncSessionLocal(readonly=True) as session:
+        conferences = (await session.execute(stmt)).scalars().all()
+
+        prev_anchor = None
+        if anchor:
+            previous = (await session.execute(
+                select(Conference.date_start, Conference.id)
+                .where(*upcoming, key < sa.tuple_(*anchor))
+                .order_by(Conference.date_start.desc(), Conference.id.desc())
+                .limit(limit)
+            )).all()
+            if previous:
+                prev_anchor = tuple(previous[-1])
+
+    next_anchor = (conferences[limit].date_start, conferences[limit].id) if len(conferences) > limit else None
+    return conferences[:limit], prev_anchor, next_anchor
+
+# Все обращения в техподдержку (очередь + архив) с автором одним запросом, по id — для выгрузок
+def support_requests_export_query() -> sa.Select:
+    columns = lambda model: (
+        model.id, model.user_id, model.message, model.screenshot_path, model.status, model.response
+    )
+    requests = sa.union_all(
+        select(*columns(SupportRequest)), select(*columns(ArchivedSupportRequest))
+    ).subquery()
+    return (
+        select(
+            requests.c.id, User.full_name, User.telegram_id, requests.c.message,
+            requests.c.screenshot_path, requests.c.status, requests.c.response
+        )
+        .outerjoin(User, User.id == requests.c.user_id)
+        .order_by(requests.c.id)
+    )
 
-        return user
+# Отметка последней выгрузки изменений для пользователя; None — выгрузок ещё не было
+async def get_export_watermark(telegram_id: int, export: str) -> float | None:
+    async with AsyncSessionLocal(readonly=True) as session:
+        return await session.scalar(
+            select(ExportWatermark.watermark)
+            .where(ExportWatermark.telegram_id == telegram_id, ExportWatermark.export == export)
+        )
+
+# Отметка только растёт: запоздавшая доставка старого задания её не откатит
+async def set_export_watermark(telegram_id: int, export: str, watermark: float):
+    async def upsert(session):
+        stmt = sqlite_insert(ExportWatermark).values(telegram_id=telegram_id, export=export, watermark=watermark)
+        await session.execute(stmt.on_conflict_do_update(
+            index_elements=[ExportWatermark.telegram_id, ExportWatermark.export],
+            set_={"watermark": func.max(ExportWatermark.watermark, stmt.excluded.watermark)}
+        ))
+    await run_write(upsert)
+
+# Строки может ещё не быть — тогда бот работает
+async def get_bot_status() -> BotStatus:
+    async with AsyncSessionLocal(readonly=True) as session:
+        status = await session.get(BotStatus, 1)
+        return status or BotStatus(id=1, is_paused=False)
+
+async def set_bot_paused(paused: bool, reason: str | None, changed_by: int):
+    async def upsert(session):
+        stmt = sqlite_insert(BotStatus).values(id=1, is_paused=paused, reason=reason, changed_by=changed_by)
+        await session.execute(stmt.on_conflict_do_update(
+            index_elements=[BotStatus.id],
+            set_={"is_paused": stmt.excluded.is_paused, "reason": stmt.excluded.reason, "changed_by": stmt.excluded.changed_by}
+        ))
+    await run_write(upsert)
+
+users_fts = sa.table("users_fts", sa.column("rowid"))
+
+# Поиск пользователя для модераторов: ID, точный @username, затем триграммы по ФИО/username.
+# Возвращает страницу и признак следующей страницы
+async def find_users(text: str, limit: int, offset: int = 0) -> tuple[list[User], bool]:
+    text = text.strip().lstrip("@")
+    if not text:
+        return [], False
+
+    async with AsyncSessionLocal(readonly=True) as session:
+        if text.isdigit():
+            user = await session.scalar(select(User).where(User.telegram_id == int(text)))
+            return ([user] if user and offset == 0 else []), False
+
+        # Точное совпадение username однозначно — по индексу NOCASE
+        user = await session.scalar(select(User).where(User.username == text))
+        if user:
+            return ([user] if offset == 0 else []), False
+
+        words = [word for word in text.split() if len(word) >= 3]
+        if words:
+            # Триграммный токенизатор ищет подстроку; каждое слово — отдельная фраза, все через AND
+            match = " ".join('"' + word.replace('"', '""') + '"' for word in words[:10])
+            stmt = (
+                select(User)
+                .join(users_fts, users_fts.c.rowid == User.id)
+                .where(sa.literal_column("users_fts").op("MATCH")(match))
+                .order_by(sa.text("bm25(users_fts)"), User.id)
+            )
+        else:
+            # Короче трёх символов триграммы не работают — префикс username по индексу
+            pattern = text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+            stmt = select(User).where(User.username.like(pattern, escape="\\")).order_by(User.username)
+
+        users = (await session.execute(stmt.limit(limit + 1).offset(offset))).scalars().all()
+    return users[:limit], len(users) > limit
+
+# Перенос в архив: заявки с итоговым статусом после окончания конференции
+# и закрытые обращения. Пачками, чтобы не держать блокировку записи долго
+ARCHIVED_APPLICATION_STATUSES = ("rejected", "link_sent")
+# resolved — закрыто в техподдержке, answered — ответ через /reply_support или форму ответа
+ARCHIVED_SUPPORT_STATUSES = ("resolved", "answered")
+
+def _archive_rows(sync_conn, hot: sa.Table, cold: sa.Table, ids_query) -> int:
+    ids = sync_conn.execute(ids_query.limit(ARCHIVE_BATCH_SIZE)).scalars().all()
+    if not ids:
+        return 0
+    columns = [column.name for column in hot.columns]
+    sync_conn.execute(
+        cold.insert().from_select(columns, select(*hot.columns).where(hot.c.id.in_(ids)))
+    )
+    sync_conn.execute(hot.delete().where(hot.c.id.in_(ids)))
+    return len(ids)
+
+def _archive_applications_batch(sync_conn) -> int:
+    ended = func.coalesce(Conference.date_end, Conference.date_start) < dt.date.today()
+    ids_query = (
+        select(Application.id)
+        .join(Conference, Conference.id == Application.conference_id)
+        .where(Application.status.in_(ARCHIVED_APPLICATION_STATUSES), ended)
+    )
+    return _archive_rows(sync_conn, Application.__table__, ArchivedApplication.__table__, ids_query)
+
+def _archive_support_batch(sync_conn) -> int:
+    ids_query = select(SupportRequest.id).where(SupportRequest.status.in_(ARCHIVED_SUPPORT_STATUSES))
+    return _archive_rows(sync_conn, SupportRequest.__table__, ArchivedSupportRequest.__table__, ids_query)
+
+async def archive_finished() -> tuple[int, int]:
+    totals = []
+    for batch in (_archive_applications_batch, _archive_support_batch):
+        total = 0
+        while True:
+            async with engine.begin() as conn:
+                moved = await conn.run_sync(batch)
+            total += moved
+            if moved < ARCHIVE_BATCH_SIZE:
+                break
+        totals.append(total)
+    return tuple(totals)
+
+async def run_archiver(interval: float):
+    while True:
+        try:
+            applications, support = await archive_finished()
+            if applications or support:
+                logging.info("Архив: перенесено заявок %s, обращений %s", applications, support)
+        except Exception:
+            logging.exception("Ошибка архивации")
+        await asyncio.sleep(interval)
 
 class ApplicationState:
     pass
\ No newline at end of file
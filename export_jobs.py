@@ -0,0 +1,478 @@
+import asyncio
+import contextvars
+import datetime as dt
+import itertools
+import logging
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field
+from typing import Callable
+
+import sqlalchemy as sa
+from aiogram import Bot
+from aiogram.exceptions import TelegramAPIError
+from aiogram.types import FSInputFile
+from sqlalchemy import event, func, select, union_all
+from sqlalchemy.pool import NullPool
+
+from config import DB_PATH, EXPORT_BATCH_SIZE, EXPORT_WORKERS, EXPORT_DEDUP_WINDOW, EXPORT_PROGRESS_INTERVAL
+from database import (
+    Application, ArchivedApplication, Conference, DeletedConference, User,
+    set_export_watermark, support_requests_export_query
+)
+from exports import XlsxExport
+
+logger = logging.getLogger("export_jobs")
+
+# Процесс-воркер: сборка xlsx вне event loop
+_engine: sa.Engine | None = None
+_progress = None  # очередь (job_id, строк записано, строк всего) в основной процесс
+
+def _init_worker(progress):
+    global _engine, _progress
+    _progress = progress
+    _engine = sa.create_engine(f"sqlite:///{DB_PATH}", poolclass=NullPool)
+
+    @event.listens_for(_engine, "connect")
+    def setup(dbapi_connection, connection_record):
+        dbapi_connection.execute("PRAGMA query_only=ON;")
+        # BEGIN выдаём сами: pysqlite не открывает транзакцию под SELECT,
+        # и каждый запрос выгрузки видел бы свою версию базы
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(_engine, "begin")
+    def begin(conn):
+        conn.exec_driver_sql("BEGIN")
+
+# Сборка одного задания: все запросы идут в одной читающей транзакции — один снимок WAL,
+# листы и файлы выгрузки согласованы между собой, а писатель бота при этом не ждёт
+class _Build:
+    def __init__(self, job_id: int, conn: sa.Connection, directory: str):
+        self.job_id = job_id
+        self.conn = conn
+        self.directory = directory
+        self.total = 0
+        self.written = 0
+        self.files: list[tuple[str, str]] = []
+        self.watermark: float | None = None  # для выгрузок изменений: по какой updated_at собрано
+
+    # Заранее посчитать строки всех листов — для процентов в прогрессе
+    def plan(self, *statements: sa.Select) -> int:
+        self.total = sum(
+            self.conn.scalar(select(func.count()).select_from(stmt.subquery())) for stmt in statements
+        )
+        self._report()
+        return self.total
+
+    def rows(self, stmt: sa.Select):
+        result = self.conn.execute(stmt.execution_options(yield_per=EXPORT_BATCH_SIZE))
+        for partition in result.partitions():
+            yield from partition
+            self.written += len(partition)
+            self._report()
+
+    def save(self, export: XlsxExport, filename: str, caption: str):
+        export.save(os.path.join(self.directory, filename))
+        self.files.append((filename, caption))
+
+    # Отметка — самый свежий updated_at в снимке, а не текущее время: запись, которая
+    # идёт прямо сейчас и в снимок не попала, получит время позже и войдёт в следующую выгрузку.
+    # Ограничения: julianday('now') точен до миллисекунды, и запись, закоммиченная после снимка
+    # в ту же миллисекунду, что и последняя в нём, равна отметке и строгим > пропускается.
+    # Удаления видны только через deleted_conferences; пользователей бот не удаляет, а конференцию,
+    # ставшую неактивной без удаления, выгрузка изменений не покажет
+    def mark(self, since: float | None, *models):
+        self.watermark = max(
+            [since or 0.0] + [self.conn.scalar(select(func.max(model.updated_at))) or 0.0 for model in models]
+        )
+
+    def _report(self):
+        if _progress is not None:
+            _progress.put((self.job_id, self.written, self.total))
+
+USERS_HEADERS = ("Telegram ID", "Username", "ФИО", "Роль", "Забанен", "Причина бана")
+
+# since — выгрузка изменений: только строки с updated_at новее отметки
+def _users_stmt(since: float | None = None) -> sa.Select:
+    stmt = select(
+        User.telegram_id, User.username, User.full_name, User.role, User.is_banned, User.ban_reason
+    ).order_by(User.id)
+    return stmt if since is None else stmt.where(User.updated_at > since)
+
+def _user_rows(rows):
+    for telegram_id, username, full_name, role, is_banned, ban_reason in rows:
+        yield telegram_id, username or "—", full_name or "—", role, "Да" if is_banned else "Нет", ban_reason or "—"
+
+def _active_conferences_stmt(since: float | None = None) -> sa.Select:
+    # Организатор — тем же запросом, без обращения за ним на каждую конференцию
+    stmt = (
+        select(
+            Conference.id, Conference.name, User.full_name, User.telegram_id,
+            Conference.city, Conference.date_start, Conference.fee
+        )
+        .outerjoin(User, User.id == Conference.organizer_id)
+        .where(Conference.is_active == True)
+        .order_by(Conference.id)
+    )
+    return stmt if since is None else stmt.where(Conference.updated_at > since)
+
+def _deleted_conferences_stmt(since: float | None = None) -> sa.Select:
+    stmt = select(
+        DeletedConference.conference_name, DeletedConference.organizer_telegram_id,
+        DeletedConference.deleted_by_telegram_id, DeletedConference.reason, DeletedConference.deleted_at
+    ).order_by(DeletedConference.id)
+    return stmt if since is None else stmt.where(DeletedConference.updated_at > since)
+
+def _organizer_name(full_name, telegram_id):
+    return full_name or telegram_id or "—"
+
+# Файлы выгрузки изменений отличаются именем и подписью — чтобы их не путали с полными
+def _variant(filename: str, caption: str, since: float | None) -> tuple[str, str]:
+    if since is None:
+        return filename, caption
+    name, extension = os.path.splitext(filename)
+    moment = dt.datetime.fromtimestamp(since).strftime("%d.%m.%Y %H:%M")
+    return f"{name}_changes{extension}", f"{caption} — изменения с {moment}"
+
+# Отметка ставится и полной выгрузкой: следующая выгрузка изменений начнётся с неё
+def _bot_data_tech(build: _Build, since: float | None = None):
+    users, conferences, deleted = _users_stmt(since), _active_conferences_stmt(since), _deleted_conferences_stmt(since)
+    build.mark(since, User, Conference, DeletedConference)
+    if not build.plan(users, conferences, deleted) and since is not None:
+        return
+
+    export = XlsxExport()
+    export.add_sheet("Пользователи", USERS_HEADERS, _user_rows(build.rows(users)))
+    build.save(export, *_variant("tech_export_users_with_bans.xlsx", "1/3 Экспорт: Пользователи (с банами)", since))
+
+    export = XlsxExport()
+    export.add_sheet(
+        "Активные конференции",
+        ("ID", "Название", "Организатор", "Город", "Дата проведения", "Оргвзнос"),
+        (
+            (conf_id, name, _organizer_name(full_name, telegram_id), city or "Онлайн", date_start, fee)
+            for conf_id, name, full_name, telegram_id, city, date_start, fee in build.rows(conferences)
+        )
+    )
+    build.save(export, *_variant("tech_active_conferences.xlsx", "2/3 Экспорт: Активные конференции", since))
+
+    export = XlsxExport()
+    export.add_sheet(
+        "Удалённые конференции",
+        ("Название конференции", "Организатор ID", "Удалил (ID)", "Причина удаления", "Дата удаления"),
+        build.rows(deleted)
+    )
+    build.save(export, *_variant("tech_deleted_conferences.xlsx", "3/3 Экспорт: Удалённые конференции", since))
+
+def _bot_data_admin(build: _Build, since: float | None = None):
+    users, conferences, deleted = _users_stmt(since), _active_conferences_stmt(since), _deleted_conferences_stmt(since)
+    build.mark(since, User, Conference, DeletedConference)
+    if not build.plan(users, conferences, deleted) and since is not None:
+        return
+
+    export = XlsxExport()
+    export.add_sheet("Пользователи", USERS_HEADERS, _user_rows(build.rows(users)))
+    build.save(export, *_variant("admin_users_with_bans.xlsx", "1/2 Экспорт: Пользователи (с ролями и банами)", since))
+
+    def conference_rows():
+        for conf_id, name, full_name, telegram_id, city, date_start, fee in build.rows(conferences):
+            yield ("Активна", conf_id, name, _organizer_name(full_name, telegram_id), city or "Онлайн", date_start, fee)
+        for name, organizer_id, deleted_by, reason, deleted_at in build.rows(deleted):
+            yield ("Удалена", "—", name, organizer_id, "—", "—", "—", deleted_by, reason, deleted_at)
+
+    export = XlsxExport()
+    export.add_sheet(
+        "Конференции",
+        ("Статус", "ID", "Название", "Организатор", "Город", "Дата проведения", "Оргвзнос",
+         "Удалил", "Причина", "Дата удаления"),
+        conference_rows()
+    )
+    build.save(export, *_variant(
+        "admin_conferences_full.xlsx", "2/2 Экспорт: Все конференции (активные + удалённые)", since
+    ))
+
+def _participants(build: _Build, conf_id: int):
+    name = build.conn.scalar(select(Conference.name).where(Conference.id == conf_id))
+    if name is None:
+        return
+
+    # Текущие и архивные заявки с анкетой участника одним запросом
+    columns = lambda model: (model.id, model.user_id, model.committee, model.status, model.reject_reason)
+    apps = union_all(
+        select(*columns(Application)).where(Application.conference_id == conf_id),
+        select(*columns(ArchivedApplication)).where(ArchivedApplication.conference_id == conf_id)
+    ).subquery()
+    stmt = (
+        select(
+            User.full_name, User.age, User.email, User.institution, User.experience,
+            apps.c.committee, apps.c.status, apps.c.reject_reason
+        )
+        .join(User, User.id == apps.c.user_id)
+        .order_by(apps.c.id)
+    )
+    if not build.plan(stmt):
+        return
+
+    export = XlsxExport()
+    export.add_sheet(
+        "Участники",
+        ("ФИО", "Возраст", "Email", "Учебное заведение", "Опыт в MUN", "Комитет", "Статус", "Причина отклонения"),
+        (
+            (
+                full_name or "—", age or "—", email or "—", institution or "—", experience or "—",
+                committee or "—", status, reject_reason or "—"
+            )
+            for full_name, age, email, institution, experience, committee, status, reject_reason
+            in build.rows(stmt)
+        )
+    )
+    build.save(export, f"participants_{name.replace(' ', '_')[:20]}.xlsx", f"📊 Экспорт участников конференции {name}")
+
+def _support_requests(build: _Build):
+    stmt = support_requests_export_query()
+    if not build.plan(stmt):
+        return
+
+    export = XlsxExport()
+    export.add_sheet(
+        "Обращения",
+        ("ID", "ФИО", "Telegram ID", "Текст обращения", "Скриншот (путь)", "Статус", "Ответ"),
+        (
+            (req_id, full_name or "—", telegram_id, text, screenshot_path or "—", status, response or "—")
+            for req_id, full_name, telegram_id, text, screenshot_path, status, response in build.rows(stmt)
+        )
+    )
+    build.save(export, "support_requests_export.xlsx", "📤 Экспорт всех обращений в техподдержку")
+
+@dataclass(frozen=True)
+class ExportKind:
+    build: Callable
+    title: str
+    empty_text: str
+    watermark: str | None = None  # имя отметки, которую двигает доставка (export_watermarks)
+
+NO_CHANGES_TEXT = "Изменений с прошлой выгрузки нет."
+
+# *_changes получают params=(отметка,) и выгружают только строки, изменённые после неё
+EXPORTS = {
+    "bot_data_tech": ExportKind(_bot_data_tech, "Экспорт данных бота", "Нет данных для экспорта.", "bot_data_tech"),
+    "bot_data_tech_changes": ExportKind(_bot_data_tech, "Экспорт изменений", NO_CHANGES_TEXT, "bot_data_tech"),
+    "bot_data_admin": ExportKind(_bot_data_admin, "Экспорт данных бота", "Нет данных для экспорта.", "bot_data_admin"),
+    "bot_data_admin_changes": ExportKind(_bot_data_admin, "Экспорт изменений", NO_CHANGES_TEXT, "bot_data_admin"),
+    "participants": ExportKind(_participants, "Экспорт участников", "Нет участников для экспорта"),
+    "support_requests": ExportKind(_support_requests, "Экспорт обращений", "Нет обращений для экспорта."),
+}
+
+# Точка входа воркера; возвращает (имя файла, подпись) собранных файлов в directory
+# и отметку updated_at, по которую они собраны (None — выгрузка без отметок)
+def build_export(job_id: int, kind: str, params: tuple, directory: str) -> tuple[list[tuple[str, str]], float | None]:
+    with _engine.connect() as conn:
+        build = _Build(job_id, conn, directory)
+        EXPORTS[kind].build(build, *params)
+        return build.files, build.watermark
+
+# Основной процесс: очередь заданий, прогресс и доставка
+@dataclass
+class ExportJob:
+    id: int
+    key: tuple
+    kind: ExportKind
+    status: str = "queued"  # queued / running / done / failed
+    rows: int = 0
+    total: int = 0
+    subscribers: list[tuple[int, int]] = field(default_factory=list)  # (чат, сообщение с прогрессом)
+    files: list[tuple[str, str]] = field(default_factory=list)
+    file_ids: list[str | None] = field(default_factory=list)  # после первой отправки файлы идут по file_id
+    watermark: float | None = None
+    directory: str | None = None
+    finished_at: float = 0.0
+
+_jobs: dict[tuple, ExportJob] = {}  # по (вид, параметры): одинаковые запросы делят задание
+_by_id: dict[int, ExportJob] = {}
+_ids = itertools.count(1)
+_pool: ProcessPoolExecutor | None = None
+_progress_queue = None
+_tasks: set[asyncio.Task] = set()  # loop держит задачи по слабым ссылкам — сильные храним здесь
+
+# Своя задача и контекст: она живёт дольше апдейта, который её запустил
+def _spawn(coro, what: str) -> asyncio.Task:
+    task = asyncio.create_task(coro, context=contextvars.Context())
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
+
+    def log_error(t: asyncio.Task):
+        if not t.cancelled() and t.exception():
+            logger.error("%s: задача прервана", what, exc_info=t.exception())
+    task.add_done_callback(log_error)
+    return task
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool, _progress_queue
+    if _pool is None:
+        # spawn, а не fork: воркер не должен наследовать открытые соединения SQLite и event loop
+        context = multiprocessing.get_context("spawn")
+        _progress_queue = context.Queue()
+        _pool = ProcessPoolExecutor(
+            EXPORT_WORKERS, mp_context=context, initializer=_init_worker, initargs=(_progress_queue,)
+        )
+        _spawn(_read_progress(_progress_queue), "Прогресс экспорта")
+    return _pool
+
+# Пул, у которого упал процесс, новых задач не принимает — следующее задание создаст новый
+def _discard_pool():
+    global _pool, _progress_queue
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _progress_queue.put(None)
+        _pool = _progress_queue = None
+
+async def _read_progress(queue):
+    while True:
+        item = await asyncio.to_thread(queue.get)
+        if item is None:
+            return
+        job_id, rows, total = item
+        job = _by_id.get(job_id)
+        if job is not None and job.status in ("queued", "running"):
+            job.status, job.rows, job.total = "running", rows, total
+
+def _status_text(job: ExportJob) -> str:
+    title = f"{job.kind.title} #{job.id}"
+    if job.status == "queued":
+        return f"⏳ {title}: в очереди"
+    if job.status == "running":
+        percent = job.rows * 100 // job.total if job.total else 0
+        return f"⏳ {title}: {job.rows} из {job.total} строк ({percent}%)"
+    if job.status == "failed":
+        return f"❌ {title}: не удалось собрать файл. Попробуйте позже."
+    return f"✅ {title}: готово" if job.files else job.kind.empty_text
+
+async def _edit(bot: Bot, chat_id: int, message_id: int, text: str):
+    try:
+        await bot.edit_message_text(text, chat_id=chat_id, message_id=message_id)
+    except TelegramAPIError:
+        pass
+
+# Итог заданию для одного подписчика: сообщение прогресса и, если есть, файлы
+async def _finish_subscriber(bot: Bot, job: ExportJob, chat_id: int, message_id: int | None):
+    if message_id is not None:
+        await _edit(bot, chat_id, message_id, _status_text(job))
+    elif job.status != "done" or not job.files:
+        await bot.send_message(chat_id, _status_text(job))
+    if job.status != "done":
+        return
+
+    delivered = True
+    for index, (filename, caption) in enumerate(job.files):
+        document = job.file_ids[index]
+        if document is None:
+            path = os.path.join(job.directory or "", filename)
+            if not os.path.exists(path):
+                continue
+            document = FSInputFile(path, filename=filename)
+        try:
+            sent = await bot.send_document(chat_id, document, caption=caption)
+        except TelegramAPIError as e:
+            logger.warning("Экспорт %s: не удалось отправить %s в %s: %s", job.id, filename, chat_id, e)
+            delivered = False
+            continue
+        job.file_ids[index] = sent.document.file_id
+
+    # Выгрузки запрашивают в личке, где чат совпадает с пользователем. Отметка двигается,
+    # только если дошли все файлы — иначе изменения пропали бы из следующей выгрузки
+    if delivered and job.kind.watermark and job.watermark is not None:
+        await set_export_watermark(chat_id, job.kind.watermark, job.watermark)
+
+def _forget(job: ExportJob):
+    if _jobs.get(job.key) is job:
+        del _jobs[job.key]
+    _by_id.pop(job.id, None)
+
+async def _run(bot: Bot, job: ExportJob, kind: str, params: tuple):
+    job.directory = tempfile.mkdtemp(prefix=f"export_{job.id}_")
+    try:
+        future = asyncio.get_running_loop().run_in_executor(
+            _get_pool(), build_export, job.id, kind, params, job.directory
+        )
+        shown = None
+        while True:
+            done, _ = await asyncio.wait({future}, timeout=EXPORT_PROGRESS_INTERVAL)
+            if done:
+                break
+            text = _status_text(job)
+            if text != shown:
+                shown = text
+                for chat_id, message_id in list(job.subscribers):
+                    await _edit(bot, chat_id, message_id, text)
+
+        try:
+            job.files, job.watermark = future.result()
+        except Exception as e:
+            logger.exception("Экспорт %s (%s) не удался", job.id, kind)
+            job.status = "failed"
+            _forget(job)
+            if isinstance(e, BrokenProcessPool):
+                _discard_pool()
+        else:
+            job.status = "done"
+            job.file_ids = [None] * len(job.files)
+
+        # Подписчики, подключившиеся во время отправки, тоже попадают в этот цикл
+        delivered = 0
+        while delivered < len(job.subscribers):
+            chat_id, message_id = job.subscribers[delivered]
+            delivered += 1
+            await _finish_subscriber(bot, job, chat_id, message_id)
+    finally:
+        shutil.rmtree(job.directory, ignore_errors=True)
+        job.directory = None
+        job.finished_at = time.monotonic()
+        if not job.files or None in job.file_ids:
+            # Файлов нет или ни одна отправка не удалась — переиспользовать нечего,
+            # а пустой результат (например, «изменений нет») дёшево пересобрать
+            _forget(job)
+
+def _expire():
+    now = time.monotonic()
+    for job in list(_jobs.values()):
+        if job.status == "done" and now - job.finished_at > EXPORT_DEDUP_WINDOW:
+            _forget(job)
+
+# Поставить выгрузку в очередь; возвращает id задания. Прогресс и файл придут в chat_id.
+# Тот же экспорт, уже собираемый или собранный не раньше EXPORT_DEDUP_WINDOW секунд назад,
+# не пересобирается: запрос подключается к заданию и получает его результат
+async def submit_export(bot: Bot, chat_id: int, kind: str, params: tuple = ()) -> int:
+    _expire()
+    key = (kind, params)
+    job = _jobs.get(key)
+    if job is None:
+        job = ExportJob(next(_ids), key, EXPORTS[kind])
+        _jobs[key] = job
+        _by_id[job.id] = job
+        _spawn(_run(bot, job, kind, params), f"Экспорт {job.id}")
+
+    if job.status == "done" and job.directory is None:
+        await _finish_subscriber(bot, job, chat_id, None)
+        return job.id
+
+    message = await bot.send_message(chat_id, _status_text(job))
+    if job.status in ("queued", "running"):
+        job.subscribers.append((chat_id, message.message_id))
+    elif job.directory is None:
+        # Пока отправляли сообщение, задание успело завершиться
+        await _finish_subscriber(bot, job, chat_id, message.message_id)
+    else:
+        job.subscribers.append((chat_id, message.message_id))
+    return job.id
+
+# Вызывается на остановке диспетчера (bot.py): пул закрывается, сборки и чтение прогресса отменяются
+async def close_exports():
+    _discard_pool()
+    for task in _tasks:
+        task.cancel()
+    await asyncio.gather(*_tasks, return_exceptions=True)
\ No newline at end of file
@@ -0,0 +1,74 @@
+import csv
+import io
+import tempfile
+from typing import AsyncIterable, AsyncIterator, Iterable, Sequence
+
+from aiogram.types import InputFile
+from openpyxl import Workbook
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import Select
+
+from config import EXPORT_BATCH_SIZE, EXPORT_SPOOL_SIZE
+
+# Строки запроса курсором: в памяти не больше одной пачки yield_per.
+# Выбирать стоит колонки, а не объекты ORM — они не копятся в identity map сессии
+async def stream_rows(session: AsyncSession, stmt: Select) -> AsyncIterator[Sequence]:
+    result = await session.stream(stmt.execution_options(yield_per=EXPORT_BATCH_SIZE))
+    async for partition in result.partitions():
+        for row in partition:
+            yield row
+
+# Готовый файл во временном буфере: до EXPORT_SPOOL_SIZE в памяти, дальше на диске.
+# Telegram получает его кусками, целиком в память файл не читается
+class SpooledInputFile(InputFile):
+    def __init__(self, spool: tempfile.SpooledTemporaryFile, filename: str):
+        super().__init__(filename=filename)
+        self.spool = spool
+
+    async def read(self, bot) -> AsyncIterator[bytes]:
+        self.spool.seek(0)
+        while chunk := self.spool.read(self.chunk_size):
+            yield chunk
+
+    def close(self):
+        self.spool.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+# Потоковая выгрузка в xlsx: write_only-книга openpyxl держит в памяти только текущую строку,
+# листы пишутся во временные файлы и собираются в архив при save(). Синхронная —
+# xlsx собирается в процессах export_jobs, не в event loop
+class XlsxExport:
+    def __init__(self):
+        self.workbook = Workbook(write_only=True)
+
+    # Лист из заголовков и строк; возвращает число записанных строк
+    def add_sheet(self, title: str, headers: Sequence[str], rows: Iterable[Iterable]) -> int:
+        sheet = self.workbook.create_sheet(title[:31])
+        sheet.append(list(headers))
+        count = 0
+        for row in rows:
+            sheet.append(list(row))
+            count += 1
+        return count
+
+    def save(self, path: str):
+        self.workbook.save(path)
+
+# CSV той же схемой (utf-8-sig, чтобы Excel открывал кириллицу); возвращает файл и число строк
+async def csv_export(filename: str, headers: Sequence[str], rows: AsyncIterable[Iterable]) -> tuple[SpooledInputFile, int]:
+    spool = tempfile.SpooledTemporaryFile(max_size=EXPORT_SPOOL_SIZE)
+    text = io.TextIOWrapper(spool, encoding="utf-8-sig", newline="")
+    writer = csv.writer(text)
+    writer.writerow(headers)
+    count = 0
+    async for row in rows:
+        writer.writerow(row)
+        count += 1
+    text.flush()
+    text.detach()
+    return SpooledInputFile(spool, filename), count
\ No newline at end of file
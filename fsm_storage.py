@@ -0,0 +1,159 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+
+from aiogram import BaseMiddleware
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, StorageKey, StateType
+from sqlalchemy import delete
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from database import AsyncSessionLocal, FsmState, run_write
+
+logger = logging.getLogger("fsm_storage")
+
+@dataclass(slots=True)
+class _Entry:
+    state: str | None = None
+    data: dict = field(default_factory=dict)
+    updated_at: float = 0.0
+
+def _key(key: StorageKey) -> str:
+    return ":".join(str(part) if part is not None else "" for part in (
+        key.bot_id, key.chat_id, key.user_id, key.thread_id, key.business_connection_id, key.destiny
+    ))
+
+# FSM в SQLite с процессным LRU-кэшем. Изменения копятся в кэше (set_state + несколько
+# update_data за шаг формы) и пишутся одной транзакцией в конце апдейта — FsmFlushMiddleware.
+# Формы, не менявшиеся дольше ttl, считаются брошенными и удаляются
+class SQLiteStorage(BaseStorage):
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._cache: OrderedDict[str, _Entry] = OrderedDict()
+        self._dirty: set[str] = set()
+
+    def _expired(self, entry: _Entry) -> bool:
+        return entry.updated_at < time.time() - self.ttl
+
+    async def _entry(self, key: StorageKey) -> _Entry:
+        k = _key(key)
+        entry = self._cache.get(k)
+        if entry is None:
+            async with AsyncSessionLocal(readonly=True) as session:
+                row = await session.get(FsmState, k)
+            # Пока шёл запрос, ключ мог загрузить и изменить параллельный апдейт
+            entry = self._cache.get(k)
+            if entry is None:
+                entry = _Entry(row.state, row.data or {}, row.updated_at) if row else _Entry(updated_at=time.time())
+                self._cache[k] = entry
+                self._evict(keep=k)
+
+        if self._expired(entry) and (entry.state is not None or entry.data):
+            entry.state, entry.data = None, {}
+            self._touch(k, entry)
+        self._cache.move_to_end(k)
+        return entry
+
+    def _touch(self, k: str, entry: _Entry):
+        entry.updated_at = time.time()
+        self._dirty.add(k)
+
+    def _evict(self, keep: str | None = None):
+        # Несохранённые записи не вытесняем — они уйдут при ближайшем flush.
+        # keep — только что загруженный ключ: когда все старые записи грязные, он крайний кандидат
+        if len(self._cache) <= self.maxsize:
+            return
+        for k in list(self._cache):
+            if len(self._cache) <= self.maxsize:
+                break
+            if k not in self._dirty and k != keep:
+                del self._cache[k]
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        entry = await self._entry(key)
+        entry.state = state.state if isinstance(state, State) else state
+        self._touch(_key(key), entry)
+
+    async def get_state(self, key: StorageKey) -> str | None:
+        return (await self._entry(key)).state
+
+    # Без запроса к БД: может ли у ключа быть незавершённая форма. Ключа нет в кэше —
+    # состояние неизвестно, и ответ «может»
+    def may_have_state(self, key: StorageKey) -> bool:
+        entry = self._cache.get(_key(key))
+        return entry is None or (entry.state is not None and not self._expired(entry))
+
+    async def set_data(self, key: StorageKey, data: dict) -> None:
+        entry = await self._entry(key)
+        entry.data = data.copy()
+        self._touch(_key(key), entry)
+
+    async def get_data(self, key: StorageKey) -> dict:
+        return (await self._entry(key)).data.copy()
+
+    # Записать накопленные изменения одной транзакцией
+    async def flush(self):
+        if not self._dirty:
+            return
+        keys, self._dirty = self._dirty, set()
+        snapshot = [
+            (k, entry.state, entry.data.copy(), entry.updated_at)
+            for k in keys if (entry := self._cache.get(k)) is not None
+        ]
+
+        async def save(session):
+            for k, state, data, updated_at in snapshot:
+                if state is None and not data:
+                    await session.execute(delete(FsmState).where(FsmState.key == k))
+                    continue
+                stmt = sqlite_insert(FsmState).values(key=k, state=state, data=data, updated_at=updated_at)
+                await session.execute(stmt.on_conflict_do_update(
+                    index_elements=[FsmState.key],
+                    set_={"state": state, "data": data, "updated_at": updated_at}
+                ))
+
+        try:
+            await run_write(save)
+        except Exception:
+            # Вернём ключи в очередь: данные остались в кэше, попробуем на следующем апдейте
+            self._dirty |= keys
+            raise
+        self._evict()
+
+    # Удалить брошенные формы из БД и кэша
+    async def expire(self) -> int:
+        cutoff = time.time() - self.ttl
+        for k in [k for k, entry in self._cache.items() if entry.updated_at < cutoff and k not in self._dirty]:
+            del self._cache[k]
+
+        async def purge(session):
+            result = await session.execute(delete(FsmState).where(FsmState.updated_at < cutoff))
+            return result.rowcount
+        return await run_write(purge)
+
+    async def run_expiry(self, interval: float):
+        while True:
+            try:
+                removed = await self.expire()
+                if removed:
+                    logger.info("FSM: удалено брошенных форм %s", removed)
+            except Exception:
+                logger.exception("Ошибка очистки FSM")
+            await asyncio.sleep(interval)
+
+    async def close(self) -> None:
+        await self.flush()
+
+# Внешний middleware на update: сбрасывает изменения FSM после обработки апдейта
+class FsmFlushMiddleware(BaseMiddleware):
+    def __init__(self, storage: SQLiteStorage):
+        self.storage = storage
+
+    async def __call__(self, handler, event, data):
+        try:
+            return await handler(event, data)
+        finally:
+            await self.storage.flush()
\ No newline at end of file
@@ -1,13 +1,11 @@
 from aiogram import Router, types, F
 from aiogram.filters import Command
 from sqlalchemy import select, func, delete
-from aiogram.types import InlineKeyboardButton, BufferedInputFile, FSInputFile
+from aiogram.types import InlineKeyboardButton
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.filters.state import StateFilter
-import pandas as pd
-import os
 from datetime import datetime
 
 from database import (
@@ -16,16 +14,25 @@ from database import (
     ConferenceEditRequest,
     Conference,
     Application,
+    ArchivedApplication,
     User,
     Role,
-    get_or_create_user,
     DeletedConference,
     get_bot_status,
     set_bot_paused,
-    SupportRequest
+    SupportRequest,
+    StatCounter,
+    parse_date,
+    find_users,
+    get_export_watermark
 )
-from keyboards import get_main_menu_keyboard, get_cancel_keyboard
-from config import CHIEF_ADMIN_IDS, TECH_SPECIALIST_ID
+from keyboards import get_main_menu_keyboard, get_cancel_keyboard, get_user_pick_keyboard
+from user_cache import get_cached_user, invalidate_user
+from outbox import enqueue_notification
+from media_cache import cached_photo, remember_photo
+from state_store import StateStore
+from export_jobs import submit_export
+from config import CHIEF_ADMIN_IDS, TECH_SPECIALIST_ID, USER_PICK_PAGE_SIZE, STATE_STORE_TTL, STATE_STORE_SIZE
 
 router = Router()
 
@@ -36,11 +43,12 @@ class AdminStates(StatesGroup):
     waiting_support_reply = State()  # ← Новое состояние для ответа на обращение
 
 # Пагинация для обращений
-support_pagination = {}
+# Снимок очереди обращений для листания: telegram_id -> список id
+support_pages = StateStore("support_pages", STATE_STORE_TTL, STATE_STORE_SIZE)
 
 # Проверки ролей
 async def is_admin_or_chief(user_id: int) -> bool:
-    async with AsyncSessionLocal() as session:
+    async with AsyncSessionLocal(readonly=True) as session:
         result = await session.execute(select(User).where(User.telegram_id == user_id))
         user = result.scalar_one_or_none()
         return user.role in [Role.ADMIN.value, Role.CHIEF_ADMIN.value] if user else False
@@ -49,13 +57,13 @@ async def is_chief_admin(user_id: int) -> bool:
     return user_id in CHIEF_ADMIN_IDS
 
 async def is_chief_tech(user_id: int) -> bool:
-    async with AsyncSessionLocal() as session:
+    async with AsyncSessionLocal(readonly=True) as session:
         result = await session.execute(select(User).where(User.telegram_id == user_id))
         user = result.scalar_one_or_none()
         return user.role == Role.CHIEF_TECH.value if user else False
 
 async def can_delete_conference(user_id: int) -> bool:
-    async with AsyncSessionLocal() as session:
+    async with AsyncSessionLocal(readonly=True) as session:
         result = await session.execute(select(User).where(User.telegram_id == user_id))
         user = result.scalar_one_or_none()
         return user.role in [Role.ADMIN.value, Role.CHIEF_ADMIN.value, Role.CHIEF_TECH.value] if user else False
@@ -68,7 +76,7 @@ async def can_view_conferences(user_id: int) -> bool:
 
 # Универсальная функция обновления списка всех заявок (создание + редактирование + апелляции)
 async def update_requests_message(event: types.Message | types.CallbackQuery):
-    async with AsyncSessionLocal() as session:
+    async with AsyncSessionLocal(readonly=True) as session:
         create_requests = (await session.execute(
             select(ConferenceCreationRequest).where(ConferenceCreationRequest.status == "pending")
         )).scalars().all()
@@ -113,9 +121,10 @@ async def update_requests_message(event: types.Message | types.CallbackQuery):
                     InlineKeyboardButton(text="Отклонить", callback_data=f"conf_create_reject_{req.id}")
                 )
 
-                if data.get('poster_path') and os.path.exists(data['poster_path']):
-                    photo = FSInputFile(data['poster_path'])
-                    await event.bot.send_photo(event.from_user.id, photo, caption=text, reply_markup=builder.as_markup())
+                photo = await cached_photo(data.get('poster_path'))
+                if photo:
+                    sent = await event.bot.send_photo(event.from_user.id, photo, caption=text, reply_markup=builder.as_markup())
+                    await remember_photo(data.get('poster_path'), sent)
                 else:
                     await event.bot.send_message(event.from_user.id, text, reply_markup=builder.as_markup())
 
@@ -150,13 +159,15 @@ async def update_requests_message(event: types.Message | types.CallbackQuery):
                     InlineKeyboardButton(text="Отклонить", callback_data=f"conf_edit_reject_{req.id}")
                 )
 
-                if data.get('poster_path') and os.path.exists(data['poster_path']):
-                    photo = FSInputFile(data['poster_path'])
-                    await event.bot.send_photo(event.from_user.id, photo, caption=text, reply_markup=builder.as_markup())
+                photo = await cached_photo(data.get('poster_path'))
+                if photo:
+                    sent = await event.bot.send_photo(event.from_user.id, photo, caption=text, reply_markup=builder.as_markup())
+                    await remember_photo(data.get('poster_path'), sent)
                 else:
-                    if conf.poster_path and os.path.exists(conf.poster_path):
-                        photo = FSInputFile(conf.poster_path)
-                        await event.bot.send_photo(event.from_user.id, photo, caption=text, reply_markup=builder.as_markup())
+                    photo = await cached_photo(conf.poster_path)
+                    if photo:
+                        sent = await event.bot.send_photo(event.from_user.id, photo, caption=text, reply_markup=builder.as_markup())
+                        await remember_photo(conf.poster_path, sent)
                     else:
                         await event.bot.send_message(event.from_user.id, text, reply_markup=builder.as_markup())
 
@@ -181,15 +192,16 @@ async def update_requests_message(event: types.Message | types.CallbackQuery):
                     InlineKeyboardButton(text="Отклонить", callback_data=f"conf_appeal_reject_{req.id}")
                 )
 
-                if data.get('poster_path') and os.path.exists(data['poster_path']):
-                    photo = FSInputFile(data['poster_path'])
-                    await event.bot.send_photo(event.from_user.id, photo, caption=text, reply_markup=builder.as_markup())
+                photo = await cached_photo(data.get('poster_path'))
+                if photo:
+                    sent = await event.bot.send_photo(event.from_user.id, photo, caption=text, reply_markup=builder.as_markup())
+                    await remember_photo(data.get('poster_path'), sent)
                 else:
                     await event.bot.send_message(event.from_user.id, text, reply_markup=builder.as_markup())
 
 # Функция для заявок на редактирование
 async def update_edit_requests_message(event: types.Message | types.CallbackQuery):
-    async with AsyncSessionLocal() as session:
+    async with AsyncSessionLocal(readonly=True) as session:
         edit_requests = (await session.execute(
             select(ConferenceEditRequest).where(ConferenceEditRequest.status == "pending")
         )).scalars().all()
@@ -232,13 +244,15 @@ async def update_edit_requests_message(event: types.Message | types.CallbackQuer
                 InlineKeyboardButton(text="Отклонить", callback_data=f"conf_edit_reject_{req.id}")
             )
 
-            if data.get('poster_path') and os.path.exists(data['poster_path']):
-                photo = FSInputFile(data['poster_path'])
-                await event.bot.send_photo(event.from_user.id, photo, caption=text, reply_markup=builder.as_markup())
+            photo = await cached_photo(data.get('poster_path'))
+            if photo:
+                sent = await event.bot.send_photo(event.from_user.id, photo, caption=text, reply_markup=builder.as_markup())
+                await remember_photo(data.get('poster_path'), sent)
             else:
-                if conf.poster_path and os.path.exists(conf.poster_path):
-                    photo = FSInputFile(conf.poster_path)
-                    await event.bot.send_photo(event.from_user.id, photo, caption=text, reply_markup=builder.as_markup())
+                photo = await cached_photo(conf.poster_path)
+                if photo:
+                    sent = await event.bot.send_photo(event.from_user.id, photo, caption=text, reply_markup=builder.as_markup())
+                    await remember_photo(conf.poster_path, sent)
                 else:
                     await event.bot.send_message(event.from_user.id, text, reply_markup=builder.as_markup())
 
@@ -268,7 +282,7 @@ async def view_appeals(message: types.Message):
         await message.answer("Доступ только Глав Админу.")
         return
 
-    async with AsyncSessionLocal() as session:
+    async with AsyncSessionLocal(readonly=True) as session:
         appeal_requests = (await session.execute(
             select(ConferenceCreationRequest).where(
                 ConferenceCreationRequest.status == "rejected",
@@ -300,9 +314,10 @@ async def view_appeals(message: types.Message):
                 InlineKeyboardButton(text="Отклонить", callback_data=f"conf_appeal_reject_{req.id}")
             )
 
-            if data.get('poster_path') and os.path.exists(data['poster_path']):
-                photo = FSInputFile(data['poster_path'])
-                await message.answer_photo(photo, caption=text, reply_markup=builder.as_markup())
+            photo = await cached_photo(data.get('poster_path'))
+            if photo:
+                sent = await message.answer_photo(photo, caption=text, reply_markup=builder.as_markup())
+                await remember_photo(data.get('poster_path'), sent)
             else:
                 await message.answer(text, reply_markup=builder.as_markup())
 
@@ -313,7 +328,7 @@ async def view_all_conferences(message: types.Message):
         await message.answer("Доступ запрещён.")
         return
 
-    async with AsyncSessionLocal() as session:
+    async with AsyncSessionLocal(readonly=True) as session:
         conferences = (await session.execute(select(Conference).where(Conference.is_active == True))).scalars().all()
 
         if not conferences:
@@ -336,9 +351,10 @@ async def view_all_conferences(message: types.Message):
             if await can_delete_conference(message.from_user.id):
                 builder.row(InlineKeyboardButton(text="Удалить конференцию", callback_data=f"admin_delete_conf_{conf.id}"))
 
-            if conf.poster_path and os.path.exists(conf.poster_path):
-                photo = FSInputFile(conf.poster_path)
-                await message.answer_photo(photo, caption=text, reply_markup=builder.as_markup())
+            photo = await cached_photo(conf.poster_path)
+            if photo:
+                sent = await message.answer_photo(photo, caption=text, reply_markup=builder.as_markup())
+                await remember_photo(conf.poster_path, sent)
             else:
                 await message.answer(text, reply_markup=builder.as_markup())
 
@@ -349,17 +365,22 @@ async def stats(message: types.Message):
         await message.answer("Доступ запрещён.")
         return
 
-    async with AsyncSessionLocal() as session:
-        users_count = await session.scalar(select(func.count(User.id)))
-        conf_count = await session.scalar(select(func.count(Conference.id)).where(Conference.is_active == True))
-        apps_count = await session.scalar(select(func.count(Application.id)))
+    # Счётчики ведут триггеры в БД — одно чтение маленькой таблицы вместо COUNT(*) по всем
+    async with AsyncSessionLocal(readonly=True) as session:
+        counters = dict((await session.execute(select(StatCounter.name, StatCounter.value))).all())
 
-        text = "<b>Статистика бота:</b>\n\n"
-        text += f"Пользователей: {users_count}\n"
-        text += f"Активных конференций: {conf_count}\n"
-        text += f"Всего заявок на участие: {apps_count}\n"
+    text = "<b>Статистика бота:</b>\n\n"
+    text += f"Пользователей: {counters.get('users', 0)}\n"
+    text += f"Забанено: {counters.get('users_banned', 0)}\n"
+    text += f"Активных конференций: {counters.get('conferences_active', 0)}\n"
+    text += f"Ожидают модерации: {counters.get('moderation_pending', 0)}\n"
+    text += f"Обращений без ответа: {counters.get('support_pending', 0)}\n\n"
+    text += f"Всего заявок на участие: {counters.get('applications', 0)}\n"
+    for name, value in sorted(counters.items()):
+        if name.startswith("applications:") and value:
+            text += f"• {name.split(':', 1)[1]}: {value}\n"
 
-        await message.answer(text)
+    await message.answer(text)
 
 # Приостановка/запуск бота
 @router.message(F.text.in_({"🛑 Приостановить бота", "▶ Возобновить работу бота"}))
@@ -475,21 +496,20 @@ async def perform_conference_deletion(target, conf_id: int, reason: str):
         session.add(deleted_log)
 
         await session.execute(delete(Application).where(Application.conference_id == conf_id))
+        await session.execute(delete(ArchivedApplication).where(ArchivedApplication.conference_id == conf_id))
         await session.execute(delete(ConferenceEditRequest).where(ConferenceEditRequest.conference_id == conf_id))
 
         await session.delete(conf)
+        await enqueue_notification(
+            session,
+            organizer.telegram_id,
+            f"❌ Ваша конференция <b>{conf.name}</b> удалена администратором.\nПричина: {reason}",
+            dedup_key=f"conf_deleted:{conf_id}"
+        )
         await session.commit()
 
     await target.answer(f"Конференция <b>{conf.name}</b> удалена по причине: {reason}")
 
-    try:
-        await target.bot.send_message(
-            organizer.telegram_id,
-            f"❌ Ваша конференция <b>{conf.name}</b> удалена администратором.\nПричина: {reason}"
-        )
-    except:
-        pass
-
 # Обработка создания
 @router.callback_query(F.data.startswith("conf_create_approve_") | F.data.startswith("conf_create_reject_"))
 async def process_create_request(callback: types.CallbackQuery):
@@ -513,7 +533,7 @@ async def process_create_request(callback: types.CallbackQuery):
                 name=req_data["name"],
                 description=req_data.get("description"),
                 city=req_data.get("city"),
-                date=req_data.get("date"),
+                date=parse_date(req_data.get("date")),
                 fee=float(req_data.get("fee", 0)),
                 qr_code_path=req_data.get("qr_code_path"),
                 poster_path=req_data.get("poster_path"),
@@ -521,17 +541,18 @@ async def process_create_request(callback: types.CallbackQuery):
                 is_active=True
             )
             session.add(conference)
-            await session.commit()
-
-            await callback.bot.send_message(
+            await enqueue_notification(
+                session,
                 user.telegram_id,
                 f"🎉 Ваша заявка на создание конференции <b>{req_data['name']}</b> одобрена!\n\n"
                 "Теперь вы — Организатор.\n"
-                "Перезапустите бота командой /main_menu."
+                "Перезапустите бота командой /main_menu.",
+                dedup_key=f"creation_request:{req_id}:approved"
             )
+            await session.commit()
+            invalidate_user(user.telegram_id)
         else:
             req.status = "rejected"
-            await session.commit()
 
             builder = InlineKeyboardBuilder()
             builder.row(
@@ -539,11 +560,14 @@ async def process_create_request(callback: types.CallbackQuery):
                 InlineKeyboardButton(text="Главное меню", callback_data="back_to_main")
             )
 
-            await callback.bot.send_message(
+            await enqueue_notification(
+                session,
                 user.telegram_id,
                 f"❌ Ваша заявка на создание конференции <b>{req_data['name']}</b> отклонена.",
-                reply_markup=builder.as_markup()
+                reply_markup=builder.as_markup(),
+                dedup_key=f"creation_request:{req_id}:rejected"
             )
+            await session.commit()
 
         await callback.answer(f"Заявка {'одобрена' if action == 'approve' else 'отклонена'}")
 
@@ -574,7 +598,8 @@ async def process_edit_request(callback: types.CallbackQuery):
             conf.name = edit_data.get("name", conf.name)
             conf.description = edit_data.get("description", conf.description)
             conf.city = edit_data.get("city", conf.city)
-            conf.date = edit_data.get("date", conf.date)
+            if edit_data.get("date"):
+                conf.date = parse_date(edit_data["date"])
             conf.fee = edit_data.get("fee", conf.fee)
             if edit_data.get("qr_code_path"):
                 conf.qr_code_path = edit_data["qr_code_path"]
@@ -582,20 +607,22 @@ async def process_edit_request(callback: types.CallbackQuery):
                 conf.poster_path = edit_data["poster_path"]
 
             req.status = "approved"
-            await session.commit()
-
-            await callback.bot.send_message(
+            await enqueue_notification(
+                session,
                 organizer.telegram_id,
-                f"✅ Ваши изменения в конференции <b>{conf.name}</b> одобрены!"
+                f"✅ Ваши изменения в конференции <b>{conf.name}</b> одобрены!",
+                dedup_key=f"edit_request:{req_id}:approved"
             )
+            await session.commit()
         else:
             req.status = "rejected"
-            await session.commit()
-
-            await callback.bot.send_message(
+            await enqueue_notification(
+                session,
                 organizer.telegram_id,
-                f"❌ Ваши изменения в конференции <b>{conf.name}</b> отклонены."
+                f"❌ Ваши изменения в конференции <b>{conf.name}</b> отклонены.",
+                dedup_key=f"edit_request:{req_id}:rejected"
             )
+            await session.commit()
 
         await callback.answer(f"Редактирование {'одобрено' if action == 'approve' else 'отклонено'}")
 
@@ -617,23 +644,21 @@ async def appeal_submit(callback: types.CallbackQuery):
             await callback.answer("Заявка не найдена.")
             return
 
-        req.appeal = True
-        await session.commit()
+        # Повторное нажатие кнопки не должно слать Глав Админам дубли
+        if not req.appeal:
+            req.appeal = True
+            for admin_id in CHIEF_ADMIN_IDS:
+                await enqueue_notification(session, admin_id, f"🆕 Новая апелляция! ID: <code>{req_id}</code>")
+            await session.commit()
 
     await callback.message.edit_text("Ваша апелляция отправлена Глав Админу.\nОжидайте решения.")
 
-    for admin_id in CHIEF_ADMIN_IDS:
-        try:
-            await callback.bot.send_message(admin_id, f"🆕 Новая апелляция! ID: <code>{req_id}</code>")
-        except:
-            pass
-
     await callback.answer()
 
 # Возврат в главное меню
 @router.callback_query(F.data == "back_to_main")
 async def back_to_main(callback: types.CallbackQuery):
-    db_user = await get_or_create_user(callback.from_user.id)
+    db_user = await get_cached_user(callback.from_user.id)
     await callback.message.edit_text("Главное меню", reply_markup=get_main_menu_keyboard(db_user.role))
     await callback.answer()
 
@@ -664,7 +689,7 @@ async def process_appeal(callback: types.CallbackQuery):
                 name=req_data["name"],
                 description=req_data.get("description"),
                 city=req_data.get("city"),
-                date=req_data.get("date"),
+                date=parse_date(req_data.get("date")),
                 fee=float(req_data.get("fee", 0)),
                 qr_code_path=req_data.get("qr_code_path"),
                 poster_path=req_data.get("poster_path"),
@@ -672,15 +697,19 @@ async def process_appeal(callback: types.CallbackQuery):
                 is_active=True
             )
             session.add(conference)
+            await enqueue_notification(
+                session,
+                user.telegram_id,
+                "✅ Ваша апелляция одобрена! Вы стали Организатором.",
+                dedup_key=f"creation_request:{req_id}:approved"
+            )
             await session.commit()
-
-            await callback.bot.send_message(user.telegram_id, "✅ Ваша апелляция одобрена! Вы стали Организатором.")
+            invalidate_user(user.telegram_id)
         else:
             req.appeal = False
+            await enqueue_notification(session, user.telegram_id, "❌ Ваша апелляция отклонена.")
             await session.commit()
 
-            await callback.bot.send_message(user.telegram_id, "❌ Ваша апелляция отклонена.")
-
         await callback.answer("Апелляция обработана")
 
     try:
@@ -690,147 +719,46 @@ async def process_appeal(callback: types.CallbackQuery):
 
     await update_requests_message(callback)
 
-# Экспорт данных бота
+# Экспорт данных бота — собирается в фоне (export_jobs), бот присылает прогресс и файлы
 @router.message(F.text == "📤 Экспорт данных бота")
 async def export_bot_data(message: types.Message):
     user_id = message.from_user.id
 
     if user_id == TECH_SPECIALIST_ID:
-        async with AsyncSessionLocal() as session:
-            users = (await session.execute(select(User))).scalars().all()
-            users_data = []
-            for user in users:
-                users_data.append({
-                    "Telegram ID": user.telegram_id,
-                    "Username": user.username or "—",
-                    "ФИО": user.full_name or "—",
-                    "Роль": user.role,
-                    "Забанен": "Да" if user.is_banned else "Нет",
-                    "Причина бана": user.ban_reason or "—"
-                })
-
-            df_users = pd.DataFrame(users_data)
-            users_filename = "tech_export_users_with_bans.xlsx"
-            df_users.to_excel(users_filename, index=False)
-
-            conferences = (await session.execute(select(Conference).where(Conference.is_active == True))).scalars().all()
-            conf_data = []
-            for conf in conferences:
-                organizer = await session.get(User, conf.organizer_id)
-                organizer_name = organizer.full_name or organizer.telegram_id if organizer else "—"
-                conf_data.append({
-                    "ID": conf.id,
-                    "Название": conf.name,
-                    "Организатор": organizer_name,
-                    "Город": conf.city or "Онлайн",
-                    "Дата проведения": conf.date,
-                    "Оргвзнос": conf.fee
-                })
-
-            df_confs = pd.DataFrame(conf_data)
-            confs_filename = "tech_active_conferences.xlsx"
-            df_confs.to_excel(confs_filename, index=False)
-
-            deleted = (await session.execute(select(DeletedConference))).scalars().all()
-            deleted_data = []
-            for d in deleted:
-                deleted_data.append({
-                    "Название конференции": d.conference_name,
-                    "Организатор ID": d.organizer_telegram_id,
-                    "Удалил (ID)": d.deleted_by_telegram_id,
-                    "Причина удаления": d.reason,
-                    "Дата удаления": d.deleted_at
-                })
-
-            df_deleted = pd.DataFrame(deleted_data)
-            deleted_filename = "tech_deleted_conferences.xlsx"
-            df_deleted.to_excel(deleted_filename, index=False)
-
-        with open(users_filename, "rb") as f1:
-            await message.answer_document(BufferedInputFile(f1.read(), filename=users_filename), caption="1/3 Экспорт: Пользователи (с банами)")
-        with open(confs_filename, "rb") as f2:
-            await message.answer_document(BufferedInputFile(f2.read(), filename=confs_filename), caption="2/3 Экспорт: Активные конференции")
-        with open(deleted_filename, "rb") as f3:
-            await message.answer_document(BufferedInputFile(f3.read(), filename=deleted_filename), caption="3/3 Экспорт: Удалённые конференции")
-
-        os.remove(users_filename)
-        os.remove(confs_filename)
-        os.remove(deleted_filename)
+        await submit_export(message.bot, message.chat.id, "bot_data_tech")
         return
 
     if user_id in CHIEF_ADMIN_IDS:
-        async with AsyncSessionLocal() as session:
-            users = (await session.execute(select(User))).scalars().all()
-            users_data = []
-            for user in users:
-                users_data.append({
-                    "Telegram ID": user.telegram_id,
-                    "Username": user.username or "—",
-                    "ФИО": user.full_name or "—",
-                    "Роль": user.role,
-                    "Забанен": "Да" if user.is_banned else "Нет",
-                    "Причина бана": user.ban_reason or "—"
-                })
-
-            df_users = pd.DataFrame(users_data)
-            users_filename = "admin_users_with_bans.xlsx"
-            df_users.to_excel(users_filename, index=False)
-
-            conferences = (await session.execute(select(Conference).where(Conference.is_active == True))).scalars().all()
-            conf_data = []
-            for conf in conferences:
-                organizer = await session.get(User, conf.organizer_id)
-                organizer_name = organizer.full_name or organizer.telegram_id if organizer else "—"
-                conf_data.append({
-                    "Статус": "Активна",
-                    "ID": conf.id,
-                    "Название": conf.name,
-                    "Организатор": organizer_name,
-                    "Город": conf.city or "Онлайн",
-                    "Дата проведения": conf.date,
-                    "Оргвзнос": conf.fee
-                })
-
-            deleted = (await session.execute(select(DeletedConference))).scalars().all()
-            for d in deleted:
-                conf_data.append({
-                    "Статус": "Удалена",
-                    "ID": "—",
-                    "Название": d.conference_name,
-                    "Организатор": d.organizer_telegram_id,
-                    "Город": "—",
-                    "Дата проведения": "—",
-                    "Оргвзнос": "—",
-                    "Удалил": d.deleted_by_telegram_id,
-                    "Причина": d.reason,
-                    "Дата удаления": d.deleted_at
-                })
-
-            df_confs = pd.DataFrame(conf_data)
-            confs_filename = "admin_conferences_full.xlsx"
-            df_confs.to_excel(confs_filename, index=False)
-
-        with open(users_filename, "rb") as f1:
-            await message.answer_document(
-                BufferedInputFile(f1.read(), filename=users_filename),
-                caption="1/2 Экспорт: Пользователи (с ролями и банами)"
-            )
+        await submit_export(message.bot, message.chat.id, "bot_data_admin")
+        return
 
-        with open(confs_filename, "rb") as f2:
-            await message.answer_document(
-                BufferedInputFile(f2.read(), filename=confs_filename),
-                caption="2/2 Экспорт: Все конференции (активные + удалённые)"
-            )
+    await message.answer("Доступ запрещён.")
+
+# Выгрузка только того, что изменилось с прошлой выгрузки этого пользователя (полной или изменений)
+@router.message(Command("export_changes"))
+@router.message(F.text == "📤 Экспорт изменений")
+async def export_bot_changes(message: types.Message):
+    user_id = message.from_user.id
+
+    if user_id == TECH_SPECIALIST_ID:
+        kind = "bot_data_tech"
+    elif user_id in CHIEF_ADMIN_IDS:
+        kind = "bot_data_admin"
+    else:
+        await message.answer("Доступ запрещён.")
+        return
 
-        os.remove(users_filename)
-        os.remove(confs_filename)
+    since = await get_export_watermark(user_id, kind)
+    if since is None:
+        await message.answer("Выгрузок ещё не было — сначала будет полный экспорт.")
+        await submit_export(message.bot, message.chat.id, kind)
         return
 
-    await message.answer("Доступ запрещён.")
+    await submit_export(message.bot, message.chat.id, f"{kind}_changes", (since,))
 
 # Назначение роли — только Глав Тех
 @router.message(Command("set_role"))
-async def set_role(message: types.Message):
+async def set_role(message: types.Message, state: FSMContext):
     if not await is_chief_tech(message.from_user.id):
         await message.answer("Доступ запрещён. Только для Главного Тех Специалиста.")
         return
@@ -842,33 +770,70 @@ async def set_role(message: types.Message):
 
     try:
         _, target, role_str = message.text.split(maxsplit=2)
-        target = target.lstrip("@")
+    except ValueError:
+        await message.answer("Неверный формат команды.")
+        return
 
-        async with AsyncSessionLocal() as session:
-            if target.isdigit():
-                result = await session.execute(select(User).where(User.telegram_id == int(target)))
-            else:
-                result = await session.execute(select(User).where(User.full_name.ilike(f"%{target}%")))
-            target_user = result.scalar_one_or_none()
+    if role_str not in [r.value for r in Role]:
+        await message.answer("Неверная роль.")
+        return
 
-            if not target_user:
-                await message.answer("Пользователь не найден.")
-                return
+    users, has_next = await find_users(target, USER_PICK_PAGE_SIZE)
+    if not users:
+        await message.answer("Пользователь не найден.")
+        return
 
-            if role_str not in [r.value for r in Role]:
-                await message.answer("Неверная роль.")
-                return
+    if len(users) == 1 and not has_next:
+        await apply_role(message, users[0].telegram_id, role_str)
+        return
 
-            target_user.role = role_str
-            await session.commit()
+    await state.update_data(role_query=target, role_value=role_str)
+    await message.answer(
+        f"Найдено несколько пользователей по запросу «{target}». Кому назначить роль {role_str}?",
+        reply_markup=get_user_pick_keyboard(users, "role", 0, USER_PICK_PAGE_SIZE, has_next)
+    )
 
-            await message.answer(f"Роль пользователя {target_user.full_name or target_user.telegram_id} изменена на {role_str}")
-            try:
-                await message.bot.send_message(target_user.telegram_id, f"Ваша роль изменена на: {role_str}")
-            except:
-                pass
-    except:
-        await message.answer("Неверный формат команды.")
+@router.callback_query(F.data.startswith("role_page_"))
+async def set_role_page(callback: types.CallbackQuery, state: FSMContext):
+    data = await state.get_data()
+    if not await is_chief_tech(callback.from_user.id) or not data.get("role_query"):
+        await callback.answer("Список устарел. Повторите /set_role.", show_alert=True)
+        return
+
+    offset = int(callback.data.split("_")[-1])
+    users, has_next = await find_users(data["role_query"], USER_PICK_PAGE_SIZE, offset)
+    await callback.message.edit_reply_markup(
+        reply_markup=get_user_pick_keyboard(users, "role", offset, USER_PICK_PAGE_SIZE, has_next)
+    )
+    await callback.answer()
+
+@router.callback_query(F.data.startswith("role_pick_"))
+async def set_role_pick(callback: types.CallbackQuery, state: FSMContext):
+    data = await state.get_data()
+    if not await is_chief_tech(callback.from_user.id) or not data.get("role_value"):
+        await callback.answer("Список устарел. Повторите /set_role.", show_alert=True)
+        return
+
+    await state.update_data(role_query=None, role_value=None)
+    await callback.message.edit_reply_markup(reply_markup=None)
+    await callback.answer()
+    await apply_role(callback.message, int(callback.data.split("_")[-1]), data["role_value"])
+
+async def apply_role(message: types.Message, telegram_id: int, role_str: str):
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(select(User).where(User.telegram_id == telegram_id))
+        target_user = result.scalar_one_or_none()
+
+        if not target_user:
+            await message.answer("Пользователь не найден.")
+            return
+
+        target_user.role = role_str
+        await enqueue_notification(session, target_user.telegram_id, f"Ваша роль изменена на: {role_str}")
+        await session.commit()
+        invalidate_user(target_user.telegram_id)
+
+        await message.answer(f"Роль пользователя {target_user.full_name or target_user.telegram_id} изменена на {role_str}")
 
 # === НОВЫЕ ФУНКЦИИ ДЛЯ ТЕХПОДДЕРЖКИ ===
 
@@ -880,44 +845,39 @@ async def view_support_requests(message: types.Message):
         await message.answer("Доступ запрещён.")
         return
 
-    async with AsyncSessionLocal() as session:
-        result = await session.execute(
-            select(SupportRequest).order_by(SupportRequest.id.desc())
-        )
-        requests = result.scalars().all()
+    async with AsyncSessionLocal(readonly=True) as session:
+        request_ids = (await session.execute(
+            select(SupportRequest.id).order_by(SupportRequest.id.desc())
+        )).scalars().all()
 
-        if not requests:
-            await message.answer("Нет обращений в техподдержку.")
-            return
+    if not request_ids:
+        await message.answer("Нет обращений в техподдержку.")
+        return
 
-        # Загружаем пользователей заранее
-        enriched_requests = []
-        for req in requests:
-            user_result = await session.execute(select(User).where(User.id == req.user_id))
-            user = user_result.scalar_one_or_none()
-            enriched_requests.append({
-                "request": req,
-                "user": user
-            })
-
-        support_pagination[message.from_user.id] = {
-            "index": 0,
-            "total": len(enriched_requests),
-            "requests": enriched_requests
-        }
-        await show_support_request(message, enriched_requests, 0)
-
-async def show_support_request(target, enriched_requests: list, index: int):
-    item = enriched_requests[index]
-    req = item["request"]
-    user = item["user"]
+    await support_pages.set(message.from_user.id, request_ids)
+    await show_support_request(message, request_ids, 0)
+
+async def show_support_request(target, request_ids: list[int], index: int):
+    async with AsyncSessionLocal(readonly=True) as session:
+        row = (await session.execute(
+            select(SupportRequest, User)
+            .outerjoin(User, User.id == SupportRequest.user_id)
+            .where(SupportRequest.id == request_ids[index])
+        )).first()
+
+    if row is None:
+        # Обращение успели перенести в архив или удалить
+        message = target if isinstance(target, types.Message) else target.message
+        await message.answer("Обращение больше недоступно.")
+        return
+    req, user = row
 
     if not user:
         user_name = f"ID {req.user_id} (пользователь удалён)"
     else:
         user_name = user.full_name or f"ID {user.telegram_id}"
 
-    text = f"<b>Обращение {index + 1} из {len(enriched_requests)}</b>\n\n"
+    text = f"<b>Обращение {index + 1} из {len(request_ids)}</b>\n\n"
     text += f"<b>ID:</b> <code>{req.id}</code>\n"
     text += f"<b>От:</b> {user_name}\n"
     text += f"<b>Текст:</b>\n{req.message}\n\n"
@@ -931,22 +891,23 @@ async def show_support_request(target, enriched_requests: list, index: int):
     nav = []
     if index > 0:
         nav.append(InlineKeyboardButton(text="◀ Назад", callback_data=f"nav_support_{index-1}"))
-    if index < len(enriched_requests) - 1:
+    if index < len(request_ids) - 1:
         nav.append(InlineKeyboardButton(text="Вперёд ▶", callback_data=f"nav_support_{index+1}"))
     if nav:
         builder.row(*nav)
 
     builder.row(InlineKeyboardButton(text="🔙 Главное меню", callback_data="back_to_menu"))
 
-    if req.screenshot_path and os.path.exists(req.screenshot_path):
-        photo = FSInputFile(req.screenshot_path)
+    photo = await cached_photo(req.screenshot_path)
+    if photo:
         if isinstance(target, types.Message):
-            await target.answer_photo(photo, caption=text, reply_markup=builder.as_markup())
+            sent = await target.answer_photo(photo, caption=text, reply_markup=builder.as_markup())
         else:
-            await target.message.edit_media(
+            sent = await target.message.edit_media(
                 media=types.InputMediaPhoto(media=photo, caption=text),
                 reply_markup=builder.as_markup()
             )
+        await remember_photo(req.screenshot_path, sent)
     else:
         if isinstance(target, types.Message):
             await target.answer(text, reply_markup=builder.as_markup())
@@ -962,13 +923,12 @@ async def navigate_support(callback: types.CallbackQuery):
 
     index = int(callback.data.split("_")[-1])
     user_id = callback.from_user.id
-    data = support_pagination.get(user_id)
-    if not data:
+    request_ids = await support_pages.get(user_id)
+    if not request_ids or index >= len(request_ids):
         await callback.answer("Сессия истекла. Нажмите кнопку заново.")
         return
 
-    data["index"] = index
-    await show_support_request(callback, data["requests"], index)
+    await show_support_request(callback, request_ids, index)
     await callback.answer()
 
 # Начало ответа
@@ -1019,22 +979,16 @@ async def process_support_reply(message: types.Message, state: FSMContext):
         # Обновляем обращение
         req.response = response_text
         req.status = "answered"
-        await session.commit()
 
         # Загружаем пользователя для отправки ответа
         user_result = await session.execute(select(User).where(User.id == req.user_id))
         user = user_result.scalar_one_or_none()
 
         if user and user.telegram_id:
-            try:
-                await message.bot.send_message(
-                    user.telegram_id,
-                    f"📩 <b>Ответ от техподдержки:</b>\n\n{response_text}"
-                )
-            except Exception as e:
-                await message.answer(f"Ответ сохранён, но не удалось отправить пользователю: {e}")
+            await enqueue_notification(session, user.telegram_id, f"📩 <b>Ответ от техподдержки:</b>\n\n{response_text}")
         else:
             await message.answer("Ответ сохранён, но пользователь не найден или заблокировал бота.")
+        await session.commit()
 
     await message.answer(
         "✅ Ответ успешно отправлен и сохранён.",
@@ -1073,21 +1027,15 @@ async def cmd_reply_support(message: types.Message):
 
         req.response = response_text
         req.status = "answered"
-        await session.commit()
 
         user_result = await session.execute(select(User).where(User.id == req.user_id))
         user = user_result.scalar_one_or_none()
 
         if user and user.telegram_id:
-            try:
-                await message.bot.send_message(
-                    user.telegram_id,
-                    f"📩 <b>Ответ от техподдержки:</b>\n\n{response_text}"
-                )
-            except Exception as e:
-                await message.answer(f"Ответ сохранён, но не удалось отправить: {e}")
+            await enqueue_notification(session, user.telegram_id, f"📩 <b>Ответ от техподдержки:</b>\n\n{response_text}")
         else:
             await message.answer("Ответ сохранён, но пользователь не найден.")
+        await session.commit()
 
     await message.answer("Ответ отправлен пользователю.")
 
@@ -1098,34 +1046,4 @@ async def export_support_requests(message: types.Message):
         await message.answer("Доступ запрещён.")
         return
 
-    async with AsyncSessionLocal() as session:
-        requests = (await session.execute(select(SupportRequest))).scalars().all()
-
-        if not requests:
-            await message.answer("Нет обращений для экспорта.")
-            return
-
-        data = []
-        for req in requests:
-            user = await session.get(User, req.user_id)
-            data.append({
-                "ID": req.id,
-                "ФИО": user.full_name or "—",
-                "Telegram ID": user.telegram_id,
-                "Текст обращения": req.message,
-                "Скриншот (путь)": req.screenshot_path or "—",
-                "Статус": req.status,
-                "Ответ": req.response or "—"
-            })
-
-        df = pd.DataFrame(data)
-        filename = "support_requests_export.xlsx"
-        df.to_excel(filename, index=False)
-
-        with open(filename, "rb") as f:
-            await message.answer_document(
-                BufferedInputFile(f.read(), filename=filename),
-                caption="📤 Экспорт всех обращений в техподдержку"
-            )
-
-        os.remove(filename)
\ No newline at end of file
+    await submit_export(message.bot, message.chat.id, "support_requests")
\ No newline at end of file
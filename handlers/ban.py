@@ -1,20 +1,21 @@
 from aiogram import Router, types, F
 from aiogram.filters import Command
 from aiogram.fsm.context import FSMContext
-from aiogram.types import BufferedInputFile
 from sqlalchemy import select
-import pandas as pd
-import os
 
-from database import AsyncSessionLocal, User, Role
-from config import TECH_SPECIALIST_ID, CHIEF_ADMIN_IDS
+from database import AsyncSessionLocal, User, Role, find_users
+from user_cache import invalidate_user
+from outbox import enqueue_notification
+from keyboards import get_user_pick_keyboard
+from exports import csv_export, stream_rows
+from config import TECH_SPECIALIST_ID, CHIEF_ADMIN_IDS, USER_PICK_PAGE_SIZE
 from states import BanReasonState  # Создай StatesGroup ниже или в states.py
 
 router = Router()
 
 # Проверка прав на бан/разбан
 async def can_ban_unban(user_id: int) -> bool:
-    async with AsyncSessionLocal() as session:
+    async with AsyncSessionLocal(readonly=True) as session:
         result = await session.execute(select(User).where(User.telegram_id == user_id))
         user = result.scalar_one_or_none()
         if not user:
@@ -32,16 +33,11 @@ async def start_ban(message: types.Message, state: FSMContext):
         _, target = message.text.split(maxsplit=1)
         target = target.lstrip("@")
     except ValueError:
-        await message.answer("Использование: /ban @username или /ban ID")
+        await message.answer("Использование: /ban @username, /ban ID или /ban часть ФИО")
         return
 
-    await state.update_data(target=target, action="ban")
-
-    if message.from_user.id == TECH_SPECIALIST_ID:
-        await do_ban_unban(message, state, reason="Без причины (Глав Тех Специалист)")
-    else:
-        await state.set_state(BanReasonState.reason)
-        await message.answer("Введите причину бана:")
+    await state.update_data(action="ban")
+    await resolve_target(message, state, target, message.from_user.id)
 
 # Начало разбана
 @router.message(Command("unban"))
@@ -54,16 +50,66 @@ async def start_unban(message: types.Message, state: FSMContext):
         _, target = message.text.split(maxsplit=1)
         target = target.lstrip("@")
     except ValueError:
-        await message.answer("Использование: /unban @username или /unban ID")
+        await message.answer("Использование: /unban @username, /unban ID или /unban часть ФИО")
+        return
+
+    await state.update_data(action="unban")
+    await resolve_target(message, state, target, message.from_user.id)
+
+# Поиск цели по ID/@username/ФИО; при нескольких совпадениях — список для выбора
+async def resolve_target(message: types.Message, state: FSMContext, query: str, moderator_id: int):
+    users, has_next = await find_users(query, USER_PICK_PAGE_SIZE)
+
+    if not users:
+        await message.answer("Пользователь не найден.")
+        await state.clear()
+        return
+
+    if len(users) == 1 and not has_next:
+        await state.update_data(target=str(users[0].telegram_id))
+        await ask_reason(message, state, moderator_id)
+        return
+
+    await state.update_data(pick_query=query)
+    await message.answer(
+        f"Найдено несколько пользователей по запросу «{query}». Выберите нужного:",
+        reply_markup=get_user_pick_keyboard(users, "ban", 0, USER_PICK_PAGE_SIZE, has_next)
+    )
+
+@router.callback_query(F.data.startswith("ban_page_"))
+async def pick_page(callback: types.CallbackQuery, state: FSMContext):
+    data = await state.get_data()
+    if not await can_ban_unban(callback.from_user.id) or "pick_query" not in data:
+        await callback.answer("Список устарел. Повторите команду.", show_alert=True)
         return
 
-    await state.update_data(target=target, action="unban")
+    offset = int(callback.data.split("_")[-1])
+    users, has_next = await find_users(data["pick_query"], USER_PICK_PAGE_SIZE, offset)
+    await callback.message.edit_reply_markup(
+        reply_markup=get_user_pick_keyboard(users, "ban", offset, USER_PICK_PAGE_SIZE, has_next)
+    )
+    await callback.answer()
 
-    if message.from_user.id == TECH_SPECIALIST_ID:
+@router.callback_query(F.data.startswith("ban_pick_"))
+async def pick_target(callback: types.CallbackQuery, state: FSMContext):
+    data = await state.get_data()
+    if not await can_ban_unban(callback.from_user.id) or "action" not in data:
+        await callback.answer("Список устарел. Повторите команду.", show_alert=True)
+        return
+
+    await state.update_data(target=callback.data.split("_")[-1])
+    await callback.message.edit_reply_markup(reply_markup=None)
+    await callback.answer()
+    await ask_reason(callback.message, state, callback.from_user.id)
+
+async def ask_reason(message: types.Message, state: FSMContext, moderator_id: int):
+    if moderator_id == TECH_SPECIALIST_ID:
         await do_ban_unban(message, state, reason="Без причины (Глав Тех Специалист)")
-    else:
-        await state.set_state(BanReasonState.reason)
-        await message.answer("Введите причину разбана:")
+        return
+
+    action = (await state.get_data())["action"]
+    await state.set_state(BanReasonState.reason)
+    await message.answer("Введите причину бана:" if action == "ban" else "Введите причину разбана:")
 
 # Обработка причины
 @router.message(BanReasonState.reason)
@@ -79,10 +125,8 @@ async def do_ban_unban(message: types.Message, state: FSMContext, reason: str):
     action = data["action"]
 
     async with AsyncSessionLocal() as session:
-        if target.isdigit():
-            result = await session.execute(select(User).where(User.telegram_id == int(target)))
-        else:
-            result = await session.execute(select(User).where(User.full_name.ilike(f"%{target}%")))
+        # target — telegram_id, уже выбранный в resolve_target
+        result = await session.execute(select(User).where(User.telegram_id == int(target)))
         user = result.scalar_one_or_none()
 
         if not user:
@@ -110,13 +154,11 @@ async def do_ban_unban(message: types.Message, state: FSMContext, reason: str):
             action_text = "разблокирован"
             user_text = "✅ Вы разблокированы в боте MUN."
 
+        await enqueue_notification(session, user.telegram_id, user_text.format(reason=reason or old_reason or "Не указана"))
         await session.commit()
+        invalidate_user(user.telegram_id)
 
         await message.answer(f"Пользователь {user.full_name or user.telegram_id} {action_text}.")
-        try:
-            await message.bot.send_message(user.telegram_id, user_text.format(reason=reason or old_reason or "Не указана"))
-        except:
-            pass
 
     await state.clear()
 
@@ -127,28 +169,19 @@ async def banned_list(message: types.Message):
         await message.answer("Доступ запрещён.")
         return
 
-    async with AsyncSessionLocal() as session:
-        result = await session.execute(select(User).where(User.is_banned == True))
-        banned_users = result.scalars().all()
-
-        if not banned_users:
+    async with AsyncSessionLocal(readonly=True) as session:
+        stmt = select(User.telegram_id, User.full_name, User.ban_reason).where(User.is_banned == True).order_by(User.id)
+        file, count = await csv_export(
+            "banned_users.csv",
+            ("Telegram ID", "ФИО", "Причина бана"),
+            (
+                (telegram_id, full_name or "—", ban_reason or "Не указана")
+                async for telegram_id, full_name, ban_reason in stream_rows(session, stmt)
+            )
+        )
+
+    with file:
+        if not count:
             await message.answer("Забаненных пользователей нет.")
             return
-
-        data = []
-        for user in banned_users:
-            data.append({
-                "Telegram ID": user.telegram_id,
-                "ФИО": user.full_name or "—",
-                "Причина бана": user.ban_reason or "Не указана"
-            })
-
-    df = pd.DataFrame(data)
-    filename = "banned_users.csv"
-    df.to_csv(filename, index=False, encoding="utf-8-sig")
-
-    with open(filename, "rb") as f:
-        file = BufferedInputFile(f.read(), filename=filename)
-
-    await message.answer_document(file, caption="📋 Список забаненных пользователей")
-    os.remove(filename)
\ No newline at end of file
+        await message.answer_document(file, caption="📋 Список забаненных пользователей")
\ No newline at end of file
@@ -1,11 +1,17 @@
 from aiogram import Router, types, F
-from aiogram.filters import Command
+from aiogram.filters import Command, CommandObject
 from aiogram.fsm.context import FSMContext
-from aiogram.types import InlineKeyboardButton, FSInputFile
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import (
+    InlineKeyboardButton, InlineQueryResultArticle, InputTextMessageContent
+)
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 from sqlalchemy import select, func
-from datetime import datetime, timedelta
+from sqlalchemy.orm import joinedload
+from datetime import date, datetime, timedelta
+import html
 import os
+import re
 
 from database import (
     AsyncSessionLocal,
@@ -15,17 +21,22 @@ from database import (
     Role,
     ConferenceCreationRequest,
     SupportRequest,
-    get_or_create_user
+    run_write,
+    parse_date,
+    search_conferences,
+    conference_catalog_page
 )
 from keyboards import get_conferences_keyboard, get_cancel_keyboard, get_main_menu_keyboard
+from user_cache import get_cached_user
+from outbox import enqueue_notification
+from media_cache import cached_photo, remember_photo
+from media_store import store_photo
+from admission import remember_reply
 from states import ParticipantRegistration, CreateConferenceRequest, SupportAppeal
-from config import CHIEF_ADMIN_IDS, TECH_SPECIALIST_ID
+from config import CHIEF_ADMIN_IDS, TECH_SPECIALIST_ID, SEARCH_PAGE_SIZE, CATALOG_PAGE_SIZE
 
 router = Router()
 
-os.makedirs("qr_codes", exist_ok=True)
-os.makedirs("posters", exist_ok=True)
-os.makedirs("support_screenshots", exist_ok=True)
 
 # Валидация даты: минимум завтра, максимум 5 лет
 def validate_conference_date(date_str: str) -> str | None:
@@ -45,85 +56,251 @@ def validate_conference_date(date_str: str) -> str | None:
 
     return None
 
-# Форматирование даты
-def format_conference_date(date_str: str) -> str:
-    try:
-        conf_date = datetime.strptime(date_str.strip(), "%Y-%m-%d")
-        return f"Дата проведения: {conf_date.strftime('%d %B %Y')}"
-    except:
-        return f"Дата: {date_str}"
+# Форматирование даты (date из БД или строка из формы)
+def format_conference_date(conf_date: date | str | None) -> str:
+    parsed = parse_date(conf_date)
+    if parsed is None:
+        return f"Дата: {conf_date or '—'}"
+    return f"Дата проведения: {parsed.strftime('%d %B %Y')}"
 
-# Список конференций
+# Каталог конференций: одно сообщение, которое редактируется кнопками.
+# Страница — до CATALOG_PAGE_SIZE карточек, выбранная показывается подробно (с постером)
 @router.message(Command("conferences"))
 async def cmd_conferences(message: types.Message):
-    async with AsyncSessionLocal() as session:
-        result = await session.execute(
-            select(Conference).where(Conference.is_active == True)
+    await show_catalog(message, None, 0)
+
+@router.callback_query(F.data.startswith("catalog_"))
+async def catalog_page(callback: types.CallbackQuery):
+    # catalog_{date_start}_{id}_{focus}: ключ первой карточки страницы и номер выбранной
+    _, anchor_date, anchor_id, focus = callback.data.split("_")
+    anchor = (date.fromisoformat(anchor_date), int(anchor_id))
+    await show_catalog(callback, anchor, int(focus))
+    await callback.answer()
+
+def catalog_callback(anchor: tuple[date, int], focus: int = 0) -> str:
+    return f"catalog_{anchor[0].isoformat()}_{anchor[1]}_{focus}"
+
+async def show_catalog(target: types.Message | types.CallbackQuery, anchor: tuple[date, int] | None, focus: int):
+    conferences, prev_anchor, next_anchor = await conference_catalog_page(anchor, CATALOG_PAGE_SIZE)
+    if not conferences and anchor:
+        # Страница опустела (конференции прошли или удалены) — с начала каталога
+        conferences, prev_anchor, next_anchor = await conference_catalog_page(None, CATALOG_PAGE_SIZE)
+
+    if not conferences:
+        text = (
+            "😔 Пока нет актуальных конференций.\n"
+            "Следите за обновлениями или создайте свою!"
         )
-        conferences = result.scalars().all()
+        if isinstance(target, types.Message):
+            await target.answer(text)
+        else:
+            await target.message.delete()
+            await target.message.answer(text)
+        return
 
-        if not conferences:
-            await message.answer(
-                "😔 Пока нет актуальных конференций.\n"
-                "Следите за обновлениями или создайте свою!"
-            )
-            return
+    focus = min(focus, len(conferences) - 1)
+    conf = conferences[focus]
+    page_anchor = (conferences[0].date_start, conferences[0].id)
+
+    text = "📚 <b>Конференции</b>\n\n"
+    for number, item in enumerate(conferences, start=1):
+        line = f"{number}. {html.escape(item.name)} — {html.escape(item.city or 'Онлайн')}, {item.date_start.strftime('%d.%m.%Y')}"
+        text += f"<b>{line}</b>\n" if item is conf else f"{line}\n"
+
+    card = f"\n<b>{html.escape(conf.name)}</b>\n"
+    card += f"📍 {html.escape(conf.city or 'Онлайн')}\n"
+    card += f"📅 {html.escape(format_conference_date(conf.date))}\n"
+    card += f"💸 Оргвзнос: {conf.fee} руб." if conf.fee > 0 else "🆓 Бесплатно"
+
+    builder = InlineKeyboardBuilder()
+    builder.row(*(
+        InlineKeyboardButton(
+            text=f"• {number + 1} •" if number == focus else str(number + 1),
+            callback_data=catalog_callback(page_anchor, number)
+        )
+        for number in range(len(conferences))
+    ))
+    builder.row(InlineKeyboardButton(text=f"Подать заявку: {conf.name}", callback_data=f"select_conf_{conf.id}"))
+    nav = []
+    if prev_anchor:
+        nav.append(InlineKeyboardButton(text="◀ Назад", callback_data=catalog_callback(prev_anchor)))
+    if next_anchor:
+        nav.append(InlineKeyboardButton(text="Вперёд ▶", callback_data=catalog_callback(next_anchor)))
+    if nav:
+        builder.row(*nav)
+    markup = builder.as_markup()
+
+    photo = await cached_photo(conf.poster_path)
+    text += card
+    # Экранируем до обрезки, чтобы считать длину того, что уйдёт в Telegram
+    description = html.escape(conf.description or "")
+    if photo:
+        # Подпись к фото ограничена 1024 символами — режем описание
+        room = 1024 - len(text) - len("\n\n<i>…</i>")
+        if room <= 0:
+            # Карточка не влезает в подпись и без описания — показываем её текстом, без постера
+            photo = None
+        elif len(description) > room:
+            # Обрезанная сущность вроде «&am» сломала бы разметку
+            description = re.sub(r"&[^;]*$", "", description[:room]) + "…"
+    if description:
+        text += f"\n\n<i>{description}</i>"
+
+    if anchor is None and focus == 0:
+        # Первая страница — ответ на «Просмотр конференций» при перегрузке
+        remember_reply("catalog", text, markup, photo if isinstance(photo, str) else None)
+
+    if isinstance(target, types.Message):
+        if photo:
+            sent = await target.answer_photo(photo, caption=text, reply_markup=markup)
+            await remember_photo(conf.poster_path, sent)
+        else:
+            await target.answer(text, reply_markup=markup)
+        return
 
-        for conf in conferences:
-            text = f"<b>{conf.name}</b>\n"
-            text += f"📍 {conf.city or 'Онлайн'}\n"
-            text += f"📅 {format_conference_date(conf.date)}\n"
-            fee_text = f"💸 Оргвзнос: {conf.fee} руб." if conf.fee > 0 else "🆓 Бесплатно"
-            text += f"{fee_text}\n\n"
-            if conf.description:
-                text += f"<i>{conf.description}</i>\n\n"
-            text += "Нажмите кнопку ниже, чтобы подать заявку:"
-
-            builder = InlineKeyboardBuilder()
-            builder.row(InlineKeyboardButton(text="Подать заявку", callback_data=f"select_conf_{conf.id}"))
-
-            if conf.poster_path and os.path.exists(conf.poster_path):
-                photo = FSInputFile(conf.poster_path)
-                await message.answer_photo(photo, caption=text, reply_markup=builder.as_markup())
+    message = target.message
+    try:
+        if photo and message.photo:
+            sent = await message.edit_media(media=types.InputMediaPhoto(media=photo, caption=text), reply_markup=markup)
+            await remember_photo(conf.poster_path, sent)
+        elif not photo and not message.photo:
+            await message.edit_text(text, reply_markup=markup)
+        else:
+            # Текстовое сообщение нельзя превратить в фото и наоборот — пересылаем карточку
+            await message.delete()
+            if photo:
+                sent = await message.answer_photo(photo, caption=text, reply_markup=markup)
+                await remember_photo(conf.poster_path, sent)
             else:
-                await message.answer(text, reply_markup=builder.as_markup())
+                await message.answer(text, reply_markup=markup)
+    except TelegramBadRequest as e:
+        if "message is not modified" not in e.message:
+            raise
 
 # Регистрация
 @router.message(Command("register"))
 async def cmd_register(message: types.Message):
     await cmd_conferences(message)
 
+# Поиск по каталогу: /search текст
+@router.message(Command("search"))
+async def cmd_search(message: types.Message, command: CommandObject, state: FSMContext):
+    query = (command.args or "").strip()
+    if not query:
+        await message.answer("Использование: /search название, город или слово из описания")
+        return
+
+    await state.update_data(search_query=query)
+    await show_search_page(message, query, 0)
+
+@router.callback_query(F.data.startswith("search_page_"))
+async def search_page(callback: types.CallbackQuery, state: FSMContext):
+    query = (await state.get_data()).get("search_query")
+    if not query:
+        await callback.answer("Поиск устарел. Повторите /search.", show_alert=True)
+        return
+
+    offset = int(callback.data.split("_")[-1])
+    await show_search_page(callback, query, offset)
+    await callback.answer()
+
+async def show_search_page(target: types.Message | types.CallbackQuery, query: str, offset: int):
+    conferences, has_next = await search_conferences(query, SEARCH_PAGE_SIZE, offset)
+
+    # Запрос и поля конференций — пользовательский текст в HTML-сообщении: без экранирования
+    # «a<b» ломает разметку, и Telegram отклоняет ответ целиком
+    if not conferences and offset == 0:
+        await target.answer(f"По запросу «{html.escape(query)}» ничего не найдено.")
+        return
+
+    text = f"🔎 <b>Результаты поиска «{html.escape(query)}»</b>\n\n"
+    builder = InlineKeyboardBuilder()
+    for number, conf in enumerate(conferences, start=offset + 1):
+        text += f"{number}. <b>{html.escape(conf.name)}</b>\n"
+        text += f"📍 {html.escape(conf.city or 'Онлайн')} · 📅 {format_conference_date(conf.date)}\n\n"
+        builder.row(InlineKeyboardButton(text=f"Подать заявку: {conf.name}", callback_data=f"select_conf_{conf.id}"))
+
+    nav = []
+    if offset > 0:
+        nav.append(InlineKeyboardButton(text="◀ Назад", callback_data=f"search_page_{max(offset - SEARCH_PAGE_SIZE, 0)}"))
+    if has_next:
+        nav.append(InlineKeyboardButton(text="Вперёд ▶", callback_data=f"search_page_{offset + SEARCH_PAGE_SIZE}"))
+    if nav:
+        builder.row(*nav)
+
+    if isinstance(target, types.Message):
+        await target.answer(text, reply_markup=builder.as_markup())
+    else:
+        await target.message.edit_text(text, reply_markup=builder.as_markup())
+
+# Inline-режим: @бот текст — тот же поиск, страницы через offset
+@router.inline_query()
+async def inline_search(inline_query: types.InlineQuery):
+    query = inline_query.query.strip()
+    offset = int(inline_query.offset or 0)
+    if not query:
+        await inline_query.answer([], cache_time=5)
+        return
+
+    conferences, has_next = await search_conferences(query, SEARCH_PAGE_SIZE, offset)
+
+    results = []
+    for conf in conferences:
+        # title и description результата — простой текст, а карточка уходит в HTML
+        card = (
+            f"<b>{html.escape(conf.name)}</b>\n📍 {html.escape(conf.city or 'Онлайн')}\n"
+            f"📅 {format_conference_date(conf.date)}"
+        )
+        if conf.description:
+            card += f"\n\n<i>{html.escape(conf.description)}</i>"
+        builder = InlineKeyboardBuilder()
+        builder.row(InlineKeyboardButton(text="Подать заявку", callback_data=f"select_conf_{conf.id}"))
+        results.append(InlineQueryResultArticle(
+            id=str(conf.id),
+            title=conf.name,
+            description=f"{conf.city or 'Онлайн'} · {format_conference_date(conf.date)}",
+            input_message_content=InputTextMessageContent(message_text=card),
+            reply_markup=builder.as_markup()
+        ))
+
+    await inline_query.answer(
+        results,
+        cache_time=30,
+        next_offset=str(offset + SEARCH_PAGE_SIZE) if has_next else ""
+    )
+
 # Выбор конференции
 @router.callback_query(F.data.startswith("select_conf_"))
 async def select_conference(callback: types.CallbackQuery, state: FSMContext):
     conf_id = int(callback.data.split("_")[-1])
 
-    async with AsyncSessionLocal() as session:
+    async with AsyncSessionLocal(readonly=True) as session:
         conf = await session.get(Conference, conf_id)
         if not conf:
             await callback.answer("Конференция не найдена.", show_alert=True)
             return
 
-        today = datetime.now().date()
-        try:
-            conf_date = datetime.strptime(conf.date.strip(), "%Y-%m-%d").date()
-        except ValueError:
+        if conf.date is None:
             await callback.answer("Ошибка в дате конференции.", show_alert=True)
             return
 
-        if conf_date < today:
+        if conf.date < date.today():
             await callback.answer("Нельзя подать заявку на конференцию, которая уже прошла.", show_alert=True)
             return
 
     await state.update_data(conference_id=conf_id)
     await state.set_state(ParticipantRegistration.full_name)
 
-    await callback.message.edit_text(
+    form_text = (
         "✅ Конференция выбрана!\n\n"
         "<b>Заполните анкету участника</b>\n\n"
-        "1. ФИО (полностью):",
-        reply_markup=get_cancel_keyboard()
+        "1. ФИО (полностью):"
     )
+    if callback.message:
+        await callback.message.edit_text(form_text, reply_markup=get_cancel_keyboard())
+    else:
+        # Кнопка из inline-результата: сообщения бота в чате нет, анкету шлём в личку
+        await callback.bot.send_message(callback.from_user.id, form_text, reply_markup=get_cancel_keyboard())
     await callback.answer()
 
 # Анкета участника — без изменений (все функции как в твоём коде)
@@ -172,7 +349,7 @@ async def process_committee(message: types.Message, state: FSMContext):
     data = await state.get_data()
     data["committee"] = message.text.strip()
 
-    async with AsyncSessionLocal() as session:
+    async def save_application(session):
         user_result = await session.execute(select(User).where(User.telegram_id == message.from_user.id))
         user = user_result.scalar_one()
 
@@ -189,31 +366,29 @@ async def process_committee(message: types.Message, state: FSMContext):
             status="pending"
         )
         session.add(application)
-        await session.commit()
-        await session.refresh(application)
-
-        conf = await session.get(Conference, data["conference_id"])
-
-        notify_text = (
-            f"🔔 <b>Новая заявка на участие!</b>\n\n"
-            f"Конференция: <b>{conf.name}</b>\n\n"
-            f"<b>Анкета участника:</b>\n"
-            f"• ФИО: {data.get('full_name')}\n"
-            f"• Возраст: {data.get('age')}\n"
-            f"• Email: {data.get('email')}\n"
-            f"• Учебное заведение: {data.get('institution')}\n"
-            f"• Опыт в MUN: {data.get('experience')}\n"
-            f"• Комитет: {data['committee']}\n\n"
-            f"ID заявки: <code>{application.id}</code>"
-        )
+        await session.flush()
+
+        conf = await session.get(Conference, data["conference_id"], options=[joinedload(Conference.organizer)])
+        if conf.organizer:
+            notify_text = (
+                f"🔔 <b>Новая заявка на участие!</b>\n\n"
+                f"Конференция: <b>{conf.name}</b>\n\n"
+                f"<b>Анкета участника:</b>\n"
+                f"• ФИО: {data.get('full_name')}\n"
+                f"• Возраст: {data.get('age')}\n"
+                f"• Email: {data.get('email')}\n"
+                f"• Учебное заведение: {data.get('institution')}\n"
+                f"• Опыт в MUN: {data.get('experience')}\n"
+                f"• Комитет: {data['committee']}\n\n"
+                f"ID заявки: <code>{application.id}</code>"
+            )
+            await enqueue_notification(
+                session, conf.organizer.telegram_id, notify_text, dedup_key=f"application:{application.id}:new"
+            )
 
-        if conf.organizer_id:
-            try:
-                await message.bot.send_message(conf.organizer.telegram_id, notify_text)
-            except:
-                pass
+    await run_write(save_application)
 
-    db_user = await get_or_create_user(message.from_user.id, message.from_user.full_name)
+    db_user = await get_cached_user(message.from_user.id, message.from_user.full_name)
     await message.answer(
         "✅ <b>Заявка успешно отправлена!</b>\n\n"
         "Организатор рассмотрит её в ближайшее время.\n"
@@ -225,7 +400,7 @@ async def process_committee(message: types.Message, state: FSMContext):
 # Создание конференции — с валидацией
 @router.message(F.text == "Создать конференцию")
 async def cmd_create_conference(message: types.Message, state: FSMContext):
-    async with AsyncSessionLocal() as session:
+    async with AsyncSessionLocal(readonly=True) as session:
         user_result = await session.execute(select(User).where(User.telegram_id == message.from_user.id))
         user = user_result.scalar_one_or_none()
 
@@ -293,9 +468,7 @@ async def process_conf_fee(message: types.Message, state: FSMContext):
 
 @router.message(CreateConferenceRequest.qr_code, F.photo)
 async def process_conf_qr_photo(message: types.Message, state: FSMContext):
-    file_info = await message.bot.get_file(message.photo[-1].file_id)
-    qr_path = f"qr_codes/qr_{message.from_user.id}_{message.message_id}.jpg"
-    await message.bot.download_file(file_info.file_path, qr_path)
+    qr_path = await store_photo(message.bot, message.photo[-1], "qr_codes")
     await state.update_data(qr_code_path=qr_path)
     await state.set_state(CreateConferenceRequest.poster)
     await message.answer("Отправьте постер конференции (фото). Можно пропустить, написав 'нет':",
@@ -310,9 +483,7 @@ async def process_conf_qr_skip(message: types.Message, state: FSMContext):
 
 @router.message(CreateConferenceRequest.poster, F.photo)
 async def process_conf_poster(message: types.Message, state: FSMContext):
-    file_info = await message.bot.get_file(message.photo[-1].file_id)
-    poster_path = f"posters/poster_{message.from_user.id}_{message.message_id}.jpg"
-    await message.bot.download_file(file_info.file_path, poster_path)
+    poster_path = await store_photo(message.bot, message.photo[-1], "posters")
     await state.update_data(poster_path=poster_path)
     await finish_conference_creation(message, state)
 
@@ -335,7 +506,7 @@ async def finish_conference_creation(message: types.Message, state: FSMContext):
             status="pending"
         )
         session.add(req)
-        await session.commit()
+        await session.flush()
 
         user = await session.get(User, user_id)
         notify_text = (
@@ -353,10 +524,8 @@ async def finish_conference_creation(message: types.Message, state: FSMContext):
         )).scalars().all()
 
         for admin_id in set(admins + CHIEF_ADMIN_IDS):
-            try:
-                await message.bot.send_message(admin_id, notify_text)
-            except:
-                pass
+            await enqueue_notification(session, admin_id, notify_text, dedup_key=f"creation_request:{req.id}:new:{admin_id}")
+        await session.commit()
 
     await message.answer(
         "✅ <b>Заявка на создание конференции отправлена!</b>\n\n"
@@ -382,13 +551,11 @@ async def start_support_appeal(message: types.Message, state: FSMContext):
 
 @router.message(SupportAppeal.message, F.photo)
 async def save_support_appeal_with_photo(message: types.Message, state: FSMContext):
-    file_info = await message.bot.get_file(message.photo[-1].file_id)
-    screenshot_path = f"support_screenshots/support_{message.from_user.id}_{message.message_id}.jpg"
-    await message.bot.download_file(file_info.file_path, screenshot_path)
+    screenshot_path = await store_photo(message.bot, message.photo[-1], "support_screenshots")
 
     text = message.caption or "Без текста (только скриншот)"
 
-    async with AsyncSessionLocal() as session:
+    async def save_request(session):
         user_id = (await session.execute(select(User.id).where(User.telegram_id == message.from_user.id))).scalar_one()
         req = SupportRequest(
             user_id=user_id,
@@ -397,7 +564,7 @@ async def save_support_appeal_with_photo(message: types.Message, state: FSMConte
             status="pending"
         )
         session.add(req)
-        await session.commit()
+        await session.flush()
 
         notify_text = (
             f"🆘 Новое обращение в техподдержку!\n\n"
@@ -405,12 +572,14 @@ async def save_support_appeal_with_photo(message: types.Message, state: FSMConte
             f"Текст: {text}\n"
             f"ID обращения: <code>{req.id}</code>"
         )
-        try:
-            await message.bot.send_photo(TECH_SPECIALIST_ID, message.photo[-1].file_id, caption=notify_text)
-        except Exception as e:
-            print(f"Ошибка отправки фото теху: {e}")
+        await enqueue_notification(
+            session, TECH_SPECIALIST_ID, notify_text,
+            photo=message.photo[-1].file_id, dedup_key=f"support_request:{req.id}:new"
+        )
+
+    await run_write(save_request)
 
-    db_user = await get_or_create_user(message.from_user.id, message.from_user.full_name)
+    db_user = await get_cached_user(message.from_user.id, message.from_user.full_name)
     await message.answer(
         "✅ Ваше обращение с скриншотом отправлено в техподдержку.\n"
         "Мы ответим вам в ближайшее время.",
@@ -420,7 +589,7 @@ async def save_support_appeal_with_photo(message: types.Message, state: FSMConte
 
 @router.message(SupportAppeal.message, F.text)
 async def save_support_appeal_text_only(message: types.Message, state: FSMContext):
-    async with AsyncSessionLocal() as session:
+    async def save_request(session):
         user_id = (await session.execute(select(User.id).where(User.telegram_id == message.from_user.id))).scalar_one()
         req = SupportRequest(
             user_id=user_id,
@@ -429,7 +598,7 @@ async def save_support_appeal_text_only(message: types.Message, state: FSMContex
             status="pending"
         )
         session.add(req)
-        await session.commit()
+        await session.flush()
 
         notify_text = (
             f"🆘 Новое обращение в техподдержку!\n\n"
@@ -437,12 +606,11 @@ async def save_support_appeal_text_only(message: types.Message, state: FSMContex
             f"Текст: {message.text}\n"
             f"ID обращения: <code>{req.id}</code>"
         )
-        try:
-            await message.bot.send_message(TECH_SPECIALIST_ID, notify_text)
-        except Exception as e:
-            print(f"Ошибка отправки текста теху: {e}")
+        await enqueue_notification(session, TECH_SPECIALIST_ID, notify_text, dedup_key=f"support_request:{req.id}:new")
+
+    await run_write(save_request)
 
-    db_user = await get_or_create_user(message.from_user.id, message.from_user.full_name)
+    db_user = await get_cached_user(message.from_user.id, message.from_user.full_name)
     await message.answer(
         "✅ Ваше обращение отправлено в техподдержку.\n"
         "Мы ответим вам в ближайшее время.",
@@ -451,15 +619,18 @@ async def save_support_appeal_text_only(message: types.Message, state: FSMContex
     await state.clear()
 
 # Помощь
+HELP_TEXT = (
+    "ℹ️ <b>Помощь</b>\n\n"
+    "Поиск конференций: /search текст или @бот текст в любом чате.\n"
+    "Если у вас проблемы с ботом — используйте кнопку \"Обращение к тех. специалисту\"\n"
+    "По вопросам MUN — обратитесь к организатору вашей конференции."
+)
+remember_reply("help", HELP_TEXT, ttl=float("inf"))
+
 @router.message(Command("help"))
 async def cmd_help(message: types.Message):
-    db_user = await get_or_create_user(message.from_user.id, message.from_user.full_name)
-    await message.answer(
-        "ℹ️ <b>Помощь</b>\n\n"
-        "Если у вас проблемы с ботом — используйте кнопку \"Обращение к тех. специалисту\"\n"
-        "По вопросам MUN — обратитесь к организатору вашей конференции.",
-        reply_markup=get_main_menu_keyboard(db_user.role)
-    )
+    db_user = await get_cached_user(message.from_user.id, message.from_user.full_name)
+    await message.answer(HELP_TEXT, reply_markup=get_main_menu_keyboard(db_user.role))
 
 # Отмена
 @router.callback_query(F.data == "cancel_form")
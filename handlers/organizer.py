@@ -1,32 +1,37 @@
 from aiogram import Router, types, F
 from aiogram.filters import Command
-from aiogram.types import FSInputFile, InlineKeyboardButton, BufferedInputFile
+from aiogram.types import InlineKeyboardButton
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 from aiogram.fsm.context import FSMContext
 from sqlalchemy import select, func, delete
 from sqlalchemy.orm import joinedload
 from datetime import datetime, timedelta
-import os
-import pandas as pd
 
-from database import AsyncSessionLocal, Conference, Application, User, Role, ConferenceEditRequest
+from database import (
+    AsyncSessionLocal, Conference, Application, ArchivedApplication, User, Role, ConferenceEditRequest, run_write
+)
 from keyboards import get_main_menu_keyboard, get_cancel_keyboard
+from user_cache import invalidate_user
 from states import RejectReason, EditConference, Broadcast
-from config import CHIEF_ADMIN_IDS
+from broadcast import start_broadcast as launch_broadcast
+from outbox import enqueue_notification
+from media_cache import cached_photo, remember_photo
+from media_store import store_photo
+from state_store import StateStore
+from export_jobs import submit_export
+from config import CHIEF_ADMIN_IDS, STATE_STORE_TTL, STATE_STORE_SIZE
 
 router = Router()
 
 PAYMENTS_DIR = "payments"
-os.makedirs(PAYMENTS_DIR, exist_ok=True)
-os.makedirs("qr_codes", exist_ok=True)
-os.makedirs("posters", exist_ok=True)  # Папка для постеров
 
-pagination = {}
-last_my_conferences_msg = {}
+# Режим и позиция просмотра заявок, id последнего сообщения «Мои конференции» — по telegram_id
+application_pages = StateStore("application_pages", STATE_STORE_TTL, STATE_STORE_SIZE)
+my_conferences_messages = StateStore("my_conferences_messages", STATE_STORE_TTL, STATE_STORE_SIZE)
 
 # Проверка: Организатор и НЕ забанен
 async def is_active_organizer(user_id: int) -> bool:
-    async with AsyncSessionLocal() as session:
+    async with AsyncSessionLocal(readonly=True) as session:
         result = await session.execute(select(User).where(User.telegram_id == user_id))
         user = result.scalar_one_or_none()
         if not user:
@@ -38,7 +43,7 @@ async def get_applications(user_id: int, mode: str):
     if not await is_active_organizer(user_id):
         return []
 
-    async with AsyncSessionLocal() as session:
+    async with AsyncSessionLocal(readonly=True) as session:
         organizer_result = await session.execute(select(User).where(User.telegram_id == user_id))
         organizer = organizer_result.scalar_one_or_none()
 
@@ -54,11 +59,20 @@ async def get_applications(user_id: int, mode: str):
 
         if mode == "current":
             query = query.where(Application.status.in_(["pending", "payment_pending", "payment_sent", "confirmed"]))
-        else:
-            query = query.where(Application.status.in_(["approved", "rejected", "link_sent"]))
+            result = await session.execute(query.order_by(Application.id))
+            return result.unique().scalars().all()
+
+        query = query.where(Application.status.in_(["approved", "rejected", "link_sent"]))
+        hot = (await session.execute(query)).unique().scalars().all()
+
+        # Заявки прошедших конференций уже перенесены архиватором в applications_archive
+        archived_query = select(ArchivedApplication).options(
+            joinedload(ArchivedApplication.user),
+            joinedload(ArchivedApplication.conference)
+        ).where(ArchivedApplication.conference_id.in_(conf_ids))
+        cold = (await session.execute(archived_query)).unique().scalars().all()
 
-        result = await session.execute(query.order_by(Application.id))
-        return result.unique().scalars().all()
+        return sorted([*hot, *cold], key=lambda app: app.id)
 
 # Клавиатура для заявки
 def build_keyboard(app_id: int, index: int, total: int, mode: str):
@@ -123,7 +137,7 @@ async def my_conferences(message: types.Message):
         await message.answer("Доступ запрещён: вы заблокированы или не являетесь Организатором.")
         return
 
-    async with AsyncSessionLocal() as session:
+    async with AsyncSessionLocal(readonly=True) as session:
         organizer_result = await session.execute(select(User).where(User.telegram_id == user_id))
         organizer = organizer_result.scalar_one_or_none()
 
@@ -151,14 +165,15 @@ async def my_conferences(message: types.Message):
 
         builder.row(InlineKeyboardButton(text="🔙 Главное меню", callback_data="back_to_menu"))
 
-        if user_id in last_my_conferences_msg:
+        last_message_id = await my_conferences_messages.get(user_id)
+        if last_message_id:
             try:
-                await message.bot.delete_message(message.chat.id, last_my_conferences_msg[user_id])
+                await message.bot.delete_message(message.chat.id, last_message_id)
             except:
                 pass
 
         sent_msg = await message.answer(text, reply_markup=builder.as_markup())
-        last_my_conferences_msg[user_id] = sent_msg.message_id
+        await my_conferences_messages.set(user_id, sent_msg.message_id)
 
 # Экспорт участников
 @router.callback_query(F.data.startswith("export_conf_"))
@@ -168,45 +183,14 @@ async def export_conference_participants(callback: types.CallbackQuery):
         return
 
     conf_id = int(callback.data.split("_")[-1])
-    async with AsyncSessionLocal() as session:
+    async with AsyncSessionLocal(readonly=True) as session:
         conf = await session.get(Conference, conf_id)
         if not conf:
             await callback.answer("Конференция не найдена.")
             return
 
-        result = await session.execute(
-            select(Application).options(joinedload(Application.user)).where(Application.conference_id == conf_id)
-        )
-        apps = result.scalars().all()
-
-        if not apps:
-            await callback.answer("Нет участников для экспорта", show_alert=True)
-            return
-
-        data = []
-        for app in apps:
-            participant = app.user
-            data.append({
-                "ФИО": participant.full_name or "—",
-                "Возраст": participant.age or "—",
-                "Email": participant.email or "—",
-                "Учебное заведение": participant.institution or "—",
-                "Опыт в MUN": participant.experience or "—",
-                "Комитет": app.committee or "—",
-                "Статус": app.status,
-                "Причина отклонения": app.reject_reason or "—"
-            })
-
-        df = pd.DataFrame(data)
-        filename = f"participants_{conf.name.replace(' ', '_')[:20]}.xlsx"
-        df.to_excel(filename, index=False)
-
-        with open(filename, "rb") as f:
-            file = BufferedInputFile(f.read(), filename=filename)
-
-        await callback.message.answer_document(file, caption=f"📊 Экспорт участников конференции {conf.name}")
-        await callback.answer("Файл отправлен!")
-        os.remove(filename)
+    await submit_export(callback.bot, callback.message.chat.id, "participants", (conf_id,))
+    await callback.answer("Экспорт запущен")
 
 # Текущие заявки
 @router.message(F.text == "📩 Заявки участников")
@@ -216,7 +200,7 @@ async def current_applications(message: types.Message):
         return
 
     apps = await get_applications(message.from_user.id, "current")
-    pagination[message.from_user.id] = {"mode": "current", "index": 0}
+    await application_pages.set(message.from_user.id, {"mode": "current", "index": 0})
     await show_application(message, apps, 0, "current")
 
 # Архив заявок
@@ -227,7 +211,7 @@ async def archive_applications(message: types.Message):
         return
 
     apps = await get_applications(message.from_user.id, "archive")
-    pagination[message.from_user.id] = {"mode": "archive", "index": 0}
+    await application_pages.set(message.from_user.id, {"mode": "archive", "index": 0})
     await show_application(message, apps, 0, "archive")
 
 # Навигация
@@ -240,7 +224,7 @@ async def navigate(callback: types.CallbackQuery):
     _, mode, index_str = callback.data.split("_")
     index = int(index_str)
     user_id = callback.from_user.id
-    pagination[user_id]["index"] = index
+    await application_pages.set(user_id, {"mode": mode, "index": index})
     apps = await get_applications(user_id, mode)
     await show_application(callback, apps, index, mode)
     await callback.answer()
@@ -253,34 +237,39 @@ async def approve_application(callback: types.CallbackQuery):
         return
 
     app_id = int(callback.data.split("_")[1])
-    async with AsyncSessionLocal() as session:
+
+    async def approve(session):
         app = await session.get(Application, app_id)
         if not app:
-            await callback.answer("Заявка не найдена.")
-            return
+            return None
 
         app.status = "approved"
-        await session.commit()
-
         conf = await session.get(Conference, app.conference_id)
         participant = await session.get(User, app.user_id)
-
-        await callback.bot.send_message(
+        await enqueue_notification(
+            session,
             participant.telegram_id,
             f"🎉 <b>Ваша заявка на {conf.name} одобрена!</b>\n\n"
             "Нажмите кнопку ниже для подтверждения участия.",
             reply_markup=types.InlineKeyboardMarkup(inline_keyboard=[
-                [InlineKeyboardButton(text="Подтвердить участие", callback_data=f"confirm_part_{app.id}")]
-            ])
+                [InlineKeyboardButton(text="Подтвердить участие", callback_data=f"confirm_part_{app_id}")]
+            ]),
+            dedup_key=f"application:{app_id}:approved"
         )
+        return True
 
-        await callback.answer("Заявка одобрена")
+    approved = await run_write(approve)
+    if not approved:
+        await callback.answer("Заявка не найдена.")
+        return
 
-        user_id = callback.from_user.id
-        state = pagination.get(user_id, {"mode": "current", "index": 0})
-        apps = await get_applications(user_id, state["mode"])
-        if apps and state["index"] < len(apps):
-            await show_application(callback, apps, state["index"], state["mode"])
+    await callback.answer("Заявка одобрена")
+
+    user_id = callback.from_user.id
+    state = await application_pages.get(user_id, {"mode": "current", "index": 0})
+    apps = await get_applications(user_id, state["mode"])
+    if apps and state["index"] < len(apps):
+        await show_application(callback, apps, state["index"], state["mode"])
 
 # Отклонение заявки
 @router.callback_query(F.data.startswith("reject_"))
@@ -310,15 +299,17 @@ async def save_reject_reason(message: types.Message, state: FSMContext):
         if app:
             app.status = "rejected"
             app.reject_reason = message.text
-            await session.commit()
 
             conf = await session.get(Conference, app.conference_id)
             participant = await session.get(User, app.user_id)
 
-            await message.bot.send_message(
+            await enqueue_notification(
+                session,
                 participant.telegram_id,
-                f"К сожалению, ваша заявка на {conf.name} отклонена.\n\nПричина: {message.text}"
+                f"К сожалению, ваша заявка на {conf.name} отклонена.\n\nПричина: {message.text}",
+                dedup_key=f"application:{app_id}:rejected"
             )
+            await session.commit()
 
     await message.answer("Заявка отклонена, причина сохранена.", reply_markup=get_main_menu_keyboard("Организатор"))
     await state.clear()
@@ -344,15 +335,24 @@ async def confirm_participation(callback: types.CallbackQuery):
             await session.commit()
 
             text = "💳 Конференция платная.\n\nПоздравляем, вы прошли отбор! Подтвердите своё участие, оплатив оргвзнос по QR-коду ниже и отправив скриншот чека боту."
-            if conf.qr_code_path and os.path.exists(conf.qr_code_path):
-                photo = FSInputFile(conf.qr_code_path)
-                await callback.bot.send_photo(participant.telegram_id, photo, caption=text)
+            photo = await cached_photo(conf.qr_code_path)
+            if photo:
+                sent = await callback.bot.send_photo(participant.telegram_id, photo, caption=text)
+                await remember_photo(conf.qr_code_path, sent)
             else:
                 await callback.bot.send_message(participant.telegram_id, text + "\n\n(QR-код не загружен)")
 
             await callback.bot.send_message(participant.telegram_id, "Отправьте скриншот оплаты:")
         else:
             app.status = "confirmed"
+            organizer_text = (
+                f"Участник {participant_name} подтвердил участие (бесплатная конференция).\n"
+                f"ID заявки {app.id}\n\n"
+                f"Отправьте ему ссылку на чат по комитету командой /verify {app.id} [ссылка]"
+            )
+            await enqueue_notification(
+                session, organizer.telegram_id, organizer_text, dedup_key=f"application:{app.id}:confirmed"
+            )
             await session.commit()
 
             await callback.bot.send_message(
@@ -361,51 +361,51 @@ async def confirm_participation(callback: types.CallbackQuery):
                 reply_markup=get_main_menu_keyboard("Участник")
             )
 
-            organizer_text = (
-                f"Участник {participant_name} подтвердил участие (бесплатная конференция).\n"
-                f"ID заявки {app.id}\n\n"
-                f"Отправьте ему ссылку на чат по комитету командой /verify {app.id} [ссылка]"
-            )
-            await callback.bot.send_message(organizer.telegram_id, organizer_text)
-
     await callback.answer("Участие подтверждено")
 
 # Приём скриншота оплаты
 @router.message(F.photo)
 async def receive_payment_screenshot(message: types.Message):
-    async with AsyncSessionLocal() as session:
-        user_apps = await session.execute(
-            select(Application)
+    async with AsyncSessionLocal(readonly=True) as session:
+        app_id = await session.scalar(
+            select(Application.id)
             .join(User)
             .where(User.telegram_id == message.from_user.id)
             .where(Application.status == "payment_pending")
+            .limit(1)
         )
-        apps = user_apps.scalars().all()
 
-        if not apps:
-            return  # Игнорируем, если не в ожидании оплаты
+    if not app_id:
+        return  # Игнорируем, если не в ожидании оплаты
 
-        app = apps[0]
-        conf = await session.get(Conference, app.conference_id)
-        organizer = await session.get(User, conf.organizer_id)
-        participant = await session.get(User, app.user_id)
+    file_path = await store_photo(message.bot, message.photo[-1], PAYMENTS_DIR)
 
-        participant_name = participant.full_name or f"ID {participant.telegram_id}"
-
-        file_info = await message.bot.get_file(message.photo[-1].file_id)
-        file_path = f"{PAYMENTS_DIR}/payment_{app.id}_{message.message_id}.jpg"
-        await message.bot.download_file(file_info.file_path, file_path)
+    async def save_payment(session):
+        app = await session.get(Application, app_id)
+        if not app or app.status != "payment_pending":
+            return None
 
         app.payment_screenshot = file_path
         app.status = "payment_sent"
-        await session.commit()
 
+        conf = await session.get(Conference, app.conference_id)
+        organizer = await session.get(User, conf.organizer_id)
+        participant = await session.get(User, app.user_id)
+        participant_name = participant.full_name or f"ID {participant.telegram_id}"
         caption = (
             f"Участник {participant_name} прислал скриншот оплаты.\n"
-            f"ID заявки {app.id}\n\n"
-            f"Проверьте и, если всё верно, подтвердите командой /verify {app.id} [ссылка_на_чат]"
+            f"ID заявки {app_id}\n\n"
+            f"Проверьте и, если всё верно, подтвердите командой /verify {app_id} [ссылка_на_чат]"
         )
-        await message.bot.send_photo(organizer.telegram_id, message.photo[-1].file_id, caption=caption)
+        await enqueue_notification(
+            session, organizer.telegram_id, caption,
+            photo=message.photo[-1].file_id, dedup_key=f"application:{app_id}:payment_sent"
+        )
+        return True
+
+    saved = await run_write(save_payment)
+    if not saved:
+        return
 
     await message.answer("Скриншот отправлен организатору. Ожидайте подтверждения.")
 
@@ -435,12 +435,10 @@ async def verify_payment(message: types.Message):
         participant = await session.get(User, app.user_id)
 
         app.status = "link_sent"
-        await session.commit()
-
-        await message.bot.send_message(
-            participant.telegram_id,
-            f"✅ Участие подтверждено!\n\nСсылка на чат комитета:\n{link}"
+        await enqueue_notification(
+            session, participant.telegram_id, f"✅ Участие подтверждено!\n\nСсылка на чат комитета:\n{link}"
         )
+        await session.commit()
 
     await message.answer("Ссылка отправлена участнику.")
 
@@ -454,7 +452,7 @@ async def start_edit(callback: types.CallbackQuery, state: FSMContext):
     conf_id = int(callback.data.split("_")[-1])
     await state.update_data(conf_id=conf_id)
 
-    async with AsyncSessionLocal() as session:
+    async with AsyncSessionLocal(readonly=True) as session:
         conf = await session.get(Conference, conf_id, options=[joinedload(Conference.organizer)])
         if not conf or conf.organizer.telegram_id != callback.from_user.id:
             await callback.answer("Доступ запрещён.", show_alert=True)
@@ -465,7 +463,7 @@ async def start_edit(callback: types.CallbackQuery, state: FSMContext):
             name=conf.name,
             description=conf.description or "",
             city=conf.city or "",
-            date=conf.date,
+            date=conf.date.isoformat() if conf.date else None,
             fee=conf.fee,
             qr_code_path=conf.qr_code_path,
             poster_path=conf.poster_path
@@ -571,9 +569,7 @@ async def edit_qr_photo(message: types.Message, state: FSMContext):
         await state.clear()
         return
 
-    file_info = await message.bot.get_file(message.photo[-1].file_id)
-    qr_path = f"qr_codes/edit_qr_{message.from_user.id}_{message.message_id}.jpg"
-    await message.bot.download_file(file_info.file_path, qr_path)
+    qr_path = await store_photo(message.bot, message.photo[-1], "qr_codes")
     await state.update_data(qr_code_path=qr_path)
     await state.set_state(EditConference.poster)
     await message.answer("7. Постер конференции (отправьте новое фото или напишите 'нет'):", reply_markup=get_cancel_keyboard())
@@ -601,9 +597,7 @@ async def edit_poster_photo(message: types.Message, state: FSMContext):
         await state.clear()
         return
 
-    file_info = await message.bot.get_file(message.photo[-1].file_id)
-    poster_path = f"posters/edit_poster_{message.from_user.id}_{message.message_id}.jpg"
-    await message.bot.download_file(file_info.file_path, poster_path)
+    poster_path = await store_photo(message.bot, message.photo[-1], "posters")
     await state.update_data(poster_path=poster_path)
     await finish_edit_conference(message, state)
 
@@ -694,23 +688,23 @@ async def do_delete(callback: types.CallbackQuery):
 
         notify_text = f"Организатор {callback.from_user.full_name or user_id} удалил конференцию: {conf.name}"
         for admin_id in CHIEF_ADMIN_IDS:
-            try:
-                await callback.bot.send_message(admin_id, notify_text)
-            except:
-                pass
+            await enqueue_notification(session, admin_id, notify_text, dedup_key=f"conf_deleted:{conf_id}:{admin_id}")
 
         await session.execute(delete(Application).where(Application.conference_id == conf_id))
+        await session.execute(delete(ArchivedApplication).where(ArchivedApplication.conference_id == conf_id))
         await session.execute(delete(ConferenceEditRequest).where(ConferenceEditRequest.conference_id == conf_id))
 
         await session.delete(conf)
-        await session.commit()
+        await session.flush()
 
         remaining_confs = await session.scalar(
             select(func.count(Conference.id)).where(Conference.organizer_id == organizer.id)
         )
         if remaining_confs == 0:
             organizer.role = Role.PARTICIPANT.value
-            await session.commit()
+        await session.commit()
+        if remaining_confs == 0:
+            invalidate_user(organizer.telegram_id)
             await callback.bot.send_message(
                 organizer.telegram_id,
                 "У вас больше нет конференций.\n"
@@ -718,10 +712,10 @@ async def do_delete(callback: types.CallbackQuery):
                 "Перезапустите бота командой /main_menu, чтобы увидеть актуальное меню."
             )
 
-    if user_id in last_my_conferences_msg:
+    last_message_id = await my_conferences_messages.pop(user_id)
+    if last_message_id:
         try:
-            await callback.bot.delete_message(callback.message.chat.id, last_my_conferences_msg[user_id])
-            del last_my_conferences_msg[user_id]
+            await callback.bot.delete_message(callback.message.chat.id, last_message_id)
         except:
             pass
 
@@ -743,7 +737,7 @@ async def start_broadcast(callback: types.CallbackQuery, state: FSMContext):
     await state.update_data(conference_id=conf_id)
     await state.set_state(Broadcast.message_text)
 
-    async with AsyncSessionLocal() as session:
+    async with AsyncSessionLocal(readonly=True) as session:
         conf = await session.get(Conference, conf_id, options=[joinedload(Conference.organizer)])
         if not conf or conf.organizer.telegram_id != callback.from_user.id:
             await callback.answer("Доступ запрещён.", show_alert=True)
@@ -766,7 +760,7 @@ async def send_broadcast(message: types.Message, state: FSMContext):
     conf_id = data["conference_id"]
     text = message.text
 
-    async with AsyncSessionLocal() as session:
+    async with AsyncSessionLocal(readonly=True) as session:
         conf = await session.get(Conference, conf_id)
         if not conf:
             await message.answer("Конференция не найдена.")
@@ -774,39 +768,33 @@ async def send_broadcast(message: types.Message, state: FSMContext):
             return
 
         result = await session.execute(
-            select(Application).options(joinedload(Application.user)).where(
+            select(User.telegram_id).join(Application, Application.user_id == User.id).where(
                 Application.conference_id == conf_id,
                 Application.status.in_(["approved", "payment_pending", "payment_sent", "confirmed", "link_sent"])
             )
         )
-        applications = result.scalars().all()
+        chat_ids = result.scalars().all()
 
-        sent_count = 0
-        for app in applications:
-            try:
-                await message.bot.send_message(
-                    app.user.telegram_id,
-                    f"📢 <b>Сообщение от организатора конференции \"{conf.name}\"</b>\n\n{text}"
-                )
-                sent_count += 1
-            except:
-                pass
+    await state.clear()
 
-    await message.answer(
-        f"✅ Рассылка завершена!\nСообщение отправлено {sent_count} участникам.",
-        reply_markup=get_main_menu_keyboard("Организатор")
+    # Отправка идёт в фоне с учётом лимитов Telegram; прогресс — в отдельном сообщении
+    await launch_broadcast(
+        message.bot,
+        conf_id,
+        f"📢 <b>Сообщение от организатора конференции \"{conf.name}\"</b>\n\n{text}",
+        chat_ids,
+        message.chat.id
     )
-    await state.clear()
 
 # Возврат в главное меню
 @router.callback_query(F.data == "back_to_menu")
 async def back_to_menu(callback: types.CallbackQuery):
     user_id = callback.from_user.id
 
-    if user_id in last_my_conferences_msg:
+    last_message_id = await my_conferences_messages.pop(user_id)
+    if last_message_id:
         try:
-            await callback.bot.delete_message(callback.message.chat.id, last_my_conferences_msg[user_id])
-            del last_my_conferences_msg[user_id]
+            await callback.bot.delete_message(callback.message.chat.id, last_message_id)
         except:
             pass
 
@@ -3,19 +3,22 @@ from aiogram.filters import Command
 from aiogram.fsm.context import FSMContext
 from sqlalchemy import select
 from aiogram.utils.keyboard import InlineKeyboardBuilder
-from aiogram.types import InlineKeyboardButton, BufferedInputFile
-import pandas as pd
-import os
+from aiogram.types import InlineKeyboardButton
 
-from database import AsyncSessionLocal, SupportRequest, User, Role
+from database import AsyncSessionLocal, SupportRequest, User, Role, support_requests_export_query
 from keyboards import get_main_menu_keyboard, get_cancel_keyboard
 from states import SupportResponse
+from outbox import enqueue_notification
+from scheduler import scheduler
+from admission import load_monitor
+from instrumentation import handler_totals
+from exports import csv_export, stream_rows
 
 router = Router()
 
 # Проверка роли "Глав Тех Специалист"
 async def is_tech_specialist(user_id: int) -> bool:
-    async with AsyncSessionLocal() as session:
+    async with AsyncSessionLocal(readonly=True) as session:
         result = await session.execute(select(User).where(User.telegram_id == user_id))
         user = result.scalar_one_or_none()
         return user.role == Role.CHIEF_TECH.value if user else False
@@ -27,7 +30,7 @@ async def list_support_requests(message: types.Message):
         await message.answer("Доступ запрещён. Только для Главного Тех Специалиста.")
         return
 
-    async with AsyncSessionLocal() as session:
+    async with AsyncSessionLocal(readonly=True) as session:
         result = await session.execute(select(SupportRequest).order_by(SupportRequest.id))
         requests = result.scalars().all()
 
@@ -69,36 +72,24 @@ async def export_support_csv(callback: types.CallbackQuery):
         await callback.answer("Доступ запрещён.", show_alert=True)
         return
 
-    async with AsyncSessionLocal() as session:
-        result = await session.execute(select(SupportRequest).order_by(SupportRequest.id))
-        requests = result.scalars().all()
-
-        data = []
-        for req in requests:
-            user = await session.get(User, req.user_id)
-            data.append({
-                "ID обращения": req.id,
-                "Telegram ID": user.telegram_id,
-                "ФИО": user.full_name or "—",
-                "Сообщение": req.message,
-                "Статус": req.status,
-                "Ответ": req.response or "—"
-            })
-
-    if not data:
-        await callback.answer("Нет данных для экспорта", show_alert=True)
-        return
-
-    df = pd.DataFrame(data)
-    filename = "support_requests_export.csv"
-    df.to_csv(filename, index=False, encoding="utf-8-sig")
-
-    with open(filename, "rb") as f:
-        file = BufferedInputFile(f.read(), filename=filename)
+    # Закрытые обращения переносятся в архив — в экспорт идут обе таблицы
+    async with AsyncSessionLocal(readonly=True) as session:
+        file, count = await csv_export(
+            "support_requests_export.csv",
+            ("ID обращения", "Telegram ID", "ФИО", "Сообщение", "Статус", "Ответ"),
+            (
+                (req_id, telegram_id, full_name or "—", text, status, response or "—")
+                async for req_id, full_name, telegram_id, text, _, status, response
+                in stream_rows(session, support_requests_export_query())
+            )
+        )
 
-    await callback.message.answer_document(file, caption="📊 Экспорт всех обращений в техподдержку")
+    with file:
+        if not count:
+            await callback.answer("Нет данных для экспорта", show_alert=True)
+            return
+        await callback.message.answer_document(file, caption="📊 Экспорт всех обращений в техподдержку")
     await callback.answer("Файл отправлен!")
-    os.remove(filename)
 
 # Начало ответа на обращение
 @router.callback_query(F.data.startswith("support_answer_"))
@@ -130,22 +121,57 @@ async def send_support_response(message: types.Message, state: FSMContext):
 
         req.status = "resolved"
         req.response = response_text
-        await session.commit()
 
         user = await session.get(User, req.user_id)
-
-        try:
-            await message.bot.send_message(
-                user.telegram_id,
-                f"📩 <b>Ответ от техподдержки</b>\n\n"
-                f"По вашему обращению:\n\"{req.message}\"\n\n"
-                f"Ответ:\n{response_text}"
-            )
-        except:
-            await message.answer("Не удалось отправить ответ (пользователь заблокировал бота).")
+        await enqueue_notification(
+            session,
+            user.telegram_id,
+            f"📩 <b>Ответ от техподдержки</b>\n\n"
+            f"По вашему обращению:\n\"{req.message}\"\n\n"
+            f"Ответ:\n{response_text}",
+            dedup_key=f"support_request:{req_id}:resolved"
+        )
+        await session.commit()
 
     await message.answer(
         f"Ответ на обращение ID {req_id} отправлен.",
         reply_markup=get_main_menu_keyboard("Глав Тех Специалист")
     )
-    await state.clear()
\ No newline at end of file
+    await state.clear()
+
+# Метрики планировщика апдейтов и самые тяжёлые по SQL хендлеры
+@router.message(Command("metrics"))
+async def cmd_metrics(message: types.Message):
+    if not await is_tech_specialist(message.from_user.id):
+        await message.answer("Доступ запрещён. Только для Главного Тех Специалиста.")
+        return
+
+    stats = scheduler.snapshot()
+    text = (
+        "<b>Планировщик апдейтов</b>\n"
+        f"Воркеры: {stats['busy']} из {stats['workers']} заняты, резерв персонала {stats['reserved']}\n"
+        f"Чатов с очередью: {stats['chats']}, самая длинная: {stats['deepest_chat']}\n"
+        f"В обработке: {load_monitor.in_flight}, задержка loop: {load_monitor.lag * 1000:.0f} мс\n"
+        f"Сброшено при перегрузке: {load_monitor.shed}\n"
+    )
+    lane_names = {"staff": "Персонал", "participant": "Участники"}
+    for lane, lane_stats in stats["lanes"].items():
+        text += (
+            f"\n<b>{lane_names[lane]}</b>\n"
+            f"Выполняется: {lane_stats['active']}, в очереди: {lane_stats['pending']} (пик {lane_stats['peak_pending']})\n"
+            f"Обработано: {lane_stats['processed']}\n"
+            f"Ожидание: среднее {lane_stats['avg_wait_ms']:.1f} мс, p95 {lane_stats['p95_wait_ms']:.1f} мс, "
+            f"максимум {lane_stats['max_wait_ms']:.1f} мс\n"
+            f"Обработка: среднее {lane_stats['avg_service_ms']:.1f} мс\n"
+        )
+
+    if handler_totals:
+        text += "\n<b>SQL по хендлерам</b> (апдейты / запросы / мс / N+1)\n"
+        heaviest = sorted(handler_totals.items(), key=lambda item: item[1].total_time, reverse=True)[:10]
+        for name, totals in heaviest:
+            text += (
+                f"<code>{name}</code>: {totals.updates} / {totals.queries} / "
+                f"{totals.total_time * 1000:.0f} / {totals.n_plus_one}\n"
+            )
+
+    await message.answer(text)
\ No newline at end of file
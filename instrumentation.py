@@ -0,0 +1,120 @@
+import logging
+import time
+from collections import Counter
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+
+from aiogram import BaseMiddleware
+from sqlalchemy import event
+
+from config import SQL_N_PLUS_ONE_THRESHOLD, SQL_SLOW_UPDATE_MS
+
+logger = logging.getLogger("sql")
+
+# Статистика SQL одного апдейта
+@dataclass
+class UpdateStats:
+    handler: str = "-"
+    count: int = 0
+    total_time: float = 0.0
+    slowest_time: float = 0.0
+    slowest_statement: str | None = None
+    shapes: Counter = field(default_factory=Counter)
+
+    def record(self, statement: str, elapsed: float):
+        self.count += 1
+        self.total_time += elapsed
+        self.shapes[statement] += 1
+        if elapsed > self.slowest_time:
+            self.slowest_time = elapsed
+            self.slowest_statement = statement
+
+    # Один и тот же запрос (с точностью до параметров) больше K раз за апдейт — похоже на N+1
+    def repeated(self) -> list[tuple[str, int]]:
+        return [(shape, n) for shape, n in self.shapes.most_common() if n > SQL_N_PLUS_ONE_THRESHOLD]
+
+# Накопленные итоги по хендлерам с момента запуска
+@dataclass
+class HandlerTotals:
+    updates: int = 0
+    queries: int = 0
+    total_time: float = 0.0
+    max_queries: int = 0
+    n_plus_one: int = 0
+
+current_update: ContextVar[UpdateStats | None] = ContextVar("current_update", default=None)
+handler_totals: dict[str, HandlerTotals] = {}
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info["query_start"].pop()
+    stats = current_update.get()
+    if stats is not None:
+        stats.record(statement, time.perf_counter() - started)
+
+# Подписка на события курсора; вызывается для писателя и читателей
+def instrument_engine(async_engine):
+    event.listen(async_engine.sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(async_engine.sync_engine, "after_cursor_execute", _after_cursor_execute)
+
+def _short(statement: str | None, limit: int = 200) -> str:
+    statement = " ".join((statement or "").split())
+    return statement if len(statement) <= limit else statement[:limit] + "…"
+
+def _report(stats: UpdateStats):
+    totals = handler_totals.setdefault(stats.handler, HandlerTotals())
+    totals.updates += 1
+    totals.queries += stats.count
+    totals.total_time += stats.total_time
+    totals.max_queries = max(totals.max_queries, stats.count)
+
+    if not stats.count:
+        return
+
+    total_ms = stats.total_time * 1000
+    logger.debug(
+        "%s: %d запросов, %.1f мс, самый медленный %.1f мс: %s",
+        stats.handler, stats.count, total_ms, stats.slowest_time * 1000, _short(stats.slowest_statement)
+    )
+    if total_ms > SQL_SLOW_UPDATE_MS:
+        logger.warning(
+            "%s: медленный апдейт — %d запросов, %.1f мс; самый медленный %.1f мс: %s",
+            stats.handler, stats.count, total_ms, stats.slowest_time * 1000, _short(stats.slowest_statement)
+        )
+
+    repeated = stats.repeated()
+    if repeated:
+        totals.n_plus_one += 1
+        for shape, n in repeated:
+            logger.warning("%s: возможный N+1 — запрос повторён %d раз: %s", stats.handler, n, _short(shape))
+
+# Внешний middleware на update: заводит статистику апдейта и подводит итог
+class UpdateStatsMiddleware(BaseMiddleware):
+    async def __call__(self, handler, event, data):
+        stats = UpdateStats()
+        token = current_update.set(stats)
+        try:
+            return await handler(event, data)
+        finally:
+            current_update.reset(token)
+            _report(stats)
+
+# Внутренний middleware на типы событий: подписывает статистику именем хендлера
+class HandlerNameMiddleware(BaseMiddleware):
+    async def __call__(self, handler, event, data):
+        stats = current_update.get()
+        handler_object = data.get("handler")
+        if stats is not None and handler_object is not None:
+            stats.handler = getattr(handler_object.callback, "__qualname__", repr(handler_object.callback))
+        return await handler(event, data)
+
+def setup_instrumentation(dp, *engines):
+    for async_engine in engines:
+        instrument_engine(async_engine)
+
+    dp.update.outer_middleware(UpdateStatsMiddleware())
+    handler_name = HandlerNameMiddleware()
+    for observer in (dp.message, dp.callback_query, dp.inline_query):
+        observer.middleware(handler_name)
\ No newline at end of file
@@ -41,7 +41,8 @@ def get_main_menu_keyboard(role: str):
             KeyboardButton(text="Назначить роль другим пользователям")
         )
         builder.row(
-            KeyboardButton(text="Экспортировать данные бота")
+            KeyboardButton(text="Экспортировать данные бота"),
+            KeyboardButton(text="Экспорт изменений")
         )
 
     elif role == "Админ":
@@ -69,6 +70,7 @@ def get_main_menu_keyboard(role: str):
             KeyboardButton(text="Приостановка бота"),
             KeyboardButton(text="Экспорт данных бота")
         )
+        builder.row(KeyboardButton(text="Экспорт изменений"))
         builder.row(
             KeyboardButton(text="Обращение к тех. специалисту"),
             KeyboardButton(text="Помощь")
@@ -88,13 +90,32 @@ def get_conferences_keyboard(conferences):
         if conf.city:
             details.append(conf.city)
         if conf.date_start:
-            details.append(conf.date_start)
+            details.append(conf.date_start.isoformat())
         if details:
             text += f" ({', '.join(details)})"
         builder.button(text=text, callback_data=f"select_conf_{conf.id}")
     builder.adjust(1)
     return builder.as_markup()
 
+# Список найденных пользователей для выбора модератором (/ban, /unban, /set_role)
+def get_user_pick_keyboard(users, prefix: str, offset: int, page_size: int, has_next: bool):
+    builder = InlineKeyboardBuilder()
+    for user in users:
+        text = user.full_name or "Без имени"
+        if user.username:
+            text += f" @{user.username}"
+        text += f" ({user.telegram_id})"
+        builder.row(InlineKeyboardButton(text=text, callback_data=f"{prefix}_pick_{user.telegram_id}"))
+
+    nav = []
+    if offset > 0:
+        nav.append(InlineKeyboardButton(text="◀ Назад", callback_data=f"{prefix}_page_{max(offset - page_size, 0)}"))
+    if has_next:
+        nav.append(InlineKeyboardButton(text="Вперёд ▶", callback_data=f"{prefix}_page_{offset + page_size}"))
+    if nav:
+        builder.row(*nav)
+    return builder.as_markup()
+
 # Кнопка отмены для форм
 def get_cancel_keyboard():
     return InlineKeyboardMarkup(inline_keyboard=[
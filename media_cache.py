@@ -0,0 +1,86 @@
+import asyncio
+import hashlib
+import os
+
+from aiogram import types
+from aiogram.types import FSInputFile
+from sqlalchemy import select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from database import AsyncSessionLocal, MediaFile, run_write
+
+# Процессный слой над media_files: path -> (size, mtime_ns, file_id)
+_known: dict[str, tuple[int, int, str]] = {}
+
+def _sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+async def _save(path: str, sha256: str, size: int, mtime_ns: int, file_id: str):
+    async def upsert(session):
+        stmt = sqlite_insert(MediaFile).values(
+            path=path, sha256=sha256, size=size, mtime_ns=mtime_ns, file_id=file_id
+        )
+        await session.execute(stmt.on_conflict_do_update(
+            index_elements=[MediaFile.path],
+            set_={"sha256": sha256, "size": size, "mtime_ns": mtime_ns, "file_id": file_id}
+        ))
+    await run_write(upsert)
+    _known[path] = (size, mtime_ns, file_id)
+
+# Что передать в send_photo: file_id, если файл уже отправлялся (или такой же
+# по содержимому под другим путём), иначе FSInputFile. None — файла нет
+async def cached_photo(path: str | None) -> str | FSInputFile | None:
+    if not path:
+        return None
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+
+    known = _known.get(path)
+    if known and known[:2] == (stat.st_size, stat.st_mtime_ns):
+        return known[2]
+
+    async with AsyncSessionLocal(readonly=True) as session:
+        row = await session.get(MediaFile, path)
+        if row and (row.size, row.mtime_ns) == (stat.st_size, stat.st_mtime_ns):
+            _known[path] = (row.size, row.mtime_ns, row.file_id)
+            return row.file_id
+
+        # Файл новый или изменился — ищем такое же содержимое среди уже отправленных
+        sha256 = await asyncio.to_thread(_sha256, path)
+        twin = await session.scalar(select(MediaFile).where(MediaFile.sha256 == sha256).limit(1))
+
+    if twin:
+        await _save(path, sha256, stat.st_size, stat.st_mtime_ns, twin.file_id)
+        return twin.file_id
+    return FSInputFile(path)
+
+# Запомнить file_id после первой отправки файла или сразу после скачивания
+# (у присланного пользователем фото file_id уже известен)
+async def remember_photo(path: str | None, sent: types.Message | str | bool | None, sha256: str | None = None):
+    if not path or not sent:
+        return
+    if isinstance(sent, types.Message):
+        if not sent.photo:
+            return
+        file_id = sent.photo[-1].file_id
+    elif isinstance(sent, str):
+        file_id = sent
+    else:
+        return
+
+    known = _known.get(path)
+    if known and known[2] == file_id:
+        return
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return
+    if sha256 is None:
+        sha256 = await asyncio.to_thread(_sha256, path)
+    await _save(path, sha256, stat.st_size, stat.st_mtime_ns, file_id)
\ No newline at end of file
@@ -0,0 +1,170 @@
+import asyncio
+import hashlib
+import logging
+import os
+import time
+import uuid
+from collections import Counter
+
+from aiogram import Bot
+from aiogram.types import PhotoSize
+from sqlalchemy import select, delete, func, union_all
+
+from config import MEDIA_GC_GRACE
+from database import (
+    AsyncSessionLocal, Conference, Application, ArchivedApplication, SupportRequest, ArchivedSupportRequest,
+    ConferenceCreationRequest, ConferenceEditRequest, OutboxMessage, FsmState, MediaFile, run_write
+)
+from media_cache import remember_photo
+
+logger = logging.getLogger("media_store")
+
+# Каталоги хранилища; внутри — <ab>/<cd>/<sha256>.jpg
+MEDIA_DIRS = ("qr_codes", "posters", "payments", "support_screenshots")
+
+for _directory in MEDIA_DIRS:
+    os.makedirs(os.path.join(_directory, "tmp"), exist_ok=True)
+
+# Файл-приёмник для bot.download_file: пишет во временный файл и считает sha256 на лету
+class _HashingWriter:
+    def __init__(self, f):
+        self._f = f
+        self.digest = hashlib.sha256()
+        self.size = 0
+
+    def write(self, chunk: bytes):
+        self.digest.update(chunk)
+        self.size += len(chunk)
+        return self._f.write(chunk)
+
+    def flush(self):
+        self._f.flush()
+
+    def seek(self, *args):
+        return self._f.seek(*args)
+
+def blob_path(directory: str, sha256: str) -> str:
+    return f"{directory}/{sha256[:2]}/{sha256[2:4]}/{sha256}.jpg"
+
+def _commit(tmp_path: str, path: str):
+    if os.path.exists(path):
+        # Такое содержимое уже есть: временный файл не нужен, а свежий mtime
+        # продлевает защиту от сборщика, пока путь не попал в БД
+        os.remove(tmp_path)
+        os.utime(path)
+    else:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(tmp_path, path)
+
+# Скачать фото в хранилище; возвращает путь блоба, одинаковые файлы хранятся один раз
+async def store_photo(bot: Bot, photo: PhotoSize, directory: str) -> str:
+    file_info = await bot.get_file(photo.file_id)
+    tmp_path = os.path.join(directory, "tmp", uuid.uuid4().hex)
+    try:
+        with open(tmp_path, "wb") as f:
+            writer = _HashingWriter(f)
+            await bot.download_file(file_info.file_path, writer, seek=False)
+        sha256 = writer.digest.hexdigest()
+        path = blob_path(directory, sha256)
+        await asyncio.to_thread(_commit, tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    await remember_photo(path, photo.file_id, sha256=sha256)
+    return path
+
+def _reference_queries():
+    return [
+        select(Conference.qr_code_path),
+        select(Conference.poster_path),
+        select(Application.payment_screenshot),
+        select(ArchivedApplication.payment_screenshot),
+        select(SupportRequest.screenshot_path),
+        select(ArchivedSupportRequest.screenshot_path),
+        select(func.json_extract(ConferenceCreationRequest.data, "$.qr_code_path")),
+        select(func.json_extract(ConferenceCreationRequest.data, "$.poster_path")),
+        select(func.json_extract(ConferenceEditRequest.data, "$.qr_code_path")),
+        select(func.json_extract(ConferenceEditRequest.data, "$.poster_path")),
+        select(OutboxMessage.photo).where(OutboxMessage.status == "pending"),
+        # Незаконченные формы создания/редактирования конференции
+        select(func.json_extract(FsmState.data, "$.qr_code_path")),
+        select(func.json_extract(FsmState.data, "$.poster_path")),
+    ]
+
+# Счётчики ссылок на файлы из строк БД: path -> число строк
+async def media_references(session) -> Counter:
+    refs = union_all(*_reference_queries()).subquery()
+    path = refs.c[0]
+    rows = await session.execute(select(path, func.count()).where(path.is_not(None)).group_by(path))
+    return Counter(dict(rows.all()))
+
+def _scan(cutoff: float) -> list[str]:
+    # Блобы и старые плоские файлы, которые не трогали дольше grace-периода
+    candidates = []
+    for directory in MEDIA_DIRS:
+        for root, _dirs, files in os.walk(directory):
+            for name in files:
+                path = os.path.join(root, name).replace(os.sep, "/")
+                try:
+                    if os.stat(path).st_mtime < cutoff:
+                        candidates.append(path)
+                except OSError:
+                    pass
+    return candidates
+
+def _remove(paths: list[str], cutoff: float) -> list[str]:
+    removed = []
+    for path in paths:
+        try:
+            # Файл мог быть переиспользован (utime в _commit), пока шла проверка ссылок
+            if os.stat(path).st_mtime >= cutoff:
+                continue
+            os.remove(path)
+        except OSError:
+            continue
+        removed.append(path)
+        # Пустые шард-каталоги тоже убираем
+        parent = os.path.dirname(path)
+        for _ in range(2):
+            if os.path.basename(parent) == "tmp" or parent in MEDIA_DIRS:
+                break
+            try:
+                os.rmdir(parent)
+            except OSError:
+                break
+            parent = os.path.dirname(parent)
+    return removed
+
+# Удалить файлы, на которые не ссылается ни одна строка. Grace-период защищает
+# только что скачанные фото, путь которых пока живёт только в FSM
+async def collect_garbage(grace: float = MEDIA_GC_GRACE) -> int:
+    cutoff = time.time() - grace
+    candidates = await asyncio.to_thread(_scan, cutoff)
+    if not candidates:
+        return 0
+
+    async with AsyncSessionLocal(readonly=True) as session:
+        referenced = await media_references(session)
+    garbage = [path for path in candidates if not referenced[path]]
+    if not garbage:
+        return 0
+
+    garbage = await asyncio.to_thread(_remove, garbage, cutoff)
+
+    async def forget(session):
+        for start in range(0, len(garbage), 500):
+            await session.execute(delete(MediaFile).where(MediaFile.path.in_(garbage[start:start + 500])))
+    await run_write(forget)
+    return len(garbage)
+
+async def run_media_gc(interval: float):
+    while True:
+        try:
+            removed = await collect_garbage()
+            if removed:
+                logger.info("Медиа: удалено неиспользуемых файлов %s", removed)
+        except Exception:
+            logger.exception("Ошибка сборки мусора медиа")
+        await asyncio.sleep(interval)
\ No newline at end of file
@@ -0,0 +1,130 @@
+import asyncio
+import logging
+import time
+
+from aiogram import Bot
+from aiogram.types import InlineKeyboardMarkup
+from sqlalchemy import select, update, delete, event
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from config import (
+    OUTBOX_BATCH_SIZE, OUTBOX_CONCURRENCY, OUTBOX_MAX_ATTEMPTS,
+    OUTBOX_POLL_INTERVAL, OUTBOX_RETENTION_DAYS
+)
+from database import AsyncSessionLocal, OutboxMessage, run_write
+from broadcast import deliver
+
+logger = logging.getLogger("outbox")
+
+# Будит диспетчер сразу после коммита с новыми уведомлениями
+_wake = asyncio.Event()
+_slots = asyncio.Semaphore(OUTBOX_CONCURRENCY)
+
+# Положить уведомление в outbox в текущей транзакции сессии.
+# dedup_key делает постановку идемпотентной: повтор с тем же ключом игнорируется
+async def enqueue_notification(
+    session,
+    chat_id: int,
+    text: str,
+    reply_markup: InlineKeyboardMarkup | None = None,
+    photo: str | None = None,
+    dedup_key: str | None = None,
+):
+    now = time.time()
+    stmt = sqlite_insert(OutboxMessage).values(
+        chat_id=chat_id,
+        text=text,
+        reply_markup=reply_markup.model_dump(exclude_none=True) if reply_markup else None,
+        photo=photo,
+        dedup_key=dedup_key,
+        status="pending",
+        attempts=0,
+        next_attempt_at=now,
+        created_at=now
+    ).on_conflict_do_nothing(index_elements=[OutboxMessage.dedup_key])
+    await session.execute(stmt)
+
+    sync_session = session.sync_session
+    if not sync_session.info.get("outbox_wake"):
+        sync_session.info["outbox_wake"] = True
+        event.listen(sync_session, "after_commit", _on_commit, once=True)
+
+def _on_commit(sync_session):
+    sync_session.info.pop("outbox_wake", None)
+    _wake.set()
+
+def _retry_delay(attempts: int) -> float:
+    return min(60 * 2 ** (attempts - 1), 3600)
+
+async def _send(bot: Bot, message: OutboxMessage) -> str:
+    markup = InlineKeyboardMarkup.model_validate(message.reply_markup) if message.reply_markup else None
+    async with _slots:
+        return await deliver(bot, message.chat_id, message.text, reply_markup=markup, photo=message.photo)
+
+# Одна пачка созревших уведомлений; возвращает их число
+async def dispatch_due(bot: Bot) -> int:
+    async with AsyncSessionLocal(readonly=True) as session:
+        messages = (await session.execute(
+            select(OutboxMessage)
+            .where(OutboxMessage.status == "pending", OutboxMessage.next_attempt_at <= time.time())
+            .order_by(OutboxMessage.next_attempt_at, OutboxMessage.id)
+            .limit(OUTBOX_BATCH_SIZE)
+        )).scalars().all()
+
+    if not messages:
+        return 0
+
+    results = await asyncio.gather(*(_send(bot, message) for message in messages), return_exceptions=True)
+
+    async def save(session):
+        now = time.time()
+        for message, result in zip(messages, results):
+            if isinstance(result, Exception):
+                logger.error("Outbox %s: ошибка отправки", message.id, exc_info=result)
+                result = "failed"
+
+            if result == "delivered":
+                values = {"status": "sent"}
+            elif result == "blocked":
+                values = {"status": "blocked"}
+            elif message.attempts + 1 >= OUTBOX_MAX_ATTEMPTS:
+                values = {"status": "failed", "attempts": message.attempts + 1}
+            else:
+                values = {
+                    "attempts": message.attempts + 1,
+                    "next_attempt_at": now + _retry_delay(message.attempts + 1)
+                }
+            await session.execute(update(OutboxMessage).where(OutboxMessage.id == message.id).values(**values))
+
+    await run_write(save)
+    return len(messages)
+
+async def prune_outbox():
+    cutoff = time.time() - OUTBOX_RETENTION_DAYS * 86400
+
+    async def prune(session):
+        await session.execute(
+            delete(OutboxMessage).where(OutboxMessage.status != "pending", OutboxMessage.created_at < cutoff)
+        )
+    await run_write(prune)
+
+# Фоновый диспетчер: доставка «хотя бы один раз» — строка остаётся pending,
+# пока отправка не подтверждена записью статуса
+async def run_outbox_dispatcher(bot: Bot):
+    last_prune = 0.0
+    while True:
+        _wake.clear()
+        try:
+            processed = await dispatch_due(bot)
+            if time.monotonic() - last_prune > 3600:
+                await prune_outbox()
+                last_prune = time.monotonic()
+        except Exception:
+            logger.exception("Ошибка диспетчера outbox")
+            processed = 0
+
+        if processed < OUTBOX_BATCH_SIZE:
+            try:
+                await asyncio.wait_for(_wake.wait(), OUTBOX_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
\ No newline at end of file
@@ -0,0 +1,156 @@
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+
+from aiogram.fsm.storage.base import BaseEventIsolation, StorageKey
+
+from config import SCHEDULER_WORKERS, SCHEDULER_STAFF_RESERVED
+from database import Role
+from user_cache import peek_role
+
+STAFF = "staff"
+PARTICIPANT = "participant"
+LANES = (STAFF, PARTICIPANT)
+
+STAFF_ROLES = {Role.ORGANIZER.value, Role.CHIEF_TECH.value, Role.ADMIN.value, Role.CHIEF_ADMIN.value}
+
+# Полоса апдейта по роли отправителя (кэш пользователей или SELECT роли).
+# Классификатор работает до всех middleware и ничего не пишет: неизвестный пользователь — участник
+async def classify(key: StorageKey) -> str:
+    return STAFF if await peek_role(key.user_id) in STAFF_ROLES else PARTICIPANT
+
+@dataclass(slots=True)
+class _ChatQueue:
+    lock: asyncio.Lock
+    depth: int = 0  # апдейты чата: ждущие очереди и выполняемый
+
+# Статистика полосы: ожидание слота и время обработки
+@dataclass
+class LaneStats:
+    pending: int = 0
+    active: int = 0
+    peak_pending: int = 0
+    processed: int = 0
+    total_wait: float = 0.0
+    max_wait: float = 0.0
+    total_service: float = 0.0
+    recent_waits: deque = field(default_factory=lambda: deque(maxlen=500))
+
+    def snapshot(self) -> dict:
+        waits = sorted(self.recent_waits)
+        return {
+            "active": self.active,
+            "pending": self.pending,
+            "peak_pending": self.peak_pending,
+            "processed": self.processed,
+            "avg_wait_ms": self.total_wait / self.processed * 1000 if self.processed else 0.0,
+            "p95_wait_ms": waits[min(len(waits) - 1, int(len(waits) * 0.95))] * 1000 if waits else 0.0,
+            "max_wait_ms": self.max_wait * 1000,
+            "avg_service_ms": self.total_service / self.processed * 1000 if self.processed else 0.0,
+        }
+
+# Пул воркеров с резервом для персонала: участники занимают не больше workers - reserved слотов,
+# персонал — любые; освободившийся слот первым получает ждущий апдейт персонала
+class _LanePool:
+    def __init__(self, workers: int, reserved: int):
+        self.workers = workers
+        self.reserved = reserved
+        self.busy = 0
+        self._waiters: dict[str, deque[asyncio.Future]] = {lane: deque() for lane in LANES}
+
+    def _limit(self, lane: str) -> int:
+        return self.workers if lane == STAFF else self.workers - self.reserved
+
+    async def acquire(self, lane: str):
+        if not self._waiters[lane] and self.busy < self._limit(lane):
+            self.busy += 1
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        self._waiters[lane].append(future)
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self.release()
+            else:
+                self._waiters[lane].remove(future)
+            raise
+
+    def release(self):
+        self.busy -= 1
+        for lane in LANES:
+            waiters = self._waiters[lane]
+            while waiters and self.busy < self._limit(lane):
+                future = waiters.popleft()
+                if not future.done():
+                    self.busy += 1
+                    future.set_result(None)
+
+# Планировщик апдейтов, подключается как events_isolation диспетчера: FSM-middleware берёт
+# lock(key) до чтения состояния, поэтому апдейты одного чата идут строго по очереди (asyncio.Lock
+# отдаёт блокировку в порядке ожидания), а разные чаты — параллельно, но не больше workers сразу.
+# Апдейты персонала идут своей полосой с зарезервированными воркерами
+class UpdateScheduler(BaseEventIsolation):
+    def __init__(self, workers: int, staff_reserved: int):
+        self.workers = workers
+        self._pool = _LanePool(workers, staff_reserved)
+        self._chats: dict[StorageKey, _ChatQueue] = {}
+        self.lanes = {lane: LaneStats() for lane in LANES}
+
+    @asynccontextmanager
+    async def lock(self, key: StorageKey):
+        lane = await classify(key)
+        stats = self.lanes[lane]
+
+        chat = self._chats.get(key)
+        if chat is None:
+            chat = self._chats[key] = _ChatQueue(asyncio.Lock())
+        chat.depth += 1
+        stats.pending += 1
+        stats.peak_pending = max(stats.peak_pending, stats.pending)
+        queued_at = time.monotonic()
+        started = False
+        try:
+            async with chat.lock:
+                await self._pool.acquire(lane)
+                try:
+                    started_at = time.monotonic()
+                    waited = started_at - queued_at
+                    stats.pending -= 1
+                    stats.active += 1
+                    started = True
+                    stats.total_wait += waited
+                    stats.max_wait = max(stats.max_wait, waited)
+                    stats.recent_waits.append(waited)
+                    try:
+                        yield
+                    finally:
+                        stats.active -= 1
+                        stats.processed += 1
+                        stats.total_service += time.monotonic() - started_at
+                finally:
+                    self._pool.release()
+        finally:
+            if not started:
+                stats.pending -= 1
+            chat.depth -= 1
+            if not chat.depth:
+                del self._chats[key]
+
+    def snapshot(self) -> dict:
+        return {
+            "workers": self.workers,
+            "reserved": self._pool.reserved,
+            "busy": self._pool.busy,
+            "chats": len(self._chats),
+            "deepest_chat": max((chat.depth for chat in self._chats.values()), default=0),
+            "lanes": {lane: stats.snapshot() for lane, stats in self.lanes.items()},
+        }
+
+    async def close(self) -> None:
+        self._chats.clear()
+
+scheduler = UpdateScheduler(SCHEDULER_WORKERS, SCHEDULER_STAFF_RESERVED)
\ No newline at end of file
@@ -0,0 +1,102 @@
+import json
+import time
+from collections import OrderedDict
+
+from sqlalchemy import delete, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from config import STATE_STORE_BACKEND
+from database import AsyncSessionLocal, StoredState, run_write
+
+# Процессный LRU с TTL на запись
+class MemoryBackend:
+    def __init__(self, namespace: str, maxsize: int):
+        self.maxsize = maxsize
+        self._items: OrderedDict[str, tuple[float, str]] = OrderedDict()
+
+    async def get(self, key: str) -> str | None:
+        item = self._items.get(key)
+        if item is None:
+            return None
+        expires_at, value = item
+        if expires_at < time.time():
+            del self._items[key]
+            return None
+        self._items.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: str, ttl: float):
+        self._items[key] = (time.time() + ttl, value)
+        self._items.move_to_end(key)
+        while len(self._items) > self.maxsize:
+            self._items.popitem(last=False)
+
+    async def delete(self, key: str):
+        self._items.pop(key, None)
+
+# Общий для процессов бэкенд на таблице state_store. Просроченные записи и всё сверх
+# maxsize в своём пространстве имён (по давности записи) вычищаются попутно, не чаще раза в минуту
+class SQLiteBackend:
+    def __init__(self, namespace: str, maxsize: int):
+        self.prefix = f"{namespace}:"
+        self.maxsize = maxsize
+        self._last_prune = 0.0
+
+    async def get(self, key: str) -> str | None:
+        async with AsyncSessionLocal(readonly=True) as session:
+            row = await session.get(StoredState, key)
+        if row is None or row.expires_at < time.time():
+            return None
+        return row.value
+
+    async def set(self, key: str, value: str, ttl: float):
+        now = time.time()
+        prune = now - self._last_prune > 60
+        if prune:
+            self._last_prune = now
+
+        async def save(session):
+            stmt = sqlite_insert(StoredState).values(key=key, value=value, expires_at=now + ttl)
+            await session.execute(stmt.on_conflict_do_update(
+                index_elements=[StoredState.key], set_={"value": value, "expires_at": now + ttl}
+            ))
+            if prune:
+                await session.execute(delete(StoredState).where(StoredState.expires_at < now))
+                overflow = (
+                    select(StoredState.key)
+                    .where(StoredState.key.startswith(self.prefix, autoescape=True))
+                    .order_by(StoredState.expires_at.desc())
+                    .limit(-1).offset(self.maxsize)
+                )
+                await session.execute(delete(StoredState).where(StoredState.key.in_(overflow)))
+        await run_write(save)
+
+    async def delete(self, key: str):
+        async def remove(session):
+            await session.execute(delete(StoredState).where(StoredState.key == key))
+        await run_write(remove)
+
+_BACKENDS = {"memory": MemoryBackend, "sqlite": SQLiteBackend}
+
+# Короткоживущее состояние экранов (пагинация, id последних сообщений) по telegram_id.
+# Значения проходят через JSON: хранить можно только id и курсоры, не объекты ORM
+class StateStore:
+    def __init__(self, namespace: str, ttl: float, maxsize: int, backend: str = STATE_STORE_BACKEND):
+        self.namespace = namespace
+        self.ttl = ttl
+        self._backend = _BACKENDS[backend](namespace, maxsize)
+
+    def _key(self, key) -> str:
+        return f"{self.namespace}:{key}"
+
+    async def get(self, key, default=None):
+        value = await self._backend.get(self._key(key))
+        return default if value is None else json.loads(value)
+
+    async def set(self, key, value):
+        await self._backend.set(self._key(key), json.dumps(value), self.ttl)
+
+    async def pop(self, key, default=None):
+        value = await self.get(key, default)
+        await self._backend.delete(self._key(key))
+        return value
\ No newline at end of file
@@ -16,8 +16,10 @@ class CreateConferenceRequest(StatesGroup):
     city = State()
     date_start = State()
     date_end = State()
+    date = State()                  # Дата проведения (хендлеры спрашивают одну дату)
     fee = State()
     qr_code = State()               # Фото QR-кода или 'нет'
+    poster = State()                # Афиша или 'нет'
 
 # Причина отклонения заявки (Организатор)
 class RejectReason(StatesGroup):
@@ -30,8 +32,10 @@ class EditConference(StatesGroup):
     city = State()
     date_start = State()
     date_end = State()
+    date = State()                  # Дата проведения (хендлеры спрашивают одну дату)
     fee = State()
     qr_code = State()               # Новое фото QR или 'нет'
+    poster = State()                # Новая афиша или 'нет'
 
 # Массовые рассылки участникам конференции (Организатор)
 class Broadcast(StatesGroup):
@@ -0,0 +1,81 @@
+import asyncio
+import datetime as dt
+import itertools
+import os
+import shutil
+import sys
+import tempfile
+
+import pytest
+
+# config.py требует токен и главных админов ещё при импорте
+os.environ.setdefault("BOT_TOKEN", "42:TEST")
+os.environ.setdefault("CHIEF_ADMIN_IDS", "1")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# database.py создаёт движки при импорте, и SQLAlchemy сразу превращает относительный
+# mun_bot.db в абсолютный путь — каталог для базы выбираем до импорта модулей бота
+WORKDIR = tempfile.mkdtemp(prefix="mun_bot_tests_")
+os.chdir(WORKDIR)
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(WORKDIR, ignore_errors=True)
+
+# Каждый тест начинает с пустой базы
+@pytest.fixture
+def db_dir():
+    yield WORKDIR
+    for name in os.listdir(WORKDIR):
+        if name.startswith("mun_bot.db"):
+            os.remove(os.path.join(WORKDIR, name))
+
+# Запуск корутины в отдельном event loop; пулы соединений закрываются в том же loop,
+# иначе следующий тест получит соединения чужого loop и чужого файла базы
+@pytest.fixture
+def run(db_dir):
+    import database
+
+    def run(coro):
+        async def main():
+            try:
+                return await coro
+            finally:
+                await database.engine.dispose()
+                await database.read_engine.dispose()
+        return asyncio.run(main())
+    return run
+
+from aiogram import Bot
+from aiogram.methods import SendDocument, SendMessage
+from aiogram.types import Chat, Document, Message
+
+_message_ids = itertools.count(1)
+
+# Бот без сети: запоминает вызванные методы API; send_message и send_document возвращают
+# сообщение (документ получает file_id), остальное — True
+class RecordingBot(Bot):
+    def __init__(self):
+        super().__init__("42:TEST")
+        self.calls = []
+
+    async def __call__(self, method, request_timeout=None):
+        self.calls.append(method)
+        if isinstance(method, SendMessage):
+            return Message(
+                message_id=next(_message_ids), date=dt.datetime.now(),
+                chat=Chat(id=method.chat_id, type="private"), text=method.text
+            ).as_(self)
+        if isinstance(method, SendDocument):
+            message_id = next(_message_ids)
+            return Message(
+                message_id=message_id, date=dt.datetime.now(), chat=Chat(id=method.chat_id, type="private"),
+                document=Document(file_id=f"document-{message_id}", file_unique_id=f"unique-{message_id}")
+            ).as_(self)
+        return True
+
+    def sent(self, method_type) -> list:
+        return [call for call in self.calls if isinstance(call, method_type)]
+
+@pytest.fixture
+def bot():
+    return RecordingBot()
\ No newline at end of file
@@ -0,0 +1,87 @@
+import datetime as dt
+
+import pytest
+from aiogram.dispatcher.middlewares.user_context import EventContext
+from aiogram.fsm.middleware import FSMContextMiddleware
+from aiogram.fsm.storage.memory import DisabledEventIsolation
+from aiogram.methods import SendMessage
+from aiogram.types import Chat, Message, Update, User
+
+import admission
+import database
+from admission import AdmissionMiddleware, remember_reply
+from fsm_storage import SQLiteStorage
+from user_cache import CachedUser, user_cache
+
+USER_ID = 500
+
+# Монитор, который всегда сообщает о перегрузке
+class OverloadedMonitor:
+    in_flight = 0
+    shed = 0
+
+    def overloaded(self) -> bool:
+        return True
+
+# Ответы, запомненные при импорте хендлеров (справка), не должны влиять на тесты
+@pytest.fixture
+def middleware(monkeypatch):
+    monkeypatch.setattr(admission, "_replies", {})
+    storage = SQLiteStorage(maxsize=100, ttl=3600)
+    yield AdmissionMiddleware(OverloadedMonitor(), FSMContextMiddleware(storage, DisabledEventIsolation()))
+    user_cache.clear()
+
+def _cache_user(is_banned: bool = False):
+    user_cache.put(CachedUser(id=1, telegram_id=USER_ID, role="Участник", is_banned=is_banned))
+
+async def _feed(middleware: AdmissionMiddleware, bot, text: str) -> list[Update]:
+    user = User(id=USER_ID, is_bot=False, first_name="Участник")
+    chat = Chat(id=USER_ID, type="private")
+    message = Message(message_id=1, date=dt.datetime.now(), chat=chat, from_user=user, text=text).as_(bot)
+    handled = []
+
+    async def handler(event, data):
+        handled.append(event)
+
+    data = {"bot": bot, "event_from_user": user, "event_context": EventContext(chat=chat, user=user)}
+    await middleware(handler, Update(update_id=1, message=message), data)
+    return handled
+
+# Пользователь недавно писал боту: он в кэше пользователей, его FSM — в кэше хранилища
+def test_overload_sheds_optional_update(run, middleware, bot):
+    _cache_user()
+    remember_reply("help", "Справка")
+
+    async def scenario():
+        await database.init_db()
+        await middleware.fsm.resolve_context(bot, chat_id=USER_ID, user_id=USER_ID).get_state()
+        return await _feed(middleware, bot, "Помощь")
+
+    handled = run(scenario())
+    assert handled == []
+    assert [call.text for call in bot.sent(SendMessage)] == ["Справка"]
+    assert middleware.monitor.shed == 1
+
+# Текст «Помощь» в середине формы — ответ на её вопрос, а не кнопка меню
+def test_user_in_form_is_not_shed(run, middleware, bot):
+    _cache_user()
+
+    async def scenario():
+        await database.init_db()
+        context = middleware.fsm.resolve_context(bot, chat_id=USER_ID, user_id=USER_ID)
+        await context.set_state("SupportStates:waiting_message")
+        return await _feed(middleware, bot, "Помощь")
+
+    assert len(run(scenario())) == 1
+    assert bot.sent(SendMessage) == []
+
+# Забаненный не получает закэшированных ответов — апдейт идёт дальше, к ban_middleware
+def test_banned_user_is_not_shed(run, middleware, bot):
+    _cache_user(is_banned=True)
+    assert len(run(_feed(middleware, bot, "Помощь"))) == 1
+    assert bot.sent(SendMessage) == []
+
+# Пользователя нет в кэшах: ни бан, ни форму не проверить без БД — обычный путь
+def test_uncached_user_is_not_shed(run, middleware, bot):
+    assert len(run(_feed(middleware, bot, "Помощь"))) == 1
+    assert bot.sent(SendMessage) == []
\ No newline at end of file
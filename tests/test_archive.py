@@ -0,0 +1,52 @@
+import asyncio
+import logging
+
+from sqlalchemy import select
+
+import database
+from database import ArchivedSupportRequest, SupportRequest
+
+async def _archive_support(statuses):
+    await database.init_db()
+    user = await database.get_or_create_user(100, "Участник", None)
+
+    async def add(session):
+        session.add_all(SupportRequest(user_id=user.id, message=status, status=status) for status in statuses)
+    await database.run_write(add)
+
+    moved = await database.archive_finished()
+    async with database.AsyncSessionLocal(readonly=True) as session:
+        hot = (await session.execute(select(SupportRequest.status))).scalars().all()
+        cold = (await session.execute(select(ArchivedSupportRequest.status))).scalars().all()
+    return moved, sorted(hot), sorted(cold)
+
+# Отвеченные через /reply_support обращения ("answered") уходят в архив вместе с закрытыми
+def test_answered_and_resolved_support_requests_are_archived(run):
+    moved, hot, cold = run(_archive_support(["pending", "answered", "resolved"]))
+    assert moved == (0, 2)
+    assert hot == ["pending"]
+    assert cold == ["answered", "resolved"]
+
+async def _background_cycle():
+    import bot
+
+    async def broken():
+        raise RuntimeError("boom")
+
+    failed = bot.start_background_task(broken())
+    looping = bot.start_background_task(asyncio.sleep(3600))
+    # Колбэки завершения выполняются на следующей итерации loop
+    for _ in range(2):
+        await asyncio.sleep(0)
+    assert bot.background_tasks == {looping}
+    await bot.stop_background_tasks()
+    return failed, looping, set(bot.background_tasks)
+
+# Фоновые циклы бота держатся по ссылке, падения логируются, на остановке задачи отменяются
+def test_background_tasks_are_logged_and_cancelled(run, caplog):
+    with caplog.at_level(logging.ERROR, logger="bot"):
+        failed, looping, left = run(_background_cycle())
+    assert isinstance(failed.exception(), RuntimeError)
+    assert looping.cancelled()
+    assert left == set()
+    assert "broken" in caplog.text
\ No newline at end of file
@@ -0,0 +1,72 @@
+import asyncio
+import datetime as dt
+
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.storage.base import StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+from aiogram.methods import EditMessageText, SendMessage
+from aiogram.types import CallbackQuery, Chat, Message, User as TelegramUser
+
+import broadcast
+import database
+from database import Application, Conference, Role, User
+from handlers import organizer
+from states import Broadcast
+
+ORGANIZER_ID = 10
+
+async def _setup() -> int:
+    await database.init_db()
+    await database.get_or_create_user(ORGANIZER_ID, "Организатор", None)
+    for telegram_id in (101, 102, 103):
+        await database.get_or_create_user(telegram_id, f"Участник {telegram_id}", None)
+
+    async def create(session):
+        users = {
+            user.telegram_id: user.id
+            for user in (await session.execute(database.select(User))).scalars()
+        }
+        await session.execute(
+            database.sa.update(User).where(User.telegram_id == ORGANIZER_ID).values(role=Role.ORGANIZER.value)
+        )
+        conf = Conference(name="MUN <2026>", organizer_id=users[ORGANIZER_ID], date_start=dt.date.today())
+        session.add(conf)
+        await session.flush()
+        # Ожидающая заявка рассылку не получает
+        for telegram_id, status in ((101, "approved"), (102, "confirmed"), (103, "pending")):
+            session.add(Application(user_id=users[telegram_id], conference_id=conf.id, status=status))
+        return conf.id
+    return await database.run_write(create)
+
+async def _walk(bot) -> FSMContext:
+    conf_id = await _setup()
+    state = FSMContext(MemoryStorage(), StorageKey(bot.id, ORGANIZER_ID, ORGANIZER_ID))
+    organizer_user = TelegramUser(id=ORGANIZER_ID, is_bot=False, first_name="Орг")
+    chat = Chat(id=ORGANIZER_ID, type="private")
+
+    menu = Message(message_id=1, date=dt.datetime.now(), chat=chat, text="Мои конференции").as_(bot)
+    callback = CallbackQuery(
+        id="1", from_user=organizer_user, chat_instance="1", data=f"broadcast_{conf_id}", message=menu
+    ).as_(bot)
+    await organizer.start_broadcast(callback, state)
+    assert await state.get_state() == Broadcast.message_text.state
+
+    message = Message(
+        message_id=2, date=dt.datetime.now(), chat=chat, from_user=organizer_user, text="Регистрация открыта"
+    ).as_(bot)
+    await organizer.send_broadcast(message, state)
+    await asyncio.gather(*broadcast.running_jobs.values())
+    return state
+
+# Кнопка «Рассылка» -> текст -> фоновое задание доставляет участникам с одобренными заявками
+def test_broadcast_flow_delivers_to_approved_participants(run, bot):
+    state = run(_walk(bot))
+
+    assert run(state.get_state()) is None
+    delivered = {call.chat_id: call.text for call in bot.sent(SendMessage) if call.chat_id != ORGANIZER_ID}
+    assert set(delivered) == {101, 102}
+    assert all("Регистрация открыта" in text for text in delivered.values())
+
+    report = bot.sent(EditMessageText)[-1]
+    assert report.chat_id == ORGANIZER_ID
+    assert "Рассылка завершена" in report.text and "Доставлено: 2" in report.text
\ No newline at end of file
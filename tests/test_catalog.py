@@ -0,0 +1,105 @@
+import datetime as dt
+
+from aiogram.methods import EditMessageText, SendMessage, SendPhoto
+from aiogram.types import CallbackQuery, Chat, Message, User as TelegramUser
+
+import database
+from database import Conference
+from handlers import common
+
+USER_ID = 200
+
+async def _add_conferences(*specs) -> list[int]:
+    await database.init_db()
+    organizer = await database.get_or_create_user(10, "Организатор", None)
+
+    async def create(session):
+        conferences = [Conference(organizer_id=organizer.id, **spec) for spec in specs]
+        session.add_all(conferences)
+        await session.flush()
+        return [conf.id for conf in conferences]
+    return await database.run_write(create)
+
+def _upcoming(count: int, **spec) -> list[dict]:
+    today = dt.date.today()
+    # Две конференции в один день: порядок внутри дня задаёт id
+    return [
+        {"name": f"MUN {number}", "date_start": today + dt.timedelta(days=1 + number // 2), **spec}
+        for number in range(count)
+    ]
+
+# Проход вперёд по next_anchor и обратно по prev_anchor даёт те же страницы
+def test_catalog_keyset_pagination(run):
+    async def scenario():
+        ids = await _add_conferences(*_upcoming(5))
+        pages, anchor = [], None
+        while True:
+            conferences, prev_anchor, next_anchor = await database.conference_catalog_page(anchor, 2)
+            pages.append(([conf.id for conf in conferences], (conferences[0].date_start, conferences[0].id), prev_anchor))
+            if next_anchor is None:
+                break
+            anchor = next_anchor
+        return ids, pages
+
+    ids, pages = run(scenario())
+    assert [page_ids for page_ids, _, _ in pages] == [ids[0:2], ids[2:4], ids[4:5]]
+    # «Назад» ведёт на первую карточку предыдущей страницы
+    assert [prev_anchor for _, _, prev_anchor in pages] == [None] + [first for _, first, _ in pages[:-1]]
+
+def _callback(bot, data: str, photo: bool = False) -> CallbackQuery:
+    chat = Chat(id=USER_ID, type="private")
+    message = Message(message_id=1, date=dt.datetime.now(), chat=chat, text="📚 Конференции").as_(bot)
+    user = TelegramUser(id=USER_ID, is_bot=False, first_name="Участник")
+    return CallbackQuery(id="1", from_user=user, chat_instance="1", message=message, data=data).as_(bot)
+
+# Кнопка карточки кодирует якорь страницы и номер, обработчик разбирает их обратно
+def test_catalog_callback_round_trip(run, bot, monkeypatch):
+    monkeypatch.setattr(common, "CATALOG_PAGE_SIZE", 2)
+
+    async def scenario():
+        ids = await _add_conferences(*_upcoming(4, city="<Казань>"))
+        _, _, next_anchor = await database.conference_catalog_page(None, 2)
+        await common.catalog_page(_callback(bot, common.catalog_callback(next_anchor, 1)))
+        return ids
+
+    ids = run(scenario())
+    first_page = (dt.date.today() + dt.timedelta(days=1), ids[0])
+    [edit] = bot.sent(EditMessageText)
+    assert "<b>2. MUN 3 — &lt;Казань&gt;" in edit.text
+    assert "\n1. MUN 2 — &lt;Казань&gt;" in edit.text
+    buttons = {button.text: button.callback_data for row in edit.reply_markup.inline_keyboard for button in row}
+    assert buttons["Подать заявку: MUN 3"] == f"select_conf_{ids[3]}"
+    assert buttons["1"] == common.catalog_callback((dt.date.today() + dt.timedelta(days=2), ids[2]), 0)
+    assert buttons["◀ Назад"] == common.catalog_callback(first_page)
+    assert "Вперёд ▶" not in buttons
+
+def test_catalog_escapes_fields(run, bot):
+    async def scenario():
+        await _add_conferences({
+            "name": "<MUN & Co>", "city": "<b>Москва</b>", "description": "Приходите & <берите> друзей",
+            "date_start": dt.date.today() + dt.timedelta(days=3)
+        })
+        await common.show_catalog(_callback(bot, "catalog").message, None, 0)
+
+    run(scenario())
+    [message] = bot.sent(SendMessage)
+    assert "&lt;MUN &amp; Co&gt;" in message.text
+    assert "&lt;b&gt;Москва&lt;/b&gt;" in message.text
+    assert "<i>Приходите &amp; &lt;берите&gt; друзей</i>" in message.text
+
+# Длинная карточка не помещается в подпись к фото даже без описания — уходит текстом
+def test_catalog_card_too_long_for_caption_is_sent_as_text(run, bot, monkeypatch):
+    monkeypatch.setattr(common, "CATALOG_PAGE_SIZE", 5)
+
+    async def poster(path):
+        return "poster-file-id"
+    monkeypatch.setattr(common, "cached_photo", poster)
+
+    async def scenario():
+        await _add_conferences(*_upcoming(5, name="M" * 200, description="Описание", poster_path="poster.jpg"))
+        await common.show_catalog(_callback(bot, "catalog").message, None, 0)
+
+    run(scenario())
+    assert bot.sent(SendPhoto) == []
+    [message] = bot.sent(SendMessage)
+    assert "<i>Описание</i>" in message.text
\ No newline at end of file
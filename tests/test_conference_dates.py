@@ -0,0 +1,70 @@
+import datetime as dt
+
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.storage.base import StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+from aiogram.methods import AnswerCallbackQuery
+from aiogram.types import CallbackQuery, Chat, Message, User as TelegramUser
+
+import database
+from database import Conference
+from handlers import common
+
+async def _add(**dates_by_name) -> dict[str, int]:
+    await database.init_db()
+    organizer = await database.get_or_create_user(10, "Организатор", None)
+
+    async def create(session):
+        conferences = {
+            name: Conference(name=name, organizer_id=organizer.id, date_start=date_start, is_active=name != "inactive")
+            for name, date_start in dates_by_name.items()
+        }
+        session.add_all(conferences.values())
+        await session.flush()
+        return {name: conf.id for name, conf in conferences.items()}
+    return await database.run_write(create)
+
+# В каталог попадают только активные конференции с датой не раньше сегодняшней, по возрастанию даты
+def test_catalog_lists_only_upcoming(run):
+    today = dt.date.today()
+
+    async def scenario():
+        await _add(
+            later=today + dt.timedelta(days=30), past=today - dt.timedelta(days=1), today=today,
+            inactive=today + dt.timedelta(days=2), undated=None
+        )
+        conferences, _, _ = await database.conference_catalog_page(None, 10)
+        return [conf.name for conf in conferences]
+
+    assert run(scenario()) == ["today", "later"]
+
+def test_past_conference_cannot_be_selected(run, bot):
+    async def scenario():
+        ids = await _add(past=dt.date.today() - dt.timedelta(days=1))
+        user = TelegramUser(id=300, is_bot=False, first_name="Участник")
+        message = Message(message_id=1, date=dt.datetime.now(), chat=Chat(id=300, type="private"), text="Каталог").as_(bot)
+        callback = CallbackQuery(
+            id="1", from_user=user, chat_instance="1", message=message, data=f"select_conf_{ids['past']}"
+        ).as_(bot)
+        state = FSMContext(MemoryStorage(), StorageKey(bot.id, 300, 300))
+        await common.select_conference(callback, state)
+        return await state.get_state()
+
+    assert run(scenario()) is None
+    [answer] = bot.sent(AnswerCallbackQuery)
+    assert "уже прошла" in answer.text
+
+# Старые строки с датами вида ДД.ММ.ГГГГ переводятся в ISO, мусор — в NULL
+def test_migration_normalizes_legacy_dates(run):
+    async def scenario():
+        await database.init_db()
+        await database.get_or_create_user(10, "Организатор", None)
+        async with database.engine.begin() as conn:
+            await conn.exec_driver_sql(
+                "INSERT INTO conferences (name, organizer_id, date_start, date_end, is_active, fee) "
+                "VALUES ('legacy', 1, '25.12.2030', 'когда-нибудь', 1, 0)"
+            )
+            await conn.run_sync(database._migrate_conference_dates)
+            return (await conn.exec_driver_sql("SELECT date_start, date_end FROM conferences")).one()
+
+    assert tuple(run(scenario())) == ("2030-12-25", None)
\ No newline at end of file
@@ -0,0 +1,45 @@
+import asyncio
+
+import pytest
+from sqlalchemy import func, select
+
+import database
+from database import User
+
+# Пока писатель держит открытую транзакцию (BEGIN IMMEDIATE), читатели работают параллельно
+# и видят последний закоммиченный снимок WAL
+def test_readers_run_while_writer_holds_transaction(run):
+    async def read_count() -> int:
+        async with database.AsyncSessionLocal(readonly=True) as session:
+            return await session.scalar(select(func.count()).select_from(User))
+
+    async def scenario():
+        await database.init_db()
+        async with database.AsyncSessionLocal() as writer:
+            writer.add(User(telegram_id=500, full_name="Участник"))
+            await writer.flush()
+            counts = await asyncio.wait_for(
+                asyncio.gather(*(read_count() for _ in range(database.read_engine.pool.size()))), timeout=5
+            )
+            await writer.commit()
+        return counts, await read_count()
+
+    counts, after = run(scenario())
+    seeded = after - 1
+    assert counts == [seeded] * len(counts)
+
+# Вложенная сессия на запись в той же задаче падает сразу, а не ждёт соединение до DB_WRITE_TIMEOUT
+def test_nested_write_session_fails_fast(run):
+    async def scenario():
+        await database.init_db()
+        async with database.AsyncSessionLocal() as outer:
+            await outer.execute(select(User.id).limit(1))
+            with pytest.raises(RuntimeError, match="Вложенная сессия на запись"):
+                async with asyncio.timeout(5):
+                    async with database.AsyncSessionLocal():
+                        pass
+        # После выхода из внешней сессии запись снова доступна
+        async with database.AsyncSessionLocal() as session:
+            return await session.scalar(select(func.count()).select_from(User))
+
+    assert run(scenario()) >= 1
\ No newline at end of file
@@ -0,0 +1,118 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.methods import EditMessageText, SendDocument
+from sqlalchemy import func, select
+
+import database
+import export_jobs
+from conftest import RecordingBot
+from database import SupportRequest, User
+
+async def _seed():
+    await database.init_db()
+    user = await database.get_or_create_user(100, "Участник", "member")
+
+    async def add(session):
+        session.add(SupportRequest(user_id=user.id, message="Не приходит код"))
+    await database.run_write(add)
+
+# Сборка идёт в этом же процессе: воркер пула — поток вместо spawn-процесса
+@pytest.fixture
+def exports(monkeypatch):
+    export_jobs._init_worker(None)
+    executor = ThreadPoolExecutor(1)
+    monkeypatch.setattr(export_jobs, "_get_pool", lambda: executor)
+    monkeypatch.setattr(export_jobs, "_jobs", {})
+    monkeypatch.setattr(export_jobs, "_by_id", {})
+    monkeypatch.setattr(export_jobs, "EXPORT_PROGRESS_INTERVAL", 0.01)
+    yield export_jobs
+    executor.shutdown()
+
+def test_build_export_writes_files_and_watermark(run, exports, tmp_path):
+    async def scenario():
+        await _seed()
+        async with database.AsyncSessionLocal(readonly=True) as session:
+            newest = await session.scalar(select(func.max(User.updated_at)))
+        full = await asyncio.to_thread(exports.build_export, 1, "bot_data_tech", (), str(tmp_path))
+        changes = await asyncio.to_thread(exports.build_export, 2, "bot_data_tech_changes", (full[1],), str(tmp_path))
+        return newest, full, changes
+
+    newest, (files, watermark), changes = run(scenario())
+    assert [name for name, _ in files] == [
+        "tech_export_users_with_bans.xlsx", "tech_active_conferences.xlsx", "tech_deleted_conferences.xlsx"
+    ]
+    assert all(os.path.getsize(tmp_path / name) for name, _ in files)
+    assert watermark == newest
+    # С отметкой полной выгрузки изменений нет, а отметка не откатывается
+    assert changes == ([], watermark)
+
+# Одинаковые запросы подключаются к одному заданию: сборка одна, второй чат получает файл по file_id
+def test_submit_export_deduplicates_jobs(run, exports, bot, monkeypatch):
+    builds = []
+    build_export = exports.build_export
+
+    def counting_build(*args):
+        builds.append(args[1])
+        return build_export(*args)
+    monkeypatch.setattr(exports, "build_export", counting_build)
+
+    async def scenario():
+        await _seed()
+        first = await exports.submit_export(bot, 10, "support_requests")
+        second = await exports.submit_export(bot, 20, "support_requests")
+        await asyncio.gather(*exports._tasks)
+        third = await exports.submit_export(bot, 30, "support_requests")
+        await exports.close_exports()
+        return first, second, third
+
+    first, second, third = run(scenario())
+    assert first == second == third
+    assert builds == ["support_requests"]
+    documents = bot.sent(SendDocument)
+    assert [document.chat_id for document in documents] == [10, 20, 30]
+    assert isinstance(documents[0].document, export_jobs.FSInputFile)
+    assert all(document.document.startswith("document-") for document in documents[1:])
+    assert not exports._tasks
+
+class FailingDocumentBot(RecordingBot):
+    async def __call__(self, method, request_timeout=None):
+        if isinstance(method, SendDocument):
+            self.calls.append(method)
+            raise TelegramBadRequest(method, "file is too big")
+        return await super().__call__(method, request_timeout)
+
+async def _export(exports, bot, kind: str, params: tuple = ()):
+    await exports.submit_export(bot, 10, kind, params)
+    await asyncio.gather(*exports._tasks)
+    return await database.get_export_watermark(10, "bot_data_tech")
+
+# Доставленная полная выгрузка ставит отметку, выгрузка изменений после неё пуста
+def test_delivered_export_advances_watermark(run, exports, bot):
+    async def scenario():
+        await _seed()
+        async with database.AsyncSessionLocal(readonly=True) as session:
+            newest = await session.scalar(select(func.max(User.updated_at)))
+        watermark = await _export(exports, bot, "bot_data_tech")
+        bot.calls.clear()
+        unchanged = await _export(exports, bot, "bot_data_tech_changes", (watermark,))
+        return newest, watermark, unchanged
+
+    newest, watermark, unchanged = run(scenario())
+    assert watermark == unchanged == newest
+    assert bot.sent(SendDocument) == []
+    assert [edit.text for edit in bot.sent(EditMessageText)][-1] == export_jobs.NO_CHANGES_TEXT
+
+# Файл не дошёл — отметка стоит на месте, иначе изменения пропали бы из следующей выгрузки
+def test_failed_delivery_keeps_watermark(run, exports):
+    bot = FailingDocumentBot()
+
+    async def scenario():
+        await _seed()
+        return await _export(exports, bot, "bot_data_tech")
+
+    assert run(scenario()) is None
+    assert len(bot.sent(SendDocument)) == 3
\ No newline at end of file
@@ -0,0 +1,75 @@
+import csv
+import io
+
+from openpyxl import load_workbook
+from sqlalchemy import select
+
+import database
+import exports
+from database import User
+from exports import XlsxExport, csv_export, stream_rows
+
+HEADERS = ("Telegram ID", "ФИО", "Причина бана")
+
+async def _rows(count: int):
+    for number in range(count):
+        yield number, f"Участник №{number}", 'спам, "реклама"'
+
+async def _read(file) -> bytes:
+    return b"".join([chunk async for chunk in file.read(None)])
+
+# Excel открывает кириллицу только с BOM; запятые и кавычки экранирует csv.writer
+def test_csv_export_is_utf8_sig_with_row_count(run):
+    async def scenario():
+        file, count = await csv_export("banned.csv", HEADERS, _rows(3))
+        with file:
+            return file.filename, count, await _read(file)
+
+    filename, count, data = run(scenario())
+    assert (filename, count) == ("banned.csv", 3)
+    assert data.startswith(b"\xef\xbb\xbf")
+    rows = list(csv.reader(io.StringIO(data.decode("utf-8-sig"), newline="")))
+    assert rows[0] == list(HEADERS)
+    assert rows[1:] == [[str(number), f"Участник №{number}", 'спам, "реклама"'] for number in range(3)]
+
+# Выгрузка больше EXPORT_SPOOL_SIZE уходит на диск и читается кусками целиком
+def test_large_csv_spills_to_disk(run, monkeypatch):
+    monkeypatch.setattr(exports, "EXPORT_SPOOL_SIZE", 1024)
+
+    async def scenario():
+        file, count = await csv_export("big.csv", HEADERS, _rows(500))
+        with file:
+            return count, file.spool._rolled, await _read(file)
+
+    count, rolled, data = run(scenario())
+    assert count == 500 and rolled
+    assert len(data.decode("utf-8-sig").splitlines()) == 501
+
+def test_stream_rows_feeds_csv_from_cursor(run, monkeypatch):
+    monkeypatch.setattr(exports, "EXPORT_BATCH_SIZE", 2)
+
+    async def scenario():
+        await database.init_db()
+        for telegram_id in range(700, 705):
+            await database.get_or_create_user(telegram_id, f"Участник {telegram_id}")
+        async with database.AsyncSessionLocal(readonly=True) as session:
+            stmt = select(User.telegram_id, User.full_name).where(User.telegram_id.between(700, 704)).order_by(User.id)
+            file, count = await csv_export("users.csv", ("ID", "ФИО"), stream_rows(session, stmt))
+        with file:
+            return count, await _read(file)
+
+    count, data = run(scenario())
+    assert count == 5
+    assert data.decode("utf-8-sig").splitlines()[-1] == "704,Участник 704"
+
+def test_xlsx_sheet_counts_rows(tmp_path):
+    export = XlsxExport()
+    title = "Пользователи с очень длинным названием листа"
+    count = export.add_sheet(title, HEADERS, [(1, "Иван", None)] * 4)
+    export.save(tmp_path / "users.xlsx")
+
+    sheet = load_workbook(tmp_path / "users.xlsx", read_only=True).worksheets[0]
+    assert count == 4
+    # Excel ограничивает имя листа 31 символом
+    assert sheet.title == title[:31]
+    assert [row for row in sheet.iter_rows(values_only=True)][0] == HEADERS
\ No newline at end of file
@@ -0,0 +1,48 @@
+import database
+from database import User
+from keyboards import get_user_pick_keyboard
+
+PEOPLE = [
+    (501, "Иван Петров", "ivan_p"),
+    (502, "Петров Иван Сергеевич", "petrov"),
+    (503, "Пётр Иванов", "ivanov"),
+    (504, "Анна Смирнова", None),
+]
+
+async def _find(*queries, limit: int = 10, offset: int = 0):
+    await database.init_db()
+    for telegram_id, full_name, username in PEOPLE:
+        await database.get_or_create_user(telegram_id, full_name, username)
+    results = []
+    for query in queries:
+        users, has_next = await database.find_users(query, limit, offset)
+        results.append(([user.telegram_id for user in users], has_next))
+    return results
+
+# ID и точный @username (без учёта регистра) однозначны и идут раньше поиска по ФИО
+def test_exact_id_and_username_win(run):
+    assert run(_find("503", "@IVAN_P", "ivanov")) == [([503], False), ([501], False), ([503], False)]
+
+# По ФИО — подстрока каждого слова, ближе к началу выдачи короткое точное совпадение
+def test_full_name_search_is_ranked(run):
+    [(petrov, _), (both, _)] = run(_find("Петров", "иван петр"))
+    assert petrov == [501, 502]
+    assert set(both) == {501, 502}
+
+# Короче трёх символов триграммы не работают — ищем по префиксу username
+def test_short_query_matches_username_prefix(run):
+    assert run(_find("iv")) == [([501, 503], False)]
+
+def test_pages_and_pick_keyboard(run):
+    [(first, has_next)] = run(_find("iv", limit=1))
+    assert (first, has_next) == ([501], True)
+
+    [(second, has_more)] = run(_find("iv", limit=1, offset=1))
+    users = [User(telegram_id=503, full_name="Пётр Иванов", username="ivanov")]
+    markup = get_user_pick_keyboard(users, "ban", offset=1, page_size=1, has_next=has_more)
+    rows = [[(button.text, button.callback_data) for button in row] for row in markup.inline_keyboard]
+    assert second == [503]
+    assert rows == [
+        [("Пётр Иванов @ivanov (503)", "ban_pick_503")],
+        [("◀ Назад", "ban_page_0")],
+    ]
\ No newline at end of file
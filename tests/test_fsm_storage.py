@@ -0,0 +1,78 @@
+from aiogram.fsm.storage.base import StorageKey
+from sqlalchemy import select
+
+import database
+import fsm_storage
+from database import FsmState
+from fsm_storage import SQLiteStorage
+from states import ParticipantRegistration
+
+def _key(user_id: int) -> StorageKey:
+    return StorageKey(bot_id=42, chat_id=user_id, user_id=user_id)
+
+async def _stored_keys() -> list[str]:
+    async with database.AsyncSessionLocal(readonly=True) as session:
+        return sorted((await session.execute(select(FsmState.key))).scalars().all())
+
+# Шаг формы: состояние и данные уходят в БД при flush и читаются новым экземпляром (перезапуск)
+def test_state_and_data_survive_restart(run):
+    async def scenario():
+        await database.init_db()
+        storage = SQLiteStorage(maxsize=10, ttl=3600)
+        await storage.set_state(_key(1), ParticipantRegistration.age)
+        await storage.update_data(_key(1), {"full_name": "Иван"})
+        await storage.update_data(_key(1), {"conference_id": 7})
+        before_flush = await _stored_keys()
+        await storage.close()
+
+        restarted = SQLiteStorage(maxsize=10, ttl=3600)
+        return before_flush, await restarted.get_state(_key(1)), await restarted.get_data(_key(1))
+
+    before_flush, state, data = run(scenario())
+    assert before_flush == []
+    assert state == ParticipantRegistration.age.state
+    assert data == {"full_name": "Иван", "conference_id": 7}
+
+# Брошенная форма старше ttl читается пустой и удаляется из БД при очистке
+def test_abandoned_form_expires(run, monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr(fsm_storage.time, "time", lambda: now[0])
+
+    async def scenario():
+        await database.init_db()
+        storage = SQLiteStorage(maxsize=10, ttl=60)
+        await storage.set_state(_key(1), ParticipantRegistration.email)
+        await storage.set_data(_key(1), {"age": 17})
+        await storage.set_state(_key(2), ParticipantRegistration.email)
+        await storage.flush()
+
+        now[0] += 120
+        restarted = SQLiteStorage(maxsize=10, ttl=60)
+        expired = (await restarted.get_state(_key(1)), await restarted.get_data(_key(1)))
+        await restarted.flush()
+        removed = await restarted.expire()
+        return expired, removed, await _stored_keys()
+
+    expired, removed, keys = run(scenario())
+    assert expired == (None, {})
+    assert removed == 1  # _key(1) удалён при flush, _key(2) — очисткой
+    assert keys == []
+
+# Переполненный LRU не вытесняет несохранённые записи; после flush они в БД, а кэш ужат
+def test_lru_keeps_dirty_entries_until_flushed(run):
+    async def scenario():
+        await database.init_db()
+        storage = SQLiteStorage(maxsize=2, ttl=3600)
+        for user_id in (1, 2, 3):
+            await storage.set_state(_key(user_id), ParticipantRegistration.full_name)
+        cached_before = len(storage._cache)
+        await storage.flush()
+        cached_after = len(storage._cache)
+        return cached_before, cached_after, await _stored_keys(), await storage.get_state(_key(1))
+
+    cached_before, cached_after, keys, evicted_state = run(scenario())
+    assert cached_before == 3
+    assert cached_after == 2
+    assert keys == ["42:1:1:::default", "42:2:2:::default", "42:3:3:::default"]
+    # Вытесненный ключ снова читается из БД
+    assert evicted_state == ParticipantRegistration.full_name.state
\ No newline at end of file
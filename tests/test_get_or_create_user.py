@@ -0,0 +1,38 @@
+from sqlalchemy import func, select, update
+
+import database
+from database import Role, User
+
+# Повторные вызовы не плодят строки и не затирают роль и известный @username
+def test_upsert_is_idempotent(run):
+    async def scenario():
+        await database.init_db()
+        created = await database.get_or_create_user(400, "Участник", "member")
+
+        async def promote(session):
+            await session.execute(update(User).where(User.telegram_id == 400).values(role=Role.ORGANIZER.value))
+        await database.run_write(promote)
+
+        again = await database.get_or_create_user(400, "Другое имя", None)
+        async with database.AsyncSessionLocal(readonly=True) as session:
+            rows = await session.scalar(select(func.count()).select_from(User).where(User.telegram_id == 400))
+        return created, again, rows
+
+    created, again, rows = run(scenario())
+    assert rows == 1
+    assert again.id == created.id
+    assert (again.role, again.username, again.full_name) == (Role.ORGANIZER.value, "member", "Участник")
+    assert again.created_at == created.created_at
+
+# RETURNING на вставке уже несёт время создания — его не нужно перечитывать
+def test_insert_returns_timestamps(run):
+    async def scenario():
+        await database.init_db()
+        user = await database.get_or_create_user(401)
+        async with database.AsyncSessionLocal(readonly=True) as session:
+            stored = await session.scalar(select(User.created_at).where(User.telegram_id == 401))
+        return user, stored
+
+    user, stored = run(scenario())
+    assert user.created_at is not None and user.updated_at is not None
+    assert user.created_at == stored
\ No newline at end of file
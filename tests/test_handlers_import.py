@@ -0,0 +1,32 @@
+import importlib
+import pkgutil
+
+import pytest
+
+import database
+import handlers
+
+HANDLER_MODULES = sorted(f"handlers.{m.name}" for m in pkgutil.iter_modules(handlers.__path__))
+
+# Каждый модуль с роутером импортируется — иначе bot.py не стартует
+@pytest.mark.parametrize("name", HANDLER_MODULES)
+def test_handler_module_imports(name):
+    importlib.import_module(name)
+
+def test_bot_module_imports():
+    importlib.import_module("bot")
+
+async def _pause_cycle():
+    await database.init_db()
+    before = await database.get_bot_status()
+    await database.set_bot_paused(True, "обслуживание", 1)
+    paused = await database.get_bot_status()
+    await database.set_bot_paused(False, None, 1)
+    resumed = await database.get_bot_status()
+    return before, paused, resumed
+
+def test_pause_and_resume_bot(run):
+    before, paused, resumed = run(_pause_cycle())
+    assert not before.is_paused
+    assert (paused.is_paused, paused.reason, paused.changed_by) == (True, "обслуживание", 1)
+    assert not resumed.is_paused and resumed.reason is None
\ No newline at end of file
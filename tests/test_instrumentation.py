@@ -0,0 +1,59 @@
+import logging
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import event, select
+
+import database
+import instrumentation
+from config import SQL_N_PLUS_ONE_THRESHOLD
+from database import User
+from instrumentation import HandlerNameMiddleware, UpdateStatsMiddleware
+
+USERS = range(600, 600 + SQL_N_PLUS_ONE_THRESHOLD + 2)
+
+@pytest.fixture(autouse=True)
+def instrumented(monkeypatch):
+    # bot.py при импорте уже мог подписаться на события движка — второй раз не подписываемся
+    if not event.contains(database.read_engine.sync_engine, "after_cursor_execute", instrumentation._after_cursor_execute):
+        instrumentation.instrument_engine(database.read_engine)
+    monkeypatch.setattr(instrumentation, "handler_totals", {})
+
+async def names_one_by_one():
+    async with database.AsyncSessionLocal(readonly=True) as session:
+        return [await session.scalar(select(User.full_name).where(User.telegram_id == telegram_id)) for telegram_id in USERS]
+
+async def names_in_one_query():
+    async with database.AsyncSessionLocal(readonly=True) as session:
+        return (await session.execute(select(User.full_name).where(User.telegram_id.in_(USERS)))).scalars().all()
+
+async def _update(callback):
+    await database.init_db()
+    for telegram_id in USERS:
+        await database.get_or_create_user(telegram_id, f"Участник {telegram_id}")
+
+    async def handler(event, data):
+        return await callback()
+
+    async def named(event, data):
+        return await HandlerNameMiddleware()(handler, event, {"handler": SimpleNamespace(callback=callback)})
+
+    return await UpdateStatsMiddleware()(named, None, {})
+
+# Запрос в цикле по пользователям — предупреждение N+1 с именем хендлера и счётчик в итогах
+def test_repeated_query_is_reported_as_n_plus_one(run, caplog):
+    with caplog.at_level(logging.WARNING, logger="sql"):
+        names = run(_update(names_one_by_one))
+
+    assert len(names) == len(USERS)
+    [warning] = [record.getMessage() for record in caplog.records if "N+1" in record.getMessage()]
+    assert warning.startswith(f"names_one_by_one: возможный N+1 — запрос повторён {len(USERS)} раз")
+    totals = instrumentation.handler_totals["names_one_by_one"]
+    assert (totals.updates, totals.queries, totals.n_plus_one) == (1, len(USERS), 1)
+
+def test_single_query_is_not_reported(run, caplog):
+    with caplog.at_level(logging.WARNING, logger="sql"):
+        run(_update(names_in_one_query))
+
+    assert not [record for record in caplog.records if "N+1" in record.getMessage()]
+    assert instrumentation.handler_totals["names_in_one_query"].n_plus_one == 0
\ No newline at end of file
@@ -0,0 +1,69 @@
+import datetime as dt
+import os
+import shutil
+
+import pytest
+from aiogram.types import Chat, FSInputFile, Message, PhotoSize
+
+import database
+import media_cache
+from media_cache import cached_photo, remember_photo
+
+@pytest.fixture
+def poster(tmp_path, monkeypatch):
+    monkeypatch.setattr(media_cache, "_known", {})
+    path = tmp_path / "poster.jpg"
+    path.write_bytes(b"\xff\xd8poster-v1\xff\xd9")
+    return str(path)
+
+def _sent(*file_ids: str) -> Message:
+    sizes = [
+        PhotoSize(file_id=file_id, file_unique_id=file_id, width=90 * n, height=90 * n)
+        for n, file_id in enumerate(file_ids, 1)
+    ]
+    return Message(message_id=1, date=dt.datetime.now(), chat=Chat(id=1, type="private"), photo=sizes)
+
+# После первой отправки файл уходит по file_id самого большого размера — из памяти или из media_files
+def test_file_id_is_reused_after_first_send(run, poster, monkeypatch):
+    async def scenario():
+        await database.init_db()
+        first = await cached_photo(poster)
+        await remember_photo(poster, _sent("small", "large"))
+        from_memory = await cached_photo(poster)
+        monkeypatch.setattr(media_cache, "_known", {})
+        from_database = await cached_photo(poster)
+        return first, from_memory, from_database
+
+    first, from_memory, from_database = run(scenario())
+    assert isinstance(first, FSInputFile)
+    assert from_memory == from_database == "large"
+
+# Ключ — размер и mtime: изменённый файл отправляется заново, а не старым file_id
+def test_changed_file_is_uploaded_again(run, poster):
+    async def scenario():
+        await database.init_db()
+        await remember_photo(poster, "v1")
+        with open(poster, "wb") as f:
+            f.write(b"\xff\xd8poster-v2, longer\xff\xd9")
+        return await cached_photo(poster)
+
+    assert isinstance(run(scenario()), FSInputFile)
+
+# Тронутый файл с тем же содержимым и копия под другим путём находят file_id по sha256
+def test_same_content_is_matched_by_hash(run, poster):
+    copy = os.path.join(os.path.dirname(poster), "copy.jpg")
+
+    async def scenario():
+        await database.init_db()
+        await remember_photo(poster, "v1")
+        os.utime(poster, ns=(0, os.stat(poster).st_mtime_ns + 10**9))
+        shutil.copyfile(poster, copy)
+        return await cached_photo(poster), await cached_photo(copy), media_cache._known[copy]
+
+    touched, copied, known = run(scenario())
+    assert touched == copied == "v1"
+    assert known == (os.stat(copy).st_size, os.stat(copy).st_mtime_ns, "v1")
+
+def test_missing_file_is_none(run, tmp_path):
+    assert run(cached_photo(str(tmp_path / "missing.jpg"))) is None
+    assert run(cached_photo(None)) is None
\ No newline at end of file
@@ -0,0 +1,81 @@
+import os
+import time
+
+from aiogram.types import File, PhotoSize
+from sqlalchemy import select
+
+import database
+import media_store
+from conftest import RecordingBot
+from database import Conference, MediaFile
+
+# Бот, у которого все фото Telegram — один и тот же файл
+class PhotoBot(RecordingBot):
+    content = b"\xff\xd8poster\xff\xd9"
+
+    async def get_file(self, file_id: str, **kwargs) -> File:
+        return File(file_id=file_id, file_unique_id=file_id, file_path=f"photos/{file_id}.jpg")
+
+    async def download_file(self, file_path: str, destination, **kwargs):
+        destination.write(self.content)
+        return destination
+
+def _photo(file_id: str) -> PhotoSize:
+    return PhotoSize(file_id=file_id, file_unique_id=file_id, width=100, height=100)
+
+def _blobs() -> list[str]:
+    return [
+        os.path.join(root, name)
+        for root, _dirs, files in os.walk("posters") if os.path.basename(root) != "tmp"
+        for name in files
+    ]
+
+def _age(path: str, seconds: float):
+    old = time.time() - seconds
+    os.utime(path, (old, old))
+
+# Загрузка -> дедупликация одинаковых фото -> сборка мусора после grace-периода
+def test_store_dedup_and_gc_cycle(run, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    for directory in media_store.MEDIA_DIRS:
+        os.makedirs(os.path.join(directory, "tmp"))
+    bot = PhotoBot()
+
+    async def scenario():
+        await database.init_db()
+        first = await media_store.store_photo(bot, _photo("first"), "posters")
+        second = await media_store.store_photo(bot, _photo("second"), "posters")
+        assert first == second == media_store.blob_path("posters", first.rsplit("/", 1)[1][:-4])
+        assert _blobs() == [first]
+        async with database.AsyncSessionLocal(readonly=True) as session:
+            assert await session.scalar(select(MediaFile.path)) == first
+
+        organizer = await database.get_or_create_user(10, "Организатор", None)
+
+        async def add(session):
+            conf = Conference(name="MUN", organizer_id=organizer.id, poster_path=first)
+            session.add(conf)
+            await session.flush()
+            return conf.id
+        conf_id = await database.run_write(add)
+
+        # Свежий файл защищён grace-периодом, старый — ссылкой из конференции
+        fresh = await media_store.collect_garbage(grace=3600)
+        _age(first, 7200)
+        referenced = await media_store.collect_garbage(grace=3600)
+
+        async def drop(session):
+            await session.delete(await session.get(Conference, conf_id))
+        await database.run_write(drop)
+        collected = await media_store.collect_garbage(grace=3600)
+
+        async with database.AsyncSessionLocal(readonly=True) as session:
+            rows = (await session.execute(select(MediaFile.path))).scalars().all()
+        return fresh, referenced, collected, rows
+
+    fresh, referenced, collected, rows = run(scenario())
+    assert (fresh, referenced, collected) == (0, 0, 1)
+    assert _blobs() == []
+    assert rows == []
+    # Пустые шард-каталоги убраны, корень хранилища остался
+    assert os.listdir("posters") == ["tmp"]
\ No newline at end of file
@@ -0,0 +1,66 @@
+from aiogram.exceptions import TelegramForbiddenError
+from aiogram.methods import SendMessage
+from sqlalchemy import select
+
+import database
+import outbox
+from database import OutboxMessage
+from conftest import RecordingBot
+from outbox import dispatch_due, enqueue_notification
+
+BLOCKED_CHAT = 666
+
+class BlockedChatBot(RecordingBot):
+    async def __call__(self, method, request_timeout=None):
+        if isinstance(method, SendMessage) and method.chat_id == BLOCKED_CHAT:
+            raise TelegramForbiddenError(method, "bot was blocked by the user")
+        return await super().__call__(method, request_timeout)
+
+async def _outbox_rows() -> list[tuple[int, str]]:
+    async with database.AsyncSessionLocal(readonly=True) as session:
+        rows = await session.execute(select(OutboxMessage.chat_id, OutboxMessage.status).order_by(OutboxMessage.id))
+        return [tuple(row) for row in rows]
+
+# Уведомление появляется только вместе с коммитом транзакции, повтор с тем же dedup_key не дублирует его
+def test_enqueue_is_transactional_and_idempotent(run):
+    async def scenario():
+        await database.init_db()
+        outbox._wake.clear()
+
+        async def approve(session):
+            await enqueue_notification(session, 101, "Заявка одобрена", dedup_key="app:1:approved")
+            await enqueue_notification(session, 101, "Заявка одобрена", dedup_key="app:1:approved")
+        await database.run_write(approve)
+        woken = outbox._wake.is_set()
+
+        async def rolled_back(session):
+            await enqueue_notification(session, 102, "Не уйдёт")
+            raise RuntimeError("откат")
+        try:
+            await database.run_write(rolled_back)
+        except RuntimeError:
+            pass
+        return woken, await _outbox_rows()
+
+    woken, rows = run(scenario())
+    assert woken
+    assert rows == [(101, "pending")]
+
+# Диспетчер отправляет созревшие уведомления и записывает итог; заблокировавшие бота не повторяются
+def test_dispatch_marks_sent_and_blocked(run):
+    bot = BlockedChatBot()
+
+    async def scenario():
+        await database.init_db()
+
+        async def enqueue(session):
+            await enqueue_notification(session, 101, "Оплата подтверждена")
+            await enqueue_notification(session, BLOCKED_CHAT, "Оплата подтверждена")
+        await database.run_write(enqueue)
+        dispatched = await dispatch_due(bot)
+        return dispatched, await dispatch_due(bot), await _outbox_rows()
+
+    dispatched, again, rows = run(scenario())
+    assert (dispatched, again) == (2, 0)
+    assert rows == [(101, "sent"), (BLOCKED_CHAT, "blocked")]
+    assert [call.chat_id for call in bot.sent(SendMessage)] == [101]
\ No newline at end of file
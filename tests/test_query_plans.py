@@ -0,0 +1,84 @@
+import re
+
+import pytest
+import sqlalchemy as sa
+from sqlalchemy import select, func
+
+from database import (
+    Base, Application, Conference, ConferenceCreationRequest, ConferenceEditRequest, SupportRequest, User,
+    create_missing_indexes
+)
+
+# Горячие запросы хендлеров и таблица, которую каждый из них не должен читать целиком
+HOT_QUERIES = {
+    "get_applications": (
+        "applications",
+        select(Application).where(Application.conference_id == 1, Application.status == "pending"),
+    ),
+    "send_broadcast": (
+        "applications",
+        select(User.telegram_id).join(Application, Application.user_id == User.id).where(
+            Application.conference_id == 1,
+            Application.status.in_(["approved", "payment_pending", "payment_sent", "confirmed", "link_sent"])
+        ),
+    ),
+    "receive_payment_screenshot": (
+        "applications",
+        select(Application).where(Application.user_id == 1, Application.status == "payment_pending"),
+    ),
+    "organizer_conferences": (
+        "conferences",
+        select(func.count(Conference.id)).where(Conference.organizer_id == 1),
+    ),
+    "active_conferences": (
+        "conferences",
+        select(Conference).where(Conference.is_active == True),
+    ),
+    "update_requests_message": (
+        "conference_creation_requests",
+        select(ConferenceCreationRequest).where(
+            ConferenceCreationRequest.status == "rejected", ConferenceCreationRequest.appeal == True
+        ),
+    ),
+    "pending_edit_requests": (
+        "conference_edit_requests",
+        select(ConferenceEditRequest).where(ConferenceEditRequest.status == "pending"),
+    ),
+    "support_queue": (
+        "support_requests",
+        select(SupportRequest).where(SupportRequest.status == "pending"),
+    ),
+    "users_by_role": (
+        "users",
+        select(User).where(User.role == "Админ"),
+    ),
+    "banned_users": (
+        "users",
+        select(User.telegram_id, User.full_name, User.ban_reason).where(User.is_banned == True),
+    ),
+}
+
+@pytest.fixture(scope="module")
+def engine(tmp_path_factory):
+    engine = sa.create_engine(f"sqlite:///{tmp_path_factory.mktemp('plans') / 'plans.db'}")
+    with engine.begin() as conn:
+        Base.metadata.create_all(conn)
+        create_missing_indexes(conn)
+    yield engine
+    engine.dispose()
+
+def _plan(engine, stmt) -> list[str]:
+    sql = stmt.compile(dialect=engine.dialect, compile_kwargs={"literal_binds": True})
+    with engine.connect() as conn:
+        return [row[3] for row in conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}")]
+
+# SCAN таблицы без индекса — полный проход; SCAN по (частичному) индексу допустим
+@pytest.mark.parametrize("name", HOT_QUERIES)
+def test_hot_query_uses_index(engine, name):
+    table, stmt = HOT_QUERIES[name]
+    plan = _plan(engine, stmt)
+    full_scans = [
+        detail for detail in plan
+        if re.match(rf"SCAN {table}\b", detail) and "INDEX" not in detail
+    ]
+    assert not full_scans, f"{name}: {plan}"
\ No newline at end of file
@@ -0,0 +1,94 @@
+import asyncio
+
+from aiogram.fsm.storage.base import StorageKey
+from sqlalchemy import func, select
+
+import database
+import scheduler
+from database import User
+from scheduler import PARTICIPANT, STAFF, UpdateScheduler, classify
+from user_cache import user_cache
+
+CHIEF_ADMIN = 1  # CHIEF_ADMIN_IDS в conftest
+
+def _key(user_id: int) -> StorageKey:
+    return StorageKey(bot_id=42, chat_id=user_id, user_id=user_id)
+
+# Классификатор только читает: незнакомый пользователь — участник, и в БД он не появляется
+def test_classify_is_read_only(run):
+    async def scenario():
+        await database.init_db()
+        user_cache.clear()
+        lanes = await classify(_key(5)), await classify(_key(CHIEF_ADMIN))
+        async with database.AsyncSessionLocal(readonly=True) as session:
+            created = await session.scalar(select(func.count()).where(User.telegram_id == 5))
+        return lanes, created
+
+    lanes, created = run(scenario())
+    assert lanes == (PARTICIPANT, STAFF)
+    assert created == 0
+    assert user_cache.get(5) is None
+
+# Участники заняли все нерезервные воркеры: апдейт персонала идёт сразу, следующий участник ждёт
+def test_staff_lane_uses_reserved_worker(monkeypatch):
+    async def lane_of(key: StorageKey) -> str:
+        return STAFF if key.user_id == CHIEF_ADMIN else PARTICIPANT
+    monkeypatch.setattr(scheduler, "classify", lane_of)
+
+    async def scenario():
+        updates = UpdateScheduler(workers=2, staff_reserved=1)
+        release = asyncio.Event()
+        started = []
+
+        async def handle(user_id: int):
+            async with updates.lock(_key(user_id)):
+                started.append(user_id)
+                await release.wait()
+
+        tasks = [asyncio.create_task(handle(user_id)) for user_id in (101, 102)]
+        await asyncio.sleep(0.01)
+        tasks.append(asyncio.create_task(handle(CHIEF_ADMIN)))
+        await asyncio.sleep(0.01)
+        snapshot = updates.snapshot()
+        release.set()
+        await asyncio.gather(*tasks)
+        return started, snapshot, updates.snapshot()
+
+    started, during, after = asyncio.run(scenario())
+    assert started[:2] == [101, CHIEF_ADMIN]
+    assert during["busy"] == 2
+    assert during["lanes"][PARTICIPANT]["pending"] == 1
+    assert during["lanes"][STAFF]["active"] == 1
+    assert after["lanes"][PARTICIPANT]["processed"] == 2 and after["lanes"][STAFF]["processed"] == 1
+
+# Апдейты одного чата идут строго по очереди прихода, даже если ранние обрабатываются дольше;
+# другой чат в это время не ждёт
+def test_chat_updates_are_serial_and_chats_are_parallel(monkeypatch):
+    async def lane_of(key: StorageKey) -> str:
+        return PARTICIPANT
+    monkeypatch.setattr(scheduler, "classify", lane_of)
+
+    async def scenario():
+        updates = UpdateScheduler(workers=4, staff_reserved=0)
+        events = []
+
+        async def handle(user_id: int, number: int, duration: float):
+            async with updates.lock(_key(user_id)):
+                events.append(("start", user_id, number))
+                await asyncio.sleep(duration)
+                events.append(("end", user_id, number))
+
+        tasks = [asyncio.create_task(handle(201, number, 0.03 - number * 0.01)) for number in range(3)]
+        tasks.append(asyncio.create_task(handle(202, 0, 0.005)))
+        await asyncio.sleep(0.001)
+        during = updates.snapshot()
+        await asyncio.gather(*tasks)
+        return events, during, updates.snapshot()
+
+    events, during, after = asyncio.run(scenario())
+    first_chat = [(kind, number) for kind, user_id, number in events if user_id == 201]
+    assert first_chat == [("start", 0), ("end", 0), ("start", 1), ("end", 1), ("start", 2), ("end", 2)]
+    # Второй чат начал и закончил, пока первый обрабатывал свой первый апдейт
+    assert events.index(("end", 202, 0)) < events.index(("end", 201, 0))
+    assert (during["busy"], during["chats"], during["deepest_chat"]) == (2, 2, 3)
+    assert (after["busy"], after["chats"]) == (0, 0)
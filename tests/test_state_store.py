@@ -0,0 +1,67 @@
+import pytest
+
+import database
+import state_store
+from state_store import StateStore
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(state_store.time, "time", lambda: now[0])
+    return now
+
+BACKENDS = pytest.mark.parametrize("backend", ["memory", "sqlite"])
+
+@BACKENDS
+def test_round_trip_and_pop(run, backend):
+    async def scenario():
+        await database.init_db()
+        store = StateStore("pages", ttl=60, maxsize=10, backend=backend)
+        await store.set(42, {"offset": 20, "ids": [1, 2]})
+        value = await store.get(42)
+        popped = await store.pop(42)
+        return value, popped, await store.get(42, "нет")
+
+    assert run(scenario()) == ({"offset": 20, "ids": [1, 2]}, {"offset": 20, "ids": [1, 2]}, "нет")
+
+@BACKENDS
+def test_entry_expires_after_ttl(run, backend, clock):
+    async def scenario():
+        await database.init_db()
+        store = StateStore("pages", ttl=60, maxsize=10, backend=backend)
+        await store.set(42, 1)
+        clock[0] += 59
+        alive = await store.get(42)
+        clock[0] += 2
+        return alive, await store.get(42)
+
+    assert run(scenario()) == (1, None)
+
+# Сверх maxsize вытесняются самые давние записи; SQLite чистит попутно, не чаще раза в минуту
+@BACKENDS
+def test_oldest_entries_are_evicted(run, backend, clock):
+    async def scenario():
+        await database.init_db()
+        store = StateStore("pages", ttl=3600, maxsize=2, backend=backend)
+        for key in ("a", "b"):
+            await store.set(key, key)
+            clock[0] += 1
+        clock[0] += 60
+        await store.set("c", "c")
+        return [await store.get(key) for key in ("a", "b", "c")]
+
+    assert run(scenario()) == [None, "b", "c"]
+
+# Вытеснение в SQLite не трогает чужие пространства имён в той же таблице
+def test_sqlite_eviction_is_per_namespace(run, clock):
+    async def scenario():
+        await database.init_db()
+        other = StateStore("search", ttl=3600, maxsize=2, backend="sqlite")
+        await other.set(1, "kept")
+        store = StateStore("pages", ttl=3600, maxsize=1, backend="sqlite")
+        await store.set(1, "old")
+        clock[0] += 61
+        await store.set(2, "new")
+        return await other.get(1), await store.get(1), await store.get(2)
+
+    assert run(scenario()) == ("kept", None, "new")
\ No newline at end of file
@@ -0,0 +1,73 @@
+import datetime as dt
+
+import pytest
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.storage.base import StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+from aiogram.types import Chat, Message
+
+import database
+import user_cache
+from handlers import ban
+
+MODERATOR_ID, USER_ID = 1, 300
+
+@pytest.fixture
+def loads(monkeypatch):
+    user_cache.user_cache.clear()
+    calls = []
+
+    async def counting(telegram_id, full_name=None, username=None):
+        calls.append(telegram_id)
+        return await database.get_or_create_user(telegram_id, full_name, username)
+    monkeypatch.setattr(user_cache, "get_or_create_user", counting)
+    yield calls
+    user_cache.user_cache.clear()
+
+# Повторный апдейт того же пользователя обслуживается из кэша, новый @username — поводом сходить в БД
+def test_cache_hit_skips_database(run, loads):
+    async def scenario():
+        await database.init_db()
+        first = await user_cache.get_cached_user(USER_ID, "Участник", "member")
+        again = await user_cache.get_cached_user(USER_ID, "Участник", "member")
+        renamed = await user_cache.get_cached_user(USER_ID, "Участник", "renamed")
+        return first, again, renamed
+
+    first, again, renamed = run(scenario())
+    assert again is first
+    assert renamed.username == "renamed"
+    assert loads == [USER_ID, USER_ID]
+
+def test_entry_expires_after_ttl(run, loads, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(user_cache.time, "monotonic", lambda: now[0])
+
+    async def scenario():
+        await database.init_db()
+        await user_cache.get_cached_user(USER_ID)
+        now[0] += user_cache.user_cache.ttl - 1
+        await user_cache.get_cached_user(USER_ID)
+        now[0] += 2
+        await user_cache.get_cached_user(USER_ID)
+
+    run(scenario())
+    assert loads == [USER_ID, USER_ID]
+
+# Бан через модерацию сбрасывает запись: ban_middleware видит его на следующем же апдейте
+def test_ban_invalidates_cached_user(run, loads, bot):
+    async def scenario():
+        await database.init_db()
+        before = await user_cache.get_cached_user(USER_ID, "Участник")
+
+        state = FSMContext(MemoryStorage(), StorageKey(bot.id, MODERATOR_ID, MODERATOR_ID))
+        await state.update_data(target=str(USER_ID), action="ban")
+        chat = Chat(id=MODERATOR_ID, type="private")
+        message = Message(message_id=1, date=dt.datetime.now(), chat=chat, text="спам").as_(bot)
+        await ban.do_ban_unban(message, state, reason="спам")
+
+        return before, await user_cache.get_cached_user(USER_ID)
+
+    before, after = run(scenario())
+    assert not before.is_banned
+    assert after.is_banned
+    assert loads == [USER_ID, USER_ID]
\ No newline at end of file
@@ -0,0 +1,67 @@
+import asyncio
+
+from aiogram import Dispatcher, F
+from aiohttp import web
+from aiohttp.test_utils import TestClient, TestServer
+
+from webhook import QueuedRequestHandler
+
+SECRET = "s3cret"
+PATH = "/webhook"
+
+def _update(update_id: int, text: str = "Помощь") -> dict:
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id, "date": 0, "text": text,
+            "chat": {"id": 5, "type": "private"},
+            "from": {"id": 5, "is_bot": False, "first_name": "A", "username": "alice"},
+        },
+    }
+
+# Локальный POST записанного апдейта — так же, как curl из описания run_webhook
+async def _post_updates(bot, updates: list[dict], workers: int, queue_size: int, secret: str | None = SECRET):
+    dp = Dispatcher()
+    handled = []
+
+    @dp.message(F.text)
+    async def record(message):
+        handled.append(message.text)
+
+    app = web.Application()
+    handler = QueuedRequestHandler(dp, bot, SECRET, queue_size, workers)
+    handler.register(app, path=PATH)
+
+    headers = {"X-Telegram-Bot-Api-Secret-Token": secret} if secret is not None else {}
+    async with TestClient(TestServer(app)) as client:
+        statuses = []
+        for update in updates:
+            response = await client.post(PATH, json=update, headers=headers)
+            statuses.append(response.status)
+        if workers:
+            await asyncio.wait_for(handler.queue.join(), 5)
+        queued = handler.queue.qsize()
+        # Без воркеров принятое никто не разберёт — иначе остановка ждала бы очередь до таймаута
+        while not handler.queue.empty():
+            handler.queue.get_nowait()
+            handler.queue.task_done()
+    return statuses, handled, queued
+
+def test_missing_or_wrong_secret_is_rejected(bot):
+    for secret in (None, "wrong"):
+        statuses, handled, queued = asyncio.run(
+            _post_updates(bot, [_update(1)], workers=1, queue_size=10, secret=secret)
+        )
+        assert statuses == [401]
+        assert handled == [] and queued == 0
+
+def test_valid_update_is_accepted_and_processed(bot):
+    statuses, handled, _ = asyncio.run(_post_updates(bot, [_update(1, "привет")], workers=1, queue_size=10))
+    assert statuses == [200]
+    assert handled == ["привет"]
+
+# Без воркеров очередь на один апдейт заполняется первым запросом — второй получает 503
+def test_full_queue_returns_503(bot):
+    statuses, handled, queued = asyncio.run(_post_updates(bot, [_update(1), _update(2)], workers=0, queue_size=1))
+    assert statuses == [200, 503]
+    assert handled == [] and queued == 1
\ No newline at end of file
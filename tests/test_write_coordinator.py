@@ -0,0 +1,80 @@
+import asyncio
+
+import pytest
+from sqlalchemy import select
+
+import database
+from database import StatCounter, WriteCoordinator, run_write, write_coordinator
+
+def _put(name: str, fail: bool = False):
+    async def unit(session):
+        session.add(StatCounter(name=name, value=1))
+        await session.flush()
+        if fail:
+            raise ValueError(name)
+        return name
+    return unit
+
+# Одновременные записи уходят одним пакетом; ошибка единицы откатывает только её SAVEPOINT
+def test_concurrent_writes_share_one_batch_and_fail_independently(run, monkeypatch):
+    batches = []
+    commit_batch = write_coordinator._commit_batch
+
+    async def counting(batch):
+        batches.append(len(batch))
+        await commit_batch(batch)
+    monkeypatch.setattr(write_coordinator, "_commit_batch", counting)
+
+    async def scenario():
+        await database.init_db()
+        results = await asyncio.gather(
+            run_write(_put("a")), run_write(_put("b", fail=True)), run_write(_put("c")),
+            return_exceptions=True
+        )
+        async with database.AsyncSessionLocal(readonly=True) as session:
+            names = (await session.execute(
+                select(StatCounter.name).where(StatCounter.name.in_(["a", "b", "c"]))
+            )).scalars().all()
+        return results, sorted(names)
+
+    results, names = run(scenario())
+    assert batches == [3]
+    assert results[0] == "a" and results[2] == "c"
+    assert isinstance(results[1], ValueError)
+    assert names == ["a", "c"]
+
+# Ошибка единицы доходит до вызвавшего run_write
+def test_unit_error_is_raised_to_caller(run):
+    async def scenario():
+        await database.init_db()
+        await run_write(_put("x", fail=True))
+
+    with pytest.raises(ValueError):
+        run(scenario())
+
+# Остановленный воркер не оставляет вызвавших ждать: и начатый пакет, и очередь получают ошибку
+def test_cancelled_worker_fails_pending_writes(run):
+    coordinator = WriteCoordinator(window=0.01, max_batch=1)
+    started = asyncio.Event()
+
+    async def blocking(session):
+        started.set()
+        await asyncio.Event().wait()
+
+    async def scenario():
+        await database.init_db()
+        writes = [
+            asyncio.create_task(coordinator.submit(blocking)),
+            asyncio.create_task(coordinator.submit(_put("queued")))
+        ]
+        await started.wait()
+        coordinator._worker.cancel()
+        async with asyncio.timeout(5):
+            results = await asyncio.gather(*writes, return_exceptions=True)
+        async with database.AsyncSessionLocal(readonly=True) as session:
+            saved = await session.scalar(select(StatCounter.name).where(StatCounter.name == "queued"))
+        return results, saved
+
+    results, saved = run(scenario())
+    assert [type(result) for result in results] == [RuntimeError, RuntimeError]
+    assert saved is None
\ No newline at end of file
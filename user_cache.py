@@ -0,0 +1,82 @@
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from sqlalchemy import select
+
+from config import USER_CACHE_SIZE, USER_CACHE_TTL
+from database import AsyncSessionLocal, User, get_or_create_user
+
+# Лёгкий снимок пользователя — всё, что нужно middleware и меню
+@dataclass(frozen=True, slots=True)
+class CachedUser:
+    id: int
+    telegram_id: int
+    role: str
+    is_banned: bool
+    username: str | None = None
+
+# Процессный LRU-кэш telegram_id -> CachedUser с TTL
+class UserCache:
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._items: OrderedDict[int, tuple[float, CachedUser]] = OrderedDict()
+
+    def get(self, telegram_id: int) -> CachedUser | None:
+        item = self._items.get(telegram_id)
+        if item is None:
+            return None
+        expires_at, user = item
+        if expires_at < time.monotonic():
+            del self._items[telegram_id]
+            return None
+        self._items.move_to_end(telegram_id)
+        return user
+
+    def put(self, user: CachedUser):
+        self._items[user.telegram_id] = (time.monotonic() + self.ttl, user)
+        self._items.move_to_end(user.telegram_id)
+        while len(self._items) > self.maxsize:
+            self._items.popitem(last=False)
+
+    def invalidate(self, telegram_id: int):
+        self._items.pop(telegram_id, None)
+
+    def clear(self):
+        self._items.clear()
+
+user_cache = UserCache(USER_CACHE_SIZE, USER_CACHE_TTL)
+
+# Пользователь из кэша; в БД идём только при промахе
+# или когда в апдейте пришёл новый @username
+async def get_cached_user(
+    telegram_id: int, full_name: str | None = None, username: str | None = None
+) -> CachedUser:
+    cached = user_cache.get(telegram_id)
+    if cached is not None and (username is None or cached.username == username):
+        return cached
+
+    db_user = await get_or_create_user(telegram_id, full_name, username)
+    cached = CachedUser(
+        id=db_user.id,
+        telegram_id=db_user.telegram_id,
+        role=db_user.role,
+        is_banned=db_user.is_banned,
+        username=db_user.username,
+    )
+    user_cache.put(cached)
+    return cached
+
+# Только чтение: роль из кэша или одним SELECT, None — пользователя ещё нет.
+# Пользователя не создаёт — имя и username при первом апдейте запишет ban_middleware
+async def peek_role(telegram_id: int) -> str | None:
+    cached = user_cache.get(telegram_id)
+    if cached is not None:
+        return cached.role
+    async with AsyncSessionLocal(readonly=True) as session:
+        return await session.scalar(select(User.role).where(User.telegram_id == telegram_id))
+
+# Сброс записи после смены роли / бана
+def invalidate_user(telegram_id: int):
+    user_cache.invalidate(telegram_id)
\ No newline at end of file
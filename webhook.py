@@ -0,0 +1,103 @@
+import asyncio
+import contextvars
+import logging
+
+from aiohttp import web
+from aiogram import Bot, Dispatcher
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+
+from config import (
+    WEBHOOK_URL, WEBHOOK_PATH, WEBHOOK_SECRET, WEBHOOK_HOST, WEBHOOK_PORT,
+    WEBHOOK_QUEUE_SIZE, WEBHOOK_WORKERS
+)
+
+logger = logging.getLogger("webhook")
+
+# Приём апдейтов вебхуком: запрос только кладёт JSON в ограниченную очередь и сразу
+# отвечает 200, обработку ведут воркеры. Очередь полна — 503, Telegram повторит доставку позже
+class QueuedRequestHandler(SimpleRequestHandler):
+    def __init__(self, dispatcher: Dispatcher, bot: Bot, secret_token: str, queue_size: int, workers: int):
+        super().__init__(dispatcher, bot, handle_in_background=True, secret_token=secret_token)
+        self.queue: asyncio.Queue[dict] = asyncio.Queue(maxsize=queue_size)
+        self.workers = workers
+        self._tasks: list[asyncio.Task] = []
+
+    def register(self, app: web.Application, /, path: str, **kwargs):
+        super().register(app, path=path, **kwargs)
+        app.on_startup.append(self._start_workers)
+
+    async def _start_workers(self, app: web.Application):
+        # Свой контекст на воркер, чтобы contextvars апдейтов не смешивались
+        self._tasks = [
+            asyncio.create_task(self._worker(), context=contextvars.Context())
+            for _ in range(self.workers)
+        ]
+
+    async def _worker(self):
+        while True:
+            update = await self.queue.get()
+            try:
+                await self._background_feed_update(self.bot, update)
+            except Exception:
+                logger.exception("Ошибка обработки апдейта %s", update.get("update_id"))
+            finally:
+                self.queue.task_done()
+
+    async def _handle_request_background(self, bot: Bot, request: web.Request) -> web.Response:
+        try:
+            update = await request.json(loads=bot.session.json_loads)
+        except ValueError:
+            return web.Response(body="Bad Request", status=400)
+        if not isinstance(update, dict):
+            return web.Response(body="Bad Request", status=400)
+
+        try:
+            self.queue.put_nowait(update)
+        except asyncio.QueueFull:
+            logger.warning("Очередь вебхука переполнена, апдейт %s отклонён", update.get("update_id"))
+            return web.Response(body="Busy", status=503)
+        return web.json_response({}, dumps=bot.session.json_dumps)
+
+    async def close(self):
+        # Дорабатываем уже принятые апдейты, потом останавливаем воркеры
+        try:
+            await asyncio.wait_for(self.queue.join(), 10)
+        except asyncio.TimeoutError:
+            logger.warning("Остановка вебхука: не обработано апдейтов %s", self.queue.qsize())
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        await super().close()
+
+def build_app(bot: Bot, dp: Dispatcher) -> web.Application:
+    app = web.Application()
+    handler = QueuedRequestHandler(dp, bot, WEBHOOK_SECRET, WEBHOOK_QUEUE_SIZE, WEBHOOK_WORKERS)
+    handler.register(app, path=WEBHOOK_PATH)
+
+    async def health(request: web.Request) -> web.Response:
+        return web.json_response({"queue": handler.queue.qsize(), "capacity": handler.queue.maxsize})
+    app.router.add_get("/healthz", health)
+
+    setup_application(app, dp, bot=bot)
+    return app
+
+# Режим вебхука. Без WEBHOOK_URL вебхук в Telegram не регистрируется — удобно для локальной
+# проверки: curl -H "X-Telegram-Bot-Api-Secret-Token: $WEBHOOK_SECRET" -d @update.json localhost:8080/webhook
+async def run_webhook(bot: Bot, dp: Dispatcher):
+    runner = web.AppRunner(build_app(bot, dp))
+    await runner.setup()
+    site = web.TCPSite(runner, WEBHOOK_HOST, WEBHOOK_PORT)
+    await site.start()
+    logger.info("Вебхук слушает %s:%s%s", WEBHOOK_HOST, WEBHOOK_PORT, WEBHOOK_PATH)
+
+    if WEBHOOK_URL:
+        await bot.set_webhook(
+            WEBHOOK_URL.rstrip("/") + WEBHOOK_PATH,
+            secret_token=WEBHOOK_SECRET,
+            allowed_updates=dp.resolve_used_update_types()
+        )
+
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
\ No newline at end of file